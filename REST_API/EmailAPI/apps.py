@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EmailapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'EmailAPI'
+
+    def ready(self):
+        from .emails import compile_templates
+        compile_templates()  # rather than on the first email sent
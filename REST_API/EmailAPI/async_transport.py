@@ -0,0 +1,147 @@
+import asyncio
+import ssl
+import time
+import weakref
+
+import aiosmtplib
+import certifi
+from django.conf import settings
+
+
+class AsyncSMTPConnectionPool:
+    """
+    The asyncio equivalent of transport.SMTPConnectionPool, for the async
+    views, so that a single process can have as many emails being sent at
+    once as it has connections rather than one per worker thread.
+
+    Like asyncio's own objects, a pool belongs to the event loop it was first
+    used in; see get_async_pool().
+    """
+    def __init__(self, host, port, username='', password='', use_ssl=True,
+                 size=20, timeout=10, max_idle=60, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # loading the certificates takes long enough to be worth only doing once
+        if use_ssl and ssl_context is None:
+            ssl_context = ssl.create_default_context(cafile=certifi.where())
+        self.ssl_context = ssl_context
+        # (connection, when it was last used), most recently used last
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def _connect(self):
+        connection = aiosmtplib.SMTP(
+            hostname=self.host, port=self.port, timeout=self.timeout,
+            use_tls=self.use_ssl, start_tls=False,
+            tls_context=self.ssl_context,
+        )
+        await connection.connect()
+        try:
+            if self.username:
+                await connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        self.connections_opened += 1
+        return connection
+
+    async def _checkout(self):
+        while self._idle:
+            connection, last_used = self._idle.pop()
+            if time.monotonic() - last_used < self.max_idle and connection.is_connected:
+                return connection
+            await self._discard(connection)
+        return await self._connect()
+
+    @staticmethod
+    async def _discard(connection):
+        try:
+            await connection.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            connection.close()
+
+    async def send(self, message):
+        """
+        Sends message, retrying once on a new connection if the connection it
+        was sent on has broken, and raising the error if it couldn't be sent
+        """
+        async with self._slots:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            try:
+                await self._send(message)
+            except Exception:
+                self.messages_failed += 1
+                raise
+            else:
+                self.messages_sent += 1
+            finally:
+                self.in_flight -= 1
+
+    async def _send(self, message):
+        for attempt in range(2):
+            connection = await self._checkout()
+            try:
+                await connection.send_message(message)
+            except OSError:  # the connection is no good (the others are the message's fault)
+                connection.close()
+                if attempt:
+                    raise
+            except Exception:
+                self._idle.append((connection, time.monotonic()))
+                raise
+            else:
+                self._idle.append((connection, time.monotonic()))
+                return
+
+    def stats(self):
+        """
+        Counts of what the pool has done, including the most emails it has
+        had being sent at once
+        """
+        return {
+            'connections_opened': self.connections_opened,
+            'messages_sent': self.messages_sent,
+            'messages_failed': self.messages_failed,
+            'most_in_flight': self.most_in_flight,
+        }
+
+    async def close(self):
+        """
+        Closes every idle connection in the pool
+        """
+        while self._idle:
+            connection, _ = self._idle.pop()
+            await self._discard(connection)
+
+
+# each event loop's pool
+_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_pool():
+    """
+    The running event loop's SMTP connection pool, set up from the EMAIL_*
+    settings the first time it's needed
+    """
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = AsyncSMTPConnectionPool(
+            settings.EMAIL_HOST, settings.EMAIL_PORT,
+            settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD,
+            use_ssl=settings.EMAIL_USE_SSL,
+            size=settings.EMAIL_ASYNC_POOL_SIZE,
+            timeout=settings.EMAIL_TIMEOUT,
+        )
+    return pool
@@ -0,0 +1,65 @@
+"""
+Renders the HTML of each type of email the API sends.
+
+Every email is the same shell (the page, its styles, header and footer) around
+some content particular to its type. The templates are compiled only once, and
+the shell is rendered once per type ahead of time and kept as plain text, so
+that sending an email means rendering just its own small content template.
+The content templates are autoescaped like any other Django template, so the
+data from the request can't inject HTML into the email.
+"""
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+SHELL_TEMPLATE = 'EmailAPI/emails/shell.html'
+
+# type: (subject, heading, footer, content template), where the subject is
+# formatted with the message's data
+MESSAGE_TYPES = {
+    'booking_confirmation': (
+        'Order Summary - {id}', 'Order Summary', 'Thank you for booking with us!',
+        'EmailAPI/emails/booking_confirmation.html',
+    ),
+    'booking_cancellation': (
+        'Booking Cancelled - {id}', 'Booking Cancelled', 'We hope to see you again soon.',
+        'EmailAPI/emails/booking_cancellation.html',
+    ),
+    'monthly_statement': (
+        'Monthly Statement - {month}', 'Monthly Statement', 'Thank you for booking with us!',
+        'EmailAPI/emails/monthly_statement.html',
+    ),
+}
+
+# marks where the content goes in a rendered shell
+_CONTENT = '\0content\0'
+
+# type: (shell before the content, content template, shell after the content)
+_compiled = None
+
+
+def compile_templates():
+    """
+    Loads every email template and renders each type's shell, which is done
+    when the app starts (see EmailapiConfig.ready()) and again by anything
+    that changes the templates
+    """
+    global _compiled
+    shell = get_template(SHELL_TEMPLATE)
+    compiled = {}
+    for message_type, (_, heading, footer, template_name) in MESSAGE_TYPES.items():
+        before, after = shell.render({
+            'title': heading, 'footer': footer, 'content': mark_safe(_CONTENT),
+        }).split(_CONTENT)
+        compiled[message_type] = (before, get_template(template_name), after)
+    _compiled = compiled
+    return compiled
+
+
+def render(message_type, data):
+    """
+    The (subject, HTML body) of the message_type email for data
+    """
+    compiled = _compiled or compile_templates()
+    before, template, after = compiled[message_type]
+    subject = MESSAGE_TYPES[message_type][0].format(**data)
+    return subject, before + template.render(data) + after
@@ -0,0 +1,74 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+from time import perf_counter
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from EmailAPI import transport
+from EmailAPI.standin import SMTPStandIn
+
+
+class Command(BaseCommand):
+    help = (
+        'Times sending booking emails through the API one request at a time '
+        'against sending them in batches, to a stand-in SMTP server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000, help='How many emails to send each way')
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_BATCH_MAX_SIZE,
+                            help='How many emails to send per batch request')
+
+    def handle(self, *args, **options):
+        count, batch_size = options['count'], options['batch_size']
+        bookings = [
+            {
+                'email': f'customer{n}@example.com', 'id': n, 'movie': 'Benchmark', 'date': '01 April 2023 - 18:00',
+                'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+            }
+            for n in range(count)
+        ]
+        client = Client(HTTP_HOST='localhost')
+
+        def single():
+            for booking in bookings:
+                client.post('/my-api/', booking, content_type='application/json')
+
+        def batched():
+            for start in range(0, count, batch_size):
+                client.post('/my-api/batch/', bookings[start:start + batch_size], content_type='application/json')
+
+        def ndjson():
+            for start in range(0, count, batch_size):
+                body = '\n'.join(json.dumps(booking) for booking in bookings[start:start + batch_size])
+                client.post('/my-api/batch/', body, content_type='application/x-ndjson')
+
+        for name, send in (('single', single), ('batch (JSON)', batched), ('batch (NDJSON)', ndjson)):
+            elapsed, server = self.time_sending(send)
+            self.stdout.write(
+                f'{name:>15}: {count} emails in {elapsed:.2f}s, {count / elapsed:.0f}/s '
+                f'({len(server.messages)} delivered over {server.connections} connection(s))'
+            )
+
+    def time_sending(self, send):
+        """
+        Runs send() against a fresh stand-in SMTP server and connection pool,
+        returning (seconds taken, the server)
+        """
+        server = SMTPStandIn(username='benchmark', password='benchmark')
+        try:
+            with override_settings(EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                                   EMAIL_HOST_USER='benchmark', EMAIL_HOST_PASSWORD='benchmark'), \
+                    mock.patch.object(transport, '_pool', None), \
+                    redirect_stdout(StringIO()):  # the single email view prints every booking
+                started = perf_counter()
+                send()
+                elapsed = perf_counter() - started
+                transport.get_pool().close()
+        finally:
+            server.stop()
+        return elapsed, server
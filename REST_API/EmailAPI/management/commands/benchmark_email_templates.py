@@ -0,0 +1,62 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from EmailAPI import emails
+from EmailAPI.views import build_message
+
+SAMPLE_DATA = {
+    'booking_confirmation': {
+        'email': 'customer@example.com', 'id': 1, 'movie': 'Benchmark', 'date': '01 April 2023 - 18:00',
+        'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+    },
+    'booking_cancellation': {
+        'email': 'customer@example.com', 'id': 1, 'movie': 'Benchmark', 'date': '01 April 2023 - 18:00',
+        'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+    },
+    'monthly_statement': {
+        'email': 'club@example.com', 'id': 1, 'club': 'Benchmark Club', 'month': '2023-04', 'amount': '250.00',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Times rendering each type of email with its pre-rendered shell, '
+        'against rendering the whole page every time'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10_000, help='How many of each email to render')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        emails.compile_templates()
+        for message_type, data in SAMPLE_DATA.items():
+            _, heading, footer, template_name = emails.MESSAGE_TYPES[message_type]
+
+            def whole_page():
+                content = get_template(template_name).render(data)
+                return get_template(emails.SHELL_TEMPLATE).render({
+                    'title': heading, 'footer': footer, 'content': mark_safe(content),
+                })
+
+            timings = [
+                ('whole page', self.time_per_message(count, whole_page)),
+                ('pre-rendered shell', self.time_per_message(count, lambda: emails.render(message_type, data))),
+                ('as a MIME message', self.time_per_message(
+                    count, lambda: build_message(data['email'], data, message_type).as_string()
+                )),
+            ]
+            self.stdout.write(message_type)
+            for name, seconds in timings:
+                self.stdout.write(f'  {name:>20}: {seconds * 1_000_000:.1f} µs per email')
+
+    @staticmethod
+    def time_per_message(count, render):
+        started = perf_counter()
+        for _ in range(count):
+            render()
+        return (perf_counter() - started) / count
@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+
+from EmailAPI import transport
+from EmailAPI.async_transport import get_async_pool
+from EmailAPI.standin import SMTPStandIn
+
+
+class Command(BaseCommand):
+    help = (
+        'Load tests sending emails through the API to a stand-in SMTP server, '
+        'with the sync view on a fixed number of worker threads (like the WSGI '
+        'deployment) and with the async view at increasing numbers of requests '
+        'in flight on a single thread (like the ASGI one)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='How many emails to send in each run')
+        parser.add_argument('--smtp-latency', type=float, default=0.05,
+                            help='Seconds the stand-in server takes to accept each email')
+        parser.add_argument('--wsgi-workers', type=int, default=4, help='Worker threads for the sync view')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 100, 300],
+                            help='Requests in flight at once for the async view')
+
+    def handle(self, *args, **options):
+        count, workers = options['count'], options['wsgi_workers']
+        booking = {
+            'email': 'customer@example.com', 'id': 1, 'movie': 'Load Test', 'date': '01 April 2023 - 18:00',
+            'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+        }
+        server = SMTPStandIn(username='loadtest', password='loadtest', delay=options['smtp_latency'])
+        try:
+            with override_settings(EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                                   EMAIL_HOST_USER='loadtest', EMAIL_HOST_PASSWORD='loadtest',
+                                   EMAIL_POOL_SIZE=workers,
+                                   EMAIL_ASYNC_POOL_SIZE=max(options['concurrency']),
+                                   ALLOWED_HOSTS=['testserver']):
+                elapsed = self.run_wsgi(booking, count, workers)
+                self.report(f'WSGI, {workers} workers', count, elapsed)
+                for concurrency in options['concurrency']:
+                    elapsed, most_in_flight = asyncio.run(self.run_asgi(booking, count, concurrency))
+                    self.report(f'ASGI, {concurrency} in flight', count, elapsed,
+                                f' (up to {most_in_flight} sending at once)')
+        finally:
+            server.stop()
+
+    def report(self, name, count, elapsed, note=''):
+        self.stdout.write(f'{name:>22}: {count} emails in {elapsed:.2f}s, {count / elapsed:.0f}/s{note}')
+
+    @staticmethod
+    def run_wsgi(booking, count, workers):
+        def send(_):
+            Client().post('/my-api/', booking, content_type='application/json')
+
+        with mock.patch.object(transport, '_pool', None), \
+                redirect_stdout(StringIO()):  # my_view prints every booking
+            started = perf_counter()
+            with ThreadPoolExecutor(workers) as executor:
+                list(executor.map(send, range(count)))
+            elapsed = perf_counter() - started
+            transport.get_pool().close()
+        return elapsed
+
+    @staticmethod
+    async def run_asgi(booking, count, concurrency):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def send():
+            async with slots:
+                response = await client.post('/my-api/async/', booking, content_type='application/json')
+                assert response.status_code == 200, response.content
+
+        started = perf_counter()
+        await asyncio.gather(*(send() for _ in range(count)))
+        elapsed = perf_counter() - started
+        pool = get_async_pool()
+        await pool.close()
+        return elapsed, pool.stats()['most_in_flight']
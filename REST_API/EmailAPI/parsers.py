@@ -0,0 +1,28 @@
+import json
+
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON (one JSON value per line) into a list of
+    the values, skipping blank lines.
+
+    A line which isn't valid JSON doesn't spoil the rest: its place in the
+    list is taken by the ValueError it raised, for the view to report.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        for line in stream or ():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line.decode(encoding)))
+            except ValueError as e:
+                items.append(e)
+        return items
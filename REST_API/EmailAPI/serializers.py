@@ -0,0 +1,51 @@
+from rest_framework import serializers
+
+from .emails import MESSAGE_TYPES
+
+
+class EmailSerializer(serializers.Serializer):
+    """
+    What every type of email needs, see the subclasses below for the rest
+    """
+    type = serializers.ChoiceField(choices=list(MESSAGE_TYPES), default='booking_confirmation')
+    email = serializers.EmailField()
+    id = serializers.IntegerField()
+
+
+class BookingEmailSerializer(EmailSerializer):
+    """
+    The details of a booking which are put into its order summary (or
+    cancellation) email, as sent by the UWEFlix app
+    """
+    movie = serializers.CharField()
+    date = serializers.CharField()
+    screen = serializers.CharField()
+    total_tickets = serializers.IntegerField(min_value=1)
+    total_price = serializers.DecimalField(max_digits=8, decimal_places=2)
+    name = serializers.CharField(required=False)
+
+
+class MonthlyStatementEmailSerializer(EmailSerializer):
+    """
+    The details of a Club's monthly statement
+    """
+    club = serializers.CharField()
+    month = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$', error_messages={'invalid': 'Expected YYYY-MM.'})
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+SERIALIZERS = {
+    'booking_confirmation': BookingEmailSerializer,
+    'booking_cancellation': BookingEmailSerializer,
+    'monthly_statement': MonthlyStatementEmailSerializer,
+}
+
+
+def email_serializer(data):
+    """
+    The serializer for an email's data, chosen by its type (a booking
+    confirmation if it doesn't say). An unknown type gets a serializer that
+    will report it as invalid.
+    """
+    message_type = data.get('type') if isinstance(data, dict) else None
+    return SERIALIZERS.get(message_type, BookingEmailSerializer)(data=data)
@@ -0,0 +1,88 @@
+"""
+A stand-in SMTP server which runs in a background thread of this process.
+"""
+import base64
+import socketserver
+import threading
+import time
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Just enough of an SMTP server (with AUTH PLAIN and LOGIN) to send email to
+    in tests and benchmarks, without needing a real one. Every message it
+    accepts is kept in messages.
+
+    If drop_after is set, it hangs up on each client after accepting that many
+    messages from it, like a server timing out a connection. Each message
+    takes delay seconds to be accepted, like a real server over the network.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 512  # for load tests opening hundreds of connections at once
+
+    def __init__(self, username='cinema', password='secret', drop_after=None, delay=0):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.username = username
+        self.password = password
+        self.drop_after = drop_after
+        self.delay = delay
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.host, self.port = self.server_address
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        accepted = 0
+        self.reply('220 standin ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode().strip().partition(' ')
+            command = command.upper()
+            if command == 'EHLO':
+                self.reply('250-standin\r\n250-AUTH PLAIN LOGIN\r\n250 OK')
+            elif command == 'AUTH':
+                mechanism, _, credentials = argument.partition(' ')
+                if mechanism.upper() == 'PLAIN':
+                    _, username, password = base64.b64decode(credentials).decode().split('\0')
+                else:  # LOGIN, which asks for the password separately
+                    username = base64.b64decode(credentials).decode()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    password = base64.b64decode(self.rfile.readline()).decode()
+                if (username, password) == (self.server.username, self.server.password):
+                    self.reply('235 Authenticated')
+                else:
+                    self.reply('535 Bad credentials')
+            elif command == 'RCPT' and 'refused' in argument:
+                self.reply('550 No such mailbox')
+            elif command == 'DATA':
+                self.reply('354 Go ahead')
+                data = []
+                for line in iter(self.rfile.readline, b'.\r\n'):
+                    data.append(line)
+                time.sleep(self.server.delay)
+                with self.server.lock:
+                    self.server.messages.append(b''.join(data).decode())
+                self.reply('250 Accepted')
+                accepted += 1
+                if accepted == self.server.drop_after:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:  # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
@@ -1,3 +1,387 @@
-from django.test import TestCase
+import asyncio
+import json
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import aiosmtplib
+from django.test import SimpleTestCase, override_settings
+
+from . import emails, transport
+from .async_transport import AsyncSMTPConnectionPool, get_async_pool
+from .standin import SMTPStandIn
+from .transport import SMTPConnectionPool
+from .views import send_mail
+
+
+def make_message(to, n=0):
+    message = EmailMessage()
+    message['From'] = 'UWEFlixCinema@gmail.com'
+    message['To'] = to
+    message['Subject'] = f'Order Summary - {n}'
+    message.set_content(f'Booking {n}')
+    return message
+
+
+class SMTPConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.server = SMTPStandIn()
+        self.addCleanup(self.server.stop)
+
+    def make_pool(self, **kwargs):
+        kwargs.setdefault('username', 'cinema')
+        kwargs.setdefault('password', 'secret')
+        pool = SMTPConnectionPool(self.server.host, self.server.port, use_ssl=False, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_batch_sent_over_one_connection(self):
+        pool = self.make_pool()
+        failures = pool.send_many(make_message('a@example.com', n) for n in range(50))
+        self.assertEqual(failures, [])
+        self.assertEqual(len(self.server.messages), 50)
+        self.assertIn('Booking 49', self.server.messages[-1])
+
+        # and it's kept open for the next batch
+        pool.send(make_message('b@example.com'))
+        self.assertEqual(len(self.server.messages), 51)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(pool.stats()['connections_opened'], 1)
+
+    def test_reconnects_when_the_server_hangs_up(self):
+        self.server.drop_after = 3
+        pool = self.make_pool()
+        failures = pool.send_many(make_message('a@example.com', n) for n in range(10))
+        self.assertEqual(failures, [])
+        # every message arrived, just the once
+        self.assertEqual(len(self.server.messages), 10)
+        self.assertEqual(pool.stats()['connections_opened'], 4)
+
+    def test_idle_connections_are_replaced(self):
+        pool = self.make_pool(max_idle=0)
+        pool.send(make_message('a@example.com'))
+        pool.send(make_message('a@example.com'))
+        self.assertEqual(pool.stats()['connections_opened'], 2)
+
+    def test_refused_message_does_not_stop_the_batch(self):
+        pool = self.make_pool()
+        messages = [make_message('a@example.com'), make_message('refused@example.com'),
+                    make_message('b@example.com')]
+        failures = pool.send_many(messages)
+        self.assertEqual([message for message, _ in failures], [messages[1]])
+        self.assertIsInstance(failures[0][1], smtplib.SMTPRecipientsRefused)
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(pool.stats()['connections_opened'], 1)
+        self.assertEqual(pool.stats()['messages_failed'], 1)
+
+    def test_bad_login(self):
+        pool = self.make_pool(password='wrong')
+        with self.assertRaises(smtplib.SMTPAuthenticationError):
+            pool.send(make_message('a@example.com'))
+        # the rest of a batch isn't tried once logging in has failed
+        failures = pool.send_many(make_message('a@example.com') for _ in range(5))
+        self.assertEqual(len(failures), 5)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(self.server.messages, [])
+
+    def test_throughput_under_load(self):
+        pool = self.make_pool(size=4)
+
+        def send_batch():
+            pool.send_many(make_message('a@example.com', n) for n in range(100))
+
+        threads = [threading.Thread(target=send_batch) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(len(self.server.messages), 800)
+        self.assertEqual(stats['messages_sent'], 800)
+        self.assertLessEqual(stats['connections_opened'], 4)
+        self.assertGreater(stats['messages_per_second'], 0)
+
+
+class SendMailTest(SimpleTestCase):
+    booking = {
+        'id': 7, 'email': 'customer@example.com', 'movie': 'Jaws', 'date': '2023-04-01 18:00',
+        'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+    }
+
+    def setUp(self):
+        # a fresh pool made from the overridden settings for each test
+        patcher = mock.patch.object(transport, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: transport._pool and transport._pool.close())
+
+    def test_sends_order_summary(self):
+        server = SMTPStandIn(username='UWEFlixCinema@gmail.com', password='')
+        self.addCleanup(server.stop)
+        with override_settings(EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                               EMAIL_HOST_USER='UWEFlixCinema@gmail.com', EMAIL_HOST_PASSWORD=''), \
+                mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            send_mail(self.booking['email'], self.booking)
+            send_mail(self.booking['email'], self.booking)
+        self.assertEqual(len(server.messages), 2)
+        self.assertIn('Order Summary - 7', server.messages[0])
+        self.assertIn('Email sent successfully', stdout.getvalue())
+        self.assertEqual(server.connections, 1)
+
+    def unreachable_port(self):
+        # a port with nothing listening on it
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def test_unreachable_server_raises(self):
+        with override_settings(EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.unreachable_port(), EMAIL_USE_SSL=False):
+            with self.assertRaises(OSError):
+                send_mail(self.booking['email'], self.booking)
+
+    def test_view_reports_failure_as_bad_gateway(self):
+        # so the outbox which posted it keeps it to try again, rather than marking it sent
+        with override_settings(EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.unreachable_port(), EMAIL_USE_SSL=False), \
+                mock.patch('sys.stdout', new_callable=StringIO):
+            response = self.client.post('/my-api/', self.booking, content_type='application/json')
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("Couldn't send the email", response.json()['detail'])
+
+    def test_view_refused_recipient(self):
+        server = SMTPStandIn(username='UWEFlixCinema@gmail.com', password='')
+        self.addCleanup(server.stop)
+        with override_settings(EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                               EMAIL_HOST_USER='UWEFlixCinema@gmail.com', EMAIL_HOST_PASSWORD=''), \
+                mock.patch('sys.stdout', new_callable=StringIO):
+            sent = self.client.post('/my-api/', self.booking, content_type='application/json')
+            refused = self.client.post('/my-api/', {**self.booking, 'email': 'refused@example.com'},
+                                       content_type='application/json')
+        self.assertEqual((sent.status_code, refused.status_code), (200, 502))
+        self.assertEqual(len(server.messages), 1)
+
+    def test_view_rejects_invalid_email(self):
+        without_email = {key: value for key, value in self.booking.items() if key != 'email'}
+        without_movie = {key: value for key, value in self.booking.items() if key != 'movie'}
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            for data, field in ((without_email, 'email'), (without_movie, 'movie'),
+                                ({**self.booking, 'type': 'birthday_card'}, 'type')):
+                response = self.client.post('/my-api/', data, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json())
+
+
+class BatchViewTest(SimpleTestCase):
+    def setUp(self):
+        self.server = SMTPStandIn(username='UWEFlixCinema@gmail.com', password='')
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(
+            EMAIL_HOST=self.server.host, EMAIL_PORT=self.server.port, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='UWEFlixCinema@gmail.com', EMAIL_HOST_PASSWORD='', EMAIL_BATCH_MAX_SIZE=50,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(transport, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: transport._pool and transport._pool.close())
+
+    def booking(self, n, **changes):
+        return {
+            'email': f'customer{n}@example.com', 'id': n, 'movie': 'Jaws', 'date': '01 April 2023 - 18:00',
+            'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00', **changes,
+        }
+
+    def test_json_array(self):
+        response = self.client.post(
+            '/my-api/batch/', [self.booking(n) for n in range(20)], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['sent'], 20)
+        self.assertEqual(len(self.server.messages), 20)
+        self.assertIn('Order Summary - 19', self.server.messages[-1])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_ndjson_with_per_item_status(self):
+        lines = [
+            json.dumps(self.booking(1)),
+            '{"not json',
+            json.dumps(self.booking(2, email='not an email')),
+            '',
+            json.dumps(self.booking(3, email='refused@example.com')),
+            json.dumps(self.booking(4)),
+        ]
+        response = self.client.post('/my-api/batch/', '\n'.join(lines), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['sent'], body['invalid'], body['failed']), (2, 2, 1))
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['sent', 'invalid', 'invalid', 'failed', 'sent'])
+        self.assertIn('Invalid JSON', body['results'][1]['errors']['non_field_errors'][0])
+        self.assertIn('email', body['results'][2]['errors'])
+        self.assertEqual(len(self.server.messages), 2)
+
+    def test_rejects_a_single_booking(self):
+        response = self.client.post('/my-api/batch/', self.booking(1), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_too_many(self):
+        response = self.client.post(
+            '/my-api/batch/', [self.booking(n) for n in range(51)], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.server.messages, [])
+
+
+class EmailTemplatesTest(SimpleTestCase):
+    booking = {
+        'email': 'customer@example.com', 'id': 7, 'movie': 'Jaws', 'date': '01 April 2023 - 18:00',
+        'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+    }
+
+    def test_each_type(self):
+        subject, body = emails.render('booking_confirmation', self.booking)
+        self.assertEqual(subject, 'Order Summary - 7')
+        self.assertIn('<td>Jaws</td>', body)
+        self.assertIn('Thank you for booking with us!', body)
+        self.assertTrue(body.startswith('<!DOCTYPE html>'))
+
+        subject, body = emails.render('booking_cancellation', self.booking)
+        self.assertEqual(subject, 'Booking Cancelled - 7')
+        self.assertIn('Your booking has been cancelled', body)
+
+        subject, body = emails.render('monthly_statement', {
+            'email': 'club@example.com', 'id': 3, 'club': 'Film Club', 'month': '2023-04', 'amount': '250.00',
+        })
+        self.assertEqual(subject, 'Monthly Statement - 2023-04')
+        self.assertIn('Statement for Film Club', body)
+        self.assertIn('£250.00', body)
+
+    def test_escapes_data(self):
+        _, body = emails.render('booking_confirmation', {**self.booking, 'movie': '<script>alert(1)</script>'})
+        self.assertNotIn('<script>', body)
+        self.assertIn('&lt;script&gt;', body)
+
+    def test_templates_are_not_loaded_per_message(self):
+        emails.compile_templates()
+        with mock.patch('EmailAPI.emails.get_template') as get_template:
+            emails.render('booking_confirmation', self.booking)
+            emails.render('monthly_statement', {
+                'email': 'club@example.com', 'id': 3, 'club': 'Film Club', 'month': '2023-04', 'amount': '250.00',
+            })
+        get_template.assert_not_called()
+
+    def test_types_through_the_batch_endpoint(self):
+        server = SMTPStandIn(username='UWEFlixCinema@gmail.com', password='')
+        self.addCleanup(server.stop)
+        patcher = mock.patch.object(transport, '_pool', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: transport._pool and transport._pool.close())
+        items = [
+            {**self.booking, 'type': 'booking_cancellation'},
+            {'type': 'monthly_statement', 'email': 'club@example.com', 'id': 3, 'club': 'Film Club',
+             'month': '2023-04', 'amount': '250.00'},
+            {'type': 'monthly_statement', 'email': 'club@example.com', 'id': 3, 'club': 'Film Club',
+             'month': 'April', 'amount': '250.00'},
+            {**self.booking, 'type': 'unknown'},
+        ]
+        with override_settings(EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                               EMAIL_HOST_USER='UWEFlixCinema@gmail.com', EMAIL_HOST_PASSWORD=''):
+            response = self.client.post('/my-api/batch/', items, content_type='application/json')
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['sent', 'sent', 'invalid', 'invalid'])
+        self.assertIn('month', results[2]['errors'])
+        self.assertIn('type', results[3]['errors'])
+        self.assertIn('Subject: Booking Cancelled - 7', server.messages[0])
+        self.assertIn('Subject: Monthly Statement - 2023-04', server.messages[1])
+
+
+class AsyncSMTPConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.server = SMTPStandIn()
+        self.addCleanup(self.server.stop)
+
+    def make_pool(self, **kwargs):
+        return AsyncSMTPConnectionPool(
+            self.server.host, self.server.port, 'cinema', 'secret', use_ssl=False, **kwargs
+        )
+
+    async def test_reconnects_when_the_server_hangs_up(self):
+        self.server.drop_after = 2
+        pool = self.make_pool()
+        for n in range(5):
+            await pool.send(make_message('a@example.com', n))
+        await pool.close()
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(pool.stats()['connections_opened'], 3)
+
+    async def test_sends_concurrently(self):
+        self.server.delay = 0.2
+        pool = self.make_pool(size=20)
+        started = time.perf_counter()
+        await asyncio.gather(*(pool.send(make_message('a@example.com', n)) for n in range(20)))
+        elapsed = time.perf_counter() - started
+        await pool.close()
+        self.assertEqual(len(self.server.messages), 20)
+        self.assertEqual(pool.stats()['most_in_flight'], 20)
+        # one at a time would take 4s
+        self.assertLess(elapsed, 2)
+
+    async def test_refused_message(self):
+        pool = self.make_pool()
+        with self.assertRaises(aiosmtplib.SMTPRecipientsRefused):
+            await pool.send(make_message('refused@example.com'))
+        await pool.send(make_message('a@example.com'))
+        await pool.close()
+        self.assertEqual(pool.stats()['connections_opened'], 1)
+        self.assertEqual(pool.stats()['messages_failed'], 1)
+
+
+class AsyncViewTest(SimpleTestCase):
+    booking = {
+        'email': 'customer@example.com', 'id': 7, 'movie': 'Jaws', 'date': '01 April 2023 - 18:00',
+        'screen': 'Screen 1', 'total_tickets': 2, 'total_price': '10.00',
+    }
+
+    def setUp(self):
+        self.server = SMTPStandIn(username='UWEFlixCinema@gmail.com', password='')
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(
+            EMAIL_HOST=self.server.host, EMAIL_PORT=self.server.port, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='UWEFlixCinema@gmail.com', EMAIL_HOST_PASSWORD='',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    async def test_sends(self):
+        response = await self.async_client.post('/my-api/async/', self.booking, content_type='application/json')
+        await get_async_pool().close()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'sent'})
+        self.assertIn('Order Summary - 7', self.server.messages[0])
+
+    async def test_invalid(self):
+        response = await self.async_client.post(
+            '/my-api/async/', {**self.booking, 'email': 'not an email'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['errors'])
+        response = await self.async_client.get('/my-api/async/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.server.messages, [])
+
+    async def test_unreachable_server(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        with override_settings(EMAIL_PORT=port):
+            response = await self.async_client.post(
+                '/my-api/async/', self.booking, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json()['status'], 'failed')
@@ -0,0 +1,187 @@
+import queue
+import smtplib
+import ssl
+import threading
+import time
+
+import certifi
+from django.conf import settings
+
+
+class SMTPConnectionPool:
+    """
+    A pool of logged-in SMTP connections which are kept open and reused, so
+    that sending an email doesn't mean connecting, negotiating TLS and logging
+    in all over again every time.
+
+    Connections that have been idle for longer than max_idle seconds are
+    assumed to have been dropped by the server and are replaced, and any that
+    turn out to be broken while sending are thrown away and the message is
+    sent again on a fresh one.
+
+    Keeps count of how many messages it has sent (and how long that took) for
+    working out its throughput, see stats().
+    """
+    def __init__(self, host, port, username='', password='', use_ssl=True,
+                 size=4, timeout=10, max_idle=60, ssl_context=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # loading the certificates takes long enough to be worth only doing once
+        if use_ssl and ssl_context is None:
+            ssl_context = ssl.create_default_context(cafile=certifi.where())
+        self.ssl_context = ssl_context
+        # (connection, when it was last used), most recently used last so
+        # that the warmest connections get reused first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._stats_lock = threading.Lock()
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.seconds_sending = 0.0
+
+    def _connect(self):
+        if self.use_ssl:
+            connection = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        else:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.username:
+                connection.login(self.username, self.password)
+        except Exception:
+            connection.close()
+            raise
+        with self._stats_lock:
+            self.connections_opened += 1
+        return connection
+
+    def _checkout(self):
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < self.max_idle:
+                return connection
+            self._discard(connection)
+
+    def _checkin(self, connection):
+        self._idle.put((connection, time.monotonic()))
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.quit()
+        except OSError:  # including SMTPException
+            connection.close()
+
+    def send_many(self, messages):
+        """
+        Sends every one of messages (email.message.Message objects with their
+        From and To set) over a single connection from the pool.
+
+        A message which fails because the connection has broken is retried
+        once on a new connection. Returns a list of (message, error) for those
+        that couldn't be sent, which is empty if they all were.
+        """
+        messages = list(messages)
+        started = time.perf_counter()
+        with self._slots:
+            failures = self._send_all(messages)
+        with self._stats_lock:
+            self.messages_sent += len(messages) - len(failures)
+            self.messages_failed += len(failures)
+            self.seconds_sending += time.perf_counter() - started
+        return failures
+
+    def _send_all(self, messages):
+        failures = []
+        connection = None
+        try:
+            for index, message in enumerate(messages):
+                for attempt in range(2):
+                    if connection is None:
+                        try:
+                            connection = self._checkout()
+                        except OSError as e:
+                            # can't connect or log in, so nothing else will send either
+                            return failures + [(m, e) for m in messages[index:]]
+                    try:
+                        connection.send_message(message)
+                    except OSError as e:  # which every SMTPException is too
+                        if (isinstance(e, smtplib.SMTPException)
+                                and not isinstance(e, smtplib.SMTPServerDisconnected)):
+                            failures.append((message, e))  # the message itself was refused
+                            break
+                        # the connection is no good, so try again on a new one
+                        connection.close()
+                        connection = None
+                        if attempt:
+                            failures.append((message, e))
+                    else:
+                        break
+            return failures
+        finally:
+            if connection is not None:
+                self._checkin(connection)
+
+    def send(self, message):
+        """
+        Sends a single message, raising the error if it couldn't be sent
+        """
+        failures = self.send_many([message])
+        if failures:
+            raise failures[0][1]
+
+    def stats(self):
+        """
+        Counts of what the pool has done, including its throughput in messages
+        per second spent sending
+        """
+        with self._stats_lock:
+            return {
+                'connections_opened': self.connections_opened,
+                'messages_sent': self.messages_sent,
+                'messages_failed': self.messages_failed,
+                'messages_per_second': (
+                    self.messages_sent / self.seconds_sending if self.seconds_sending else None
+                ),
+            }
+
+    def close(self):
+        """
+        Closes every idle connection in the pool
+        """
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process's SMTP connection pool, set up from the EMAIL_* settings the
+    first time it's needed
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool(
+                settings.EMAIL_HOST, settings.EMAIL_PORT,
+                settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD,
+                use_ssl=settings.EMAIL_USE_SSL,
+                size=settings.EMAIL_POOL_SIZE,
+                timeout=settings.EMAIL_TIMEOUT,
+            )
+        return _pool
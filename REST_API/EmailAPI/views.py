@@ -1,150 +1,131 @@
-from rest_framework.decorators import api_view
+import json
+
+import aiosmtplib
+from rest_framework import status
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-import smtplib
-import ssl
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import certifi
+from django.conf import settings
+from django.http import JsonResponse
 
+from .async_transport import get_async_pool
+from .emails import render
+from .parsers import NDJSONParser
+from .serializers import email_serializer
+from .transport import get_pool
 
-def send_mail(receiver_email, message_data):
-    # Email information
-    sender_email = 'UWEFlixCinema@gmail.com'
-    # receiver_email = 'UWEFlixCinema@gmail.com'
-    password = ''
-    subject = f'Order Summary - {message_data["id"]}'
-    body = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Order Summary</title>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-        }}
-
-        .container {{
-            max-width: 600px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f8f9fa;
-            border: 1px solid #dee2e6;
-        }}
-
-        .header {{
-            text-align: center;
-            margin-bottom: 20px;
-        }}
-
-        .summary {{
-            background-color: #ffffff;
-            padding: 20px;
-            border: 1px solid #dee2e6;
-            margin-bottom: 20px;
-        }}
-
-        .summary h3 {{
-            margin-top: 0;
-        }}
-
-        .summary table {{
-            width: 100%;
-            border-collapse: collapse;
-        }}
-
-        .summary th, .summary td {{
-            border: 1px solid #dee2e6;
-            padding: 8px;
-            text-align: left;
-        }}
-
-        .summary th {{
-            background-color: #e9ecef;
-        }}
-
-        .footer {{
-            text-align: center;
-            font-size: 14px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>UWEFlix Cinema</h1>
-            <h2>Order Summary</h2>
-        </div>
-        <div class="summary">
-            <h3>Booking Details</h3>
-            <table>
-                <tr>
-                    <th>Booking ID</th>
-                    <td>{message_data['id']}</td>
-                </tr>
-                <tr>
-                    <th>Movie</th>
-                    <td>{message_data['movie']}</td>
-                </tr>
-                <tr>
-                    <th>Date</th>
-                    <td>{message_data['date']}</td>
-                </tr>
-                <tr>
-                    <th>Screen</th>
-                    <td>{message_data['screen']}</td>
-                </tr>
-                <tr>
-                    <th>Tickets</th>
-                    <td>{message_data['total_tickets']}</td>
-                </tr>
-                <tr>
-                    <th>Total Price</th>
-                    <td>£{message_data['total_price']}</td>
-                </tr>
-            </table>
-        </div>
-        <div class="footer">
-            <p>Thank you for booking with us!</p>
-            <p>© 2023 UWEFlix. All rights reserved.</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
-
-    # Create a multipart message and set the headers
-    message = MIMEMultipart()
-    message['From'] = sender_email
+
+def build_message(receiver_email, message_data, message_type='booking_confirmation'):
+    subject, body = render(message_type, message_data)
+
+    # Create a message and set the headers
+    message = MIMEText(body, 'html')
+    message['From'] = settings.EMAIL_HOST_USER
     message['To'] = receiver_email
     message['Subject'] = subject
-    
+    return message
 
-    # Add body to the message
-    # message.attach(MIMEText(body, 'plain'))
-    message.attach(MIMEText(body, 'html'))
 
-    # Create a secure SSL context
-    context = ssl.create_default_context()
+def send_mail(receiver_email, message_data):
+    message = build_message(receiver_email, message_data, message_data.get('type', 'booking_confirmation'))
 
-    # Try to log in to server and send email
-    try:
-        context = ssl.create_default_context(cafile=certifi.where())
-        server = smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context)
-        server.login(sender_email, password)
-        text = message.as_string()
-        server.sendmail(sender_email, receiver_email, text)
-        print('Email sent successfully')
-    except Exception as e:
-        print(f'Error occurred: {e}')
-    finally:
-        server.quit()
+    # Send it over one of the pool's open connections, which are logged in
+    # already and reconnect by themselves if the server has dropped them.
+    # Raises OSError (which every SMTPException is too) if it couldn't be sent.
+    get_pool().send(message)
+    print('Email sent successfully')
 
 @api_view(['POST'])
 def my_view(request):
     data = request.data
     # Do something with the data
     print(data)
-    send_mail(data['email'], data)
-    return Response(data)
\ No newline at end of file
+    # validated like each email sent to batch_view, so that one missing what
+    # its type's template needs is a 400 rather than a KeyError
+    serializer = email_serializer(data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        send_mail(serializer.validated_data['email'], serializer.validated_data)
+    except OSError as e:
+        # a 5xx, so that the sender (e.g. UWEFlixApp's outbox) tries again later
+        return Response({'detail': f"Couldn't send the email: {e}"}, status=status.HTTP_502_BAD_GATEWAY)
+    return Response(data)
+
+
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+def batch_view(request):
+    """
+    Sends many emails at once, given as either a JSON array or NDJSON (one
+    per line), over a single connection from the pool. Each has a "type" (see
+    emails.MESSAGE_TYPES), or is a booking's order summary if it doesn't.
+
+    Every email is validated first and only the valid ones are sent. The
+    response has the status of each email, in the order they were given:
+    "sent", "invalid" (with the errors) or "failed" (with the reason).
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'detail': 'Expected a list of emails.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.EMAIL_BATCH_MAX_SIZE:
+        return Response(
+            {'detail': f'At most {settings.EMAIL_BATCH_MAX_SIZE} emails can be sent at once.'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    results = []
+    messages = []  # (index, message) of each valid email
+    for index, item in enumerate(items):
+        if isinstance(item, ValueError):  # a line of NDJSON which couldn't be parsed
+            results.append({'status': 'invalid', 'errors': {'non_field_errors': [f'Invalid JSON: {item}']}})
+            continue
+        serializer = email_serializer(item)
+        if serializer.is_valid():
+            data = serializer.validated_data
+            messages.append((index, build_message(data['email'], data, data['type'])))
+            results.append({'status': 'sent'})
+        else:
+            results.append({'status': 'invalid', 'errors': serializer.errors})
+
+    failures = get_pool().send_many(message for _, message in messages)
+    index_of = {id(message): index for index, message in messages}
+    for message, error in failures:
+        results[index_of[id(message)]] = {'status': 'failed', 'error': str(error)}
+
+    counts = {outcome: 0 for outcome in ('sent', 'invalid', 'failed')}
+    for result in results:
+        counts[result['status']] += 1
+    return Response({**counts, 'results': results})
+
+
+async def async_view(request):
+    """
+    Sends one email like my_view, but without tying up a thread while it's
+    being sent, so that under ASGI one process can be sending as many emails
+    at once as its pool has connections (see EMAIL_ASYNC_POOL_SIZE).
+
+    The email is validated like those sent to batch_view, and the response
+    says whether it was sent.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'detail': f'Invalid JSON: {e}'}, status=400)
+    serializer = email_serializer(data)
+    if not serializer.is_valid():
+        return JsonResponse({'status': 'invalid', 'errors': serializer.errors}, status=400)
+    data = serializer.validated_data
+    try:
+        await get_async_pool().send(build_message(data['email'], data, data['type']))
+    except (aiosmtplib.SMTPException, OSError) as e:
+        return JsonResponse({'status': 'failed', 'error': str(e)}, status=502)
+    return JsonResponse({'status': 'sent'})
+
+
+# called by other services, which don't have a CSRF token (the decorator can't
+# be used, as in this version of Django it would make the view synchronous)
+async_view.csrf_exempt = True
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,7 +26,7 @@ SECRET_KEY = 'django-insecure-e@%^27%9aqvze*-8c#8ibsfxp#sy(md2_o85cg6%fskf83l^c7
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = ['django-rest-api', 'localhost', '127.0.0.1']
+ALLOWED_HOSTS = ['django-rest-api', 'django-rest-api-asgi', 'localhost', '127.0.0.1']
 
 
 # Application definition
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'EmailAPI',
 ]
 
 MIDDLEWARE = [
@@ -121,3 +123,33 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Outgoing email, sent through a pool of kept-open SMTP connections (see
+# EmailAPI.transport). The server can be changed with the EMAIL_HOST and
+# EMAIL_PORT environment variables, e.g. to point at a local test server.
+
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
+
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 465))
+
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'UWEFlixCinema@gmail.com')
+
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+
+EMAIL_USE_SSL = os.environ.get('EMAIL_USE_SSL', '1') == '1'
+
+# the most connections open to the server at once, from each worker of the
+# WSGI deployment, and from each process of the ASGI one (which can have an
+# email being sent on every one of them at once)
+EMAIL_POOL_SIZE = 4
+
+EMAIL_ASYNC_POOL_SIZE = int(os.environ.get('EMAIL_ASYNC_POOL_SIZE', 100))
+
+EMAIL_TIMEOUT = 10
+
+# the most emails that can be sent in one request to the batch endpoint, which
+# sends them before it responds, so it's kept to about as many as a real SMTP
+# server takes well within a request's timeout (at around 10 a second over the
+# one connection, 200 take 20s). More need sending in more requests.
+EMAIL_BATCH_MAX_SIZE = 200
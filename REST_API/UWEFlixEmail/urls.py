@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from EmailAPI.views import my_view
+from EmailAPI.views import async_view, batch_view, my_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('my-api/', my_view),
+    path('my-api/batch/', batch_view),
+    path('my-api/async/', async_view),
 ]
@@ -0,0 +1,9 @@
+from .principal import ANONYMOUS
+
+
+def principal(request):
+    """
+    Makes the request's Principal available to templates as principal, e.g.
+    {% if principal.role == 'M' %}
+    """
+    return {'principal': getattr(request, 'principal', ANONYMOUS)}
@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .principal import get_principal
+
+
+class PrincipalMiddleware:
+    """
+    Sets request.principal (see UWEAuth.principal), which is only worked out
+    if something uses it. Must come after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.principal = SimpleLazyObject(lambda: get_principal(request))
+        return self.get_response(request)
@@ -43,6 +43,28 @@ class User(AbstractUser):
                 violation_error_message='Club Rep must have a Club!'
             ),
         )
+        indexes = (
+            # the accounts waiting for approval, which are few, in id order.
+            # MySQL doesn't have partial indexes, but Django filters it with
+            # is_active = false, which this is used for (SQLite is given NOT
+            # is_active, which it can't use an index for, but it's only used
+            # in development)
+            models.Index(fields=('is_active', 'id'), name='user_is_active_idx'),
+            # the staff accounts (requested_club, the other filter on Users, is
+            # already indexed as a foreign key)
+            models.Index(fields=('role',), name='user_role_idx'),
+        )
+
+    # the role as last read from/written to the db (None for a new User, or
+    # if it wasn't loaded), so that .save() knows whether it has changed
+    _role_as_stored = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'role' not in instance.get_deferred_fields():
+            instance._role_as_stored = instance.role
+        return instance
 
     @classmethod
     def get_role_groups(cls):
@@ -51,20 +73,37 @@ class User(AbstractUser):
         """
         return Group.objects.filter(name__in=(r.label for r in cls.Role))
 
+    @classmethod
+    def role_group_ids(cls):
+        """
+        The id of the Group for each Role, as {role: id}.
+
+        The Role Groups are created by a migration and not changed after, so
+        they're only looked up once per process (or again if a Group is saved
+        or deleted, see UWEAuth.signals).
+        """
+        global _role_group_ids
+        if _role_group_ids is None:
+            ids_by_name = dict(cls.get_role_groups().values_list('name', 'id'))
+            missing = [r.label for r in cls.Role if r.label not in ids_by_name]
+            if missing:
+                raise Group.DoesNotExist(f'There is no Group for the {", ".join(missing)} Role(s)')
+            _role_group_ids = {r: ids_by_name[r.label] for r in cls.Role}
+        return _role_group_ids
+
     @classmethod
     def sanitise_groups(cls, group_qs, role):
         """
         Sanitises a given Group Many-to-Many manager queryset to make sure it
         only contains Role-Groups for the given role
         """
-        # query current group because we'll reuse it a few times
-        current_group = Group.objects.get(name=role.label)
+        role_group_ids = cls.role_group_ids()
         # drop any inadvertently-added invalid Role-Groups
         groups_excluding_invalid_roles = group_qs.exclude(
-            id__in=User.get_role_groups().exclude(id=current_group.id)
+            id__in=[group_id for r, group_id in role_group_ids.items() if r != role]
         )
         # force the inclusion of the valid Role-Group in case it was removed
-        groups_excluding_invalid_roles |= Group.objects.filter(id=current_group.id)
+        groups_excluding_invalid_roles |= Group.objects.filter(id=role_group_ids[role])
         return groups_excluding_invalid_roles
 
     def set_correct_groups_for_role(self):
@@ -73,18 +112,37 @@ class User(AbstractUser):
         that are Role Groups and make sure that it only consists of one Group,
         the one for the current Role
         """
-        self.groups.set(User.sanitise_groups(self.groups, User.Role(self.role)))
+        role_group_ids = User.role_group_ids()
+        role = User.Role(self.role)
+        self.groups.remove(*(group_id for r, group_id in role_group_ids.items() if r != role))
+        self.groups.add(role_group_ids[role])
 
     def save(self, *args, **kwargs):
         """
         Override .save() to ensure that this User always has the mandated Group
         for its Role type set, and none of the other Groups for other Role types
         (note that other Groups which are not assigned to Roles are left as-is).
+
+        The Groups are only set when the User is created or its role changes,
+        so that saving other changes (e.g. joining a Club) is just the UPDATE.
         """
+        creating = self._state.adding
         # if creating a new superuser, make them a CINEMA_MANAGER
-        if self.id is None and self.is_superuser:
+        if creating and self.is_superuser:
             self.role = User.Role.CINEMA_MANAGER
+        update_fields = kwargs.get('update_fields')
+        role_saved = update_fields is None or 'role' in update_fields
         super().save(*args, **kwargs)  # call super first to get an ID
-        # enforce correct group membership
-        self.set_correct_groups_for_role()
+        if creating:
+            # a new User isn't in any Groups yet, so just needs its Role's
+            self.groups.add(User.role_group_ids()[User.Role(self.role)])
+        elif role_saved and self.role != self._role_as_stored:
+            # enforce correct group membership
+            self.set_correct_groups_for_role()
         # NOTE: there is no need to re-save after this, m2m commits immediately
+        if role_saved:
+            self._role_as_stored = self.role
+
+
+# {role: id of its Group} once looked up, see User.role_group_ids()
+_role_group_ids = None
@@ -0,0 +1,71 @@
+"""
+Who a request is from, as far as deciding what they can do goes: their Role,
+their Club and the Groups they're in, worked out once per request (see
+PrincipalMiddleware) rather than by each check that needs them.
+
+The Role and Club are read from request.user, which Django loads (once) to
+authenticate the request anyway. The Group ids would be another query, so
+they're kept in the session with the Role and Club they were looked up for,
+and looked up again only when either of those has changed or they're older
+than GROUPS_MAX_AGE (which is how long a change to someone's Groups alone can
+take to be noticed). They're first looked up when the User logs in, see
+UWEAuth.signals.
+"""
+import time
+
+SESSION_KEY = '_principal'
+
+# seconds a session's Group ids are trusted for
+GROUPS_MAX_AGE = 300
+
+
+class Principal:
+    """
+    The requesting User's id, role, club id and Group ids (a frozenset),
+    which are all None/empty for anonymous requests
+    """
+    def __init__(self, user_id=None, role=None, club_id=None, group_ids=()):
+        self.user_id = user_id
+        self.role = role
+        self.club_id = club_id
+        self.group_ids = frozenset(group_ids)
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    def has_role(self, *roles):
+        return self.role is not None and self.role in roles
+
+    def __repr__(self):
+        return f'<Principal user={self.user_id} role={self.role} club={self.club_id}>'
+
+
+ANONYMOUS = Principal()
+
+
+def get_principal(request):
+    """
+    The Principal for request, using the Group ids cached in its session if
+    they're still good
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return ANONYMOUS
+    cached = request.session.get(SESSION_KEY)
+    if (cached is None or cached['user_id'] != user.id or cached['role'] != user.role
+            or cached['club_id'] != user.club_id or time.time() - cached['at'] > GROUPS_MAX_AGE):
+        cached = remember_principal(request.session, user)
+    return Principal(user.id, user.role, user.club_id, cached['group_ids'])
+
+
+def remember_principal(session, user):
+    """
+    Looks up user's Group ids and keeps them in session, with the Role and
+    Club they go with
+    """
+    cached = session[SESSION_KEY] = {
+        'user_id': user.id, 'role': user.role, 'club_id': user.club_id,
+        'group_ids': list(user.groups.values_list('id', flat=True)), 'at': time.time(),
+    }
+    return cached
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import models
+from .principal import remember_principal
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_role_group_ids(sender, **kwargs):
+    """
+    Makes User.role_group_ids() look the Role Groups up again, in case this
+    was one of them
+    """
+    models._role_group_ids = None
+
+
+@receiver(user_logged_in)
+def remember_principal_on_login(sender, request, user, **kwargs):
+    """
+    Works out the new session's Principal while logging in, rather than on
+    the first page after
+    """
+    if request is not None and hasattr(request, 'session'):
+        remember_principal(request.session, user)
@@ -1,3 +1,110 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import User
+
+
+class RoleGroupsTest(TestCase):
+    def role_groups(self, user):
+        return set(user.groups.filter(name__in=[r.label for r in User.Role]).values_list('name', flat=True))
+
+    def test_new_user_gets_role_group(self):
+        user = User.objects.create(username='flynn', role=User.Role.ACCOUNT_MANAGER)
+        self.assertEqual(self.role_groups(user), {'Account Manager'})
+
+        superuser = User.objects.create(username='dumont', is_superuser=True)
+        self.assertEqual(self.role_groups(superuser), {'Cinema Manager'})
+
+    def test_role_change_swaps_groups(self):
+        other_group = Group.objects.create(name='Projectionists')
+        user = User.objects.create(username='flynn', role=User.Role.STUDENT)
+        user.groups.add(other_group)
+
+        user = User.objects.get(id=user.id)
+        user.role = User.Role.ACCOUNT_MANAGER
+        user.save()
+        self.assertEqual(self.role_groups(user), {'Account Manager'})
+        # Groups that aren't for a Role are left alone
+        self.assertIn(other_group, user.groups.all())
+
+        # and again on the same instance
+        user.role = User.Role.CINEMA_MANAGER
+        user.save()
+        self.assertEqual(self.role_groups(user), {'Cinema Manager'})
+
+    def test_other_saves_are_a_single_update(self):
+        user = User.objects.create(username='flynn', role=User.Role.STUDENT)
+        user = User.objects.get(id=user.id)
+        user.is_active = False
+        with self.assertNumQueries(1):
+            user.save()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['is_active'])
+
+        # saving the role without changing it doesn't touch the Groups either
+        user.role = User.Role.STUDENT
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_unloaded_role_is_resynced(self):
+        user = User.objects.create(username='flynn', role=User.Role.STUDENT)
+        user.groups.add(Group.objects.get(name='Cinema Manager'))  # shouldn't be there
+        user = User.objects.only('username').get(id=user.id)
+        user.save()
+        self.assertEqual(self.role_groups(user), {'Student'})
+
+    def test_role_group_ids_are_cached(self):
+        User.role_group_ids()
+        with self.assertNumQueries(0):
+            ids = User.role_group_ids()
+        self.assertEqual(ids[User.Role.STUDENT], Group.objects.get(name='Student').id)
+
+        # until a Group changes
+        Group.objects.create(name='Projectionists')
+        with self.assertNumQueries(1):
+            User.role_group_ids()
+
+
+class PrincipalTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='flynn', role=User.Role.ACCOUNT_MANAGER)
+        self.client.force_login(self.user)
+
+    def test_home_only_loads_the_session_and_user(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        principal = response.context['principal']
+        self.assertEqual((principal.user_id, principal.role), (self.user.id, User.Role.ACCOUNT_MANAGER))
+        self.assertEqual(principal.group_ids, {Group.objects.get(name='Account Manager').id})
+
+    def test_anonymous_principal(self):
+        self.client.logout()
+        principal = self.client.get(reverse('home')).context['principal']
+        self.assertFalse(principal.is_authenticated)
+        self.assertFalse(principal.has_role(*User.Role))
+
+    def test_groups_are_looked_up_again_when_the_role_changes(self):
+        self.user.role = User.Role.CINEMA_MANAGER
+        self.user.save()
+        principal = self.client.get(reverse('home')).context['principal']
+        self.assertEqual(principal.role, User.Role.CINEMA_MANAGER)
+        self.assertEqual(principal.group_ids, {Group.objects.get(name='Cinema Manager').id})
+        # and the role checks go by it
+        self.assertEqual(self.client.get(reverse('account_page')).url, reverse('cinema_manager_view'))
+        self.assertEqual(self.client.get(reverse('show_all_bookings')).status_code, 200)
+
 
-# Create your tests here.
+class UserIndexesTest(TestCase):
+    def test_indexes_work_without_partial_index_support(self):
+        # as on MySQL, where a partial index would be skipped (with a warning)
+        with mock.patch.object(connection.features, 'supports_partial_indexes', False):
+            self.assertEqual(User.check(databases=['default']), [])
+        with connection.cursor() as cursor:
+            # how Django filters on is_active=False on MySQL
+            cursor.execute(f'EXPLAIN QUERY PLAN SELECT id FROM "{User._meta.db_table}" WHERE is_active = 0')
+            plan = str(cursor.fetchall())
+        self.assertIn('user_is_active_idx', plan)
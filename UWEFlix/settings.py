@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'UWEAuth.middleware.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
+                'UWEAuth.context_processors.principal',
                 'django.contrib.messages.context_processors.messages',
             ],
         },
@@ -76,22 +79,26 @@ WSGI_APPLICATION = 'UWEFlix.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.mysql',  
-#         'NAME': 'DAESD',  
-#         'USER': 'root',  
-#         'PASSWORD': 'root',  
-#         'HOST': 'mysql-db',  
-#         'PORT': '3306',  
-#     }
-# }
-
-DATABASES = {
-    'default': {
+# chosen with the DATABASE_BACKEND environment variable: 'sqlite' (the default,
+# a file which only processes on the same machine can share) or 'mysql' (the
+# mysql-db service in docker-compose.yml, which the web app and the email
+# worker's containers both use, so the worker sees the emails the app queues)
+DATABASE_BACKENDS = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': 'daesd.sqlite3',
-    }
+    },
+    'mysql': {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': 'DAESD',
+        'USER': 'root',
+        'PASSWORD': 'root',
+        'HOST': 'mysql-db',
+        'PORT': '3306',
+    },
+}
+DATABASES = {
+    'default': DATABASE_BACKENDS[os.environ.get('DATABASE_BACKEND', 'sqlite')],
 }
 
 # Password validation
@@ -147,3 +154,49 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 # Ends the sessions after 20 minutes (20 * 60 seconds)
 SESSION_COOKIE_AGE = 60 * 20
+
+# How long seats are held for a customer between picking their tickets and
+# paying for them (in seconds), the same as a session so neither outlives the other
+SEAT_HOLD_SECONDS = SESSION_COOKIE_AGE
+
+# Cache shared by the app's worker processes (see UWEFlixApp/cache.py), chosen
+# with the CACHE_BACKEND environment variable: 'locmem' (the default, which is
+# only shared within each process), 'filesystem' or 'redis'. CACHE_LOCATION
+# overrides where the cache lives (a directory, or a redis:// URL).
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'uweflix'),
+    'filesystem': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://redis:6379'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')]
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_LOCATION),
+    }
+}
+
+# Where booking confirmation emails are sent from (see UWEFlixApp/outbox.py)
+EMAIL_API_URL = 'http://django-rest-api:8001/my-api/'
+
+# How the app calls other services, like the email API (see
+# UWEFlixApp/service_client.py): calls time out if the service can't be
+# connected to within 3s or doesn't answer within 10s, and are retried up to
+# twice, but with no more than 1 retry for every 5 calls overall (after the
+# first 10). After 5 failures in a row a service isn't called again for 30s.
+SERVICE_CONNECT_TIMEOUT_SECONDS = 3.05
+SERVICE_READ_TIMEOUT_SECONDS = 10
+SERVICE_MAX_RETRIES = 2
+SERVICE_RETRY_BUDGET_RATIO = 0.2
+SERVICE_CIRCUIT_FAILURE_THRESHOLD = 5
+SERVICE_CIRCUIT_RESET_SECONDS = 30
+# how long a worker has to make an attempt at sending an email before another
+# worker can try it, which is longer than the calls to the email API can take
+# (see the SERVICE_* settings above)
+OUTBOX_ATTEMPT_TIMEOUT_SECONDS = 30
+# failed emails are retried after 30s, 1m, 2m, 4m... up to an hour apart, until
+# they've been tried 10 times (over about 3 hours)
+OUTBOX_RETRY_BACKOFF_SECONDS = 30
+OUTBOX_RETRY_BACKOFF_MAX_SECONDS = 60 * 60
+OUTBOX_MAX_ATTEMPTS = 10
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from .models import Screening, Screen, Movie
+from .models import OutboxEmail, Screening, Screen, Movie
 
 admin.site.register(Screen)
 admin.site.register(Movie)
 admin.site.register(Screening)
+admin.site.register(OutboxEmail)
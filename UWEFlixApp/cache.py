@@ -0,0 +1,149 @@
+"""
+Helpers for caching things in the shared Django cache (see CACHES in settings).
+
+Cached values are grouped into namespaces. Every key in a namespace includes
+the namespace's version stamp, so the whole namespace can be invalidated at
+once by bumping its version with bump_version() (the old entries are simply
+never looked up again and expire or get evicted in their own time), while
+single entries can still be removed with delete().
+
+Hits and misses are counted per namespace in the cache itself, so that they
+add up across every worker process; see stats().
+"""
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.utils import timezone
+
+# every namespace used by the app, so their stats can be listed
+NAMESPACES = ('ticket_prices', 'showtimes')
+
+PREFIX = 'UWEFlixApp'
+
+
+def version(namespace):
+    """
+    The current version stamp of the namespace, created if it doesn't have one
+    yet (or it has been evicted, which is as good as bumping it).
+    """
+    key = f'{PREFIX}:{namespace}:version'
+    current = cache.get(key)
+    if current is None:
+        if cache.add(key, uuid4().hex, timeout=None):
+            cache.set(f'{PREFIX}:{namespace}:modified', timezone.now(), timeout=None)
+        current = cache.get(key)
+    return current
+
+
+def last_modified(namespace):
+    """
+    When the namespace's version last changed, i.e. the last time anything in
+    it could have changed, for Last-Modified headers
+    """
+    key = f'{PREFIX}:{namespace}:modified'
+    modified = cache.get(key)
+    if modified is None:  # evicted, so assume the worst
+        cache.add(key, timezone.now(), timeout=None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_version(namespace):
+    """
+    Invalidates everything cached in the namespace.
+
+    The version is changed straight away, so that the current transaction sees
+    its own changes, and again once it commits, in case another process
+    cached the old data in between.
+    """
+    def new_version():
+        cache.set_many({
+            f'{PREFIX}:{namespace}:version': uuid4().hex,
+            f'{PREFIX}:{namespace}:modified': timezone.now(),
+        }, timeout=None)
+    new_version()
+    transaction.on_commit(new_version)
+
+
+def make_key(namespace, *parts):
+    """
+    The cache key for the thing identified by parts in the namespace, at the
+    namespace's current version
+    """
+    return ':'.join(str(part) for part in (PREFIX, namespace, version(namespace), *parts))
+
+
+def get_or_set(namespace, parts, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the value cached under parts in the namespace, or if there isn't
+    one, calls compute() for it and caches that for timeout seconds.
+    """
+    key = make_key(namespace, *parts)
+    value = cache.get(key)
+    if value is not None:
+        record_hit(namespace)
+        return value
+    record_miss(namespace)
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+def delete(namespace, *parts):
+    """
+    Removes the value cached under parts in the namespace, now and again once
+    the current transaction commits (see bump_version())
+    """
+    key = make_key(namespace, *parts)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _count(namespace, outcome):
+    key = f'{PREFIX}:{namespace}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:  # not counted yet
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)  # someone else started counting first
+
+
+def record_hit(namespace):
+    _count(namespace, 'hits')
+
+
+def record_miss(namespace):
+    _count(namespace, 'misses')
+
+
+def stats():
+    """
+    The hit and miss counts of every namespace, as
+    {namespace: {'hits': ..., 'misses': ..., 'hit_rate': ...}}
+    """
+    counts = cache.get_many([
+        f'{PREFIX}:{namespace}:{outcome}'
+        for namespace in NAMESPACES for outcome in ('hits', 'misses')
+    ])
+    result = {}
+    for namespace in NAMESPACES:
+        hits = counts.get(f'{PREFIX}:{namespace}:hits', 0)
+        misses = counts.get(f'{PREFIX}:{namespace}:misses', 0)
+        result[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+        }
+    return result
+
+
+def reset_stats():
+    """
+    Zeroes the hit and miss counts of every namespace
+    """
+    cache.delete_many([
+        f'{PREFIX}:{namespace}:{outcome}'
+        for namespace in NAMESPACES for outcome in ('hits', 'misses')
+    ])
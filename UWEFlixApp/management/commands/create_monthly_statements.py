@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from UWEFlixApp.statements import create_monthly_statements
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates (or brings up to date) every Club's monthly statement for the "
+        "given month, or this month if none is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', nargs='?', help='the month to create statements for, as YYYY-MM')
+
+    def handle(self, *args, month=None, **options):
+        if month is not None:
+            try:
+                month = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f'"{month}" is not a month in the form YYYY-MM')
+        written = create_monthly_statements(month)
+        self.stdout.write(self.style.SUCCESS(f'{written} monthly statement(s) written'))
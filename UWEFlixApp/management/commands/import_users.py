@@ -0,0 +1,50 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from UWEFlixApp.provisioning import FIELDS, generate_password, import_users, read_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates Users in bulk from a CSV or JSON file, with the columns "
+        f"{', '.join(FIELDS)}. Rows that can't be imported are listed with why, "
+        "and the rest are imported regardless."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='the CSV or JSON file of Users, or - for stdin')
+        parser.add_argument('--format', choices=('csv', 'json'),
+                            help="the file's format, if it isn't clear from its extension")
+        parser.add_argument('--generate-passwords', action='store_true',
+                            help='give Users without a password a random one, which is written out')
+        parser.add_argument('--workers', type=int, help='processes to hash passwords with (default: one per CPU)')
+
+    def handle(self, *args, file, format=None, generate_passwords=False, workers=None, **options):
+        if format is None:
+            format = os.path.splitext(file)[1].lstrip('.').lower()
+            if format not in ('csv', 'json'):
+                raise CommandError('Give the --format of the file')
+        try:
+            if file == '-':
+                rows = read_users(sys.stdin, format)
+            else:
+                with open(file, newline='', encoding='utf-8') as f:
+                    rows = read_users(f, format)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Couldn't read {file}: {e}")
+
+        generated = {}
+        if generate_passwords:
+            for row in rows:
+                if not row.get('password'):
+                    row['password'] = generated[str(row.get('username'))] = generate_password()
+
+        created, rejected = import_users(rows, workers=workers)
+        for number, reason in rejected:
+            self.stderr.write(f'Row {number}: {reason}')
+        for user in created:
+            if user.username in generated:
+                self.stdout.write(f'{user.username},{generated[user.username]}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} user(s) imported, {len(rejected)} row(s) rejected'))
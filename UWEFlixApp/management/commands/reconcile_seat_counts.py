@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from UWEFlixApp.models import Screening
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes every Screening's seats-sold and seats-held counters from "
+        "its Bookings and SeatHolds, correcting any that have drifted."
+    )
+
+    def handle(self, *args, **options):
+        drifted = Screening.reconcile_seat_counts()
+        for screening_id, old_sold, old_held, sold, held in drifted:
+            self.stdout.write(
+                f'Screening {screening_id}: {old_sold} -> {sold} seats sold, '
+                f'{old_held} -> {held} seats held'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} Screening(s) corrected'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from UWEFlixApp.models import SeatHold
+
+
+class Command(BaseCommand):
+    help = (
+        "Releases the seats of every expired SeatHold back to its Screening. "
+        "Expired holds are also released lazily whenever they stand in the way "
+        "of a booking, so this only needs running periodically (e.g. from cron) "
+        "to keep the seats-remaining counts shown to customers accurate."
+    )
+
+    def handle(self, *args, **options):
+        released = SeatHold.release_expired()
+        self.stdout.write(self.style.SUCCESS(f'{released} held seat(s) released'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from UWEFlixApp import service_client
+from UWEFlixApp.outbox import send_due_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the emails waiting in the outbox, retrying any that fail later on. "
+        "With --watch, keeps checking for new emails until stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true', help='keep running, sending emails as they are queued')
+        parser.add_argument('--interval', type=float, default=1, help='seconds between checks when watching')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, watch=False, interval=1, batch_size=100, **options):
+        while True:
+            sent, failed = send_due_emails(batch_size)
+            if sent or failed or not watch:
+                self.stdout.write(f'{sent} email(s) sent, {failed} failed')
+                if options['verbosity'] > 1:
+                    self.write_latencies()
+            if not watch:
+                return
+            if sent + failed < batch_size:  # otherwise there may be more due already
+                time.sleep(interval)
+
+    def write_latencies(self):
+        for name, stats in service_client.stats().items():
+            for call, latency in stats['calls'].items():
+                self.stdout.write(
+                    f"{name} {call}: {latency['calls']} call(s), p50 <= {latency['p50_ms']}ms, "
+                    f"p95 <= {latency['p95_ms']}ms, p99 <= {latency['p99_ms']}ms "
+                    f"(circuit {stats['circuit']}, {stats['retries']} retries)"
+                )
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def count_seats_sold(apps, schema_editor):
+    """
+    Fill in the new counter from any Bookings which already exist
+    """
+    Booking = apps.get_model('UWEFlixApp', 'Booking')
+    Screening = apps.get_model('UWEFlixApp', 'Screening')
+    seats_sold = Booking.objects.filter(
+        screening=OuterRef('id'),
+        status__in=('Active', 'Cancellation Requested')
+    ).order_by().values('screening').annotate(
+        total=Sum(
+            F('number_of_adult_tickets') +
+            F('number_of_child_tickets') +
+            F('number_of_student_tickets')
+        )
+    ).values('total')
+    Screening.objects.update(
+        seats_sold=Coalesce(Subquery(seats_sold, output_field=models.IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UWEFlixApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screening',
+            name='seats_sold',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_seats_sold, lambda a, s: None),  # column is dropped on backwards migrate anyway
+    ]
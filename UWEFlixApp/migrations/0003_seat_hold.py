@@ -0,0 +1,29 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:28
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UWEFlixApp', '0002_screening_seats_sold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screening',
+            name='seats_held',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', models.IntegerField(validators=[django.core.validators.MinValueValidator(limit_value=1)])),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('screening', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='UWEFlixApp.screening')),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+def set_finishing_times(apps, schema_editor):
+    """
+    Work out the finishing time of every existing Screening from its Movie
+    """
+    Screening = apps.get_model('UWEFlixApp', 'Screening')
+    screenings = list(Screening.objects.select_related('movie'))
+    for screening in screenings:
+        screening.finishing_at = screening.showing_at + screening.movie.running_time
+    Screening.objects.bulk_update(screenings, ['finishing_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UWEFlixApp', '0003_seat_hold'),
+    ]
+
+    operations = [
+        # added as nullable first, so existing rows can be filled in before the
+        # constraint is applied
+        migrations.AddField(
+            model_name='screening',
+            name='finishing_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_finishing_times, lambda a, s: None),  # column is dropped on backwards migrate anyway
+        migrations.AlterField(
+            model_name='screening',
+            name='finishing_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['screen', 'showing_at', 'finishing_at'], name='screening_screen_interval_idx'),
+        ),
+    ]
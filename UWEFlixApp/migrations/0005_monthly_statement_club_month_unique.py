@@ -0,0 +1,32 @@
+# Generated by Django 4.1.6 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+def merge_statements_by_month(apps, schema_editor):
+    """
+    Date every existing statement by the first day of its month, keeping only
+    the latest statement for each Club and month
+    """
+    MonthlyStatement = apps.get_model('UWEFlixApp', 'MonthlyStatement')
+    latest = {}
+    for statement in MonthlyStatement.objects.order_by('id'):
+        statement.date = statement.date.replace(day=1)
+        latest[(statement.club_id, statement.date)] = statement
+    MonthlyStatement.objects.exclude(id__in=[s.id for s in latest.values()]).delete()
+    MonthlyStatement.objects.bulk_update(latest.values(), ['date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UWEFlixApp', '0004_screening_finishing_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_statements_by_month, lambda a, s: None),  # the old dates are lost, but nothing depends on them
+        migrations.AddConstraint(
+            model_name='monthlystatement',
+            constraint=models.UniqueConstraint(fields=('club', 'date'), name='monthly_statement_club_month_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.6 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UWEFlixApp', '0005_monthly_statement_club_month_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['club', 'date'], name='booking_club_date_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('UWEFlixApp', '0007_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'date'], name='booking_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'date'], name='booking_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['screening', 'status'], name='booking_screening_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['movie', 'showing_at'], name='screening_movie_showing_idx'),
+        ),
+        # the composite indexes above lead with these foreign keys, so their own
+        # indexes can go (MySQL needs an index on each, which they now have first)
+        migrations.AlterField(
+            model_name='booking',
+            name='club',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='UWEFlixApp.club'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='screening',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='UWEFlixApp.screening'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='screening',
+            name='movie',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='UWEFlixApp.movie'),
+        ),
+        migrations.AlterField(
+            model_name='screening',
+            name='screen',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='UWEFlixApp.screen'),
+        ),
+    ]
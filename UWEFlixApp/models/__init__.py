@@ -2,6 +2,8 @@ from .booking import Booking
 from .club import Club
 from .monthly_statement import MonthlyStatement
 from .movie import Movie
+from .outbox_email import OutboxEmail
 from .screen import Screen
 from .screening import Screening
+from .seat_hold import SeatHold
 from .ticket import Ticket
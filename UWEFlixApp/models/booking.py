@@ -1,5 +1,6 @@
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
 
 class Status(models.TextChoices):
@@ -8,10 +9,21 @@ class Status(models.TextChoices):
     CANCELLED = ('Cancelled')
 
 
+class NotEnoughSeats(ValidationError):
+    def __init__(self, message='Not enough seats remaining for this Screening', *args, **kwargs):
+        super().__init__(message, *args, **kwargs)
+
+
 class Booking(models.Model):
     Status = Status
-    user = models.ForeignKey('UWEAuth.User', on_delete=models.CASCADE, null=True, blank=True)
-    screening = models.ForeignKey('Screening', on_delete=models.CASCADE)
+    NotEnoughSeats = NotEnoughSeats
+    # Bookings in any of these states still occupy their seats in the Screening
+    SEAT_HOLDING_STATUSES = (Status.ACTIVE, Status.CANCELLATION_REQUESTED)
+
+    # the foreign keys are indexed by the composite indexes they lead (see Meta)
+    # rather than each having an index of their own as well
+    user = models.ForeignKey('UWEAuth.User', on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    screening = models.ForeignKey('Screening', on_delete=models.CASCADE, db_index=False)
     number_of_adult_tickets = models.IntegerField()
     number_of_child_tickets = models.IntegerField()
     number_of_student_tickets = models.IntegerField()
@@ -21,8 +33,81 @@ class Booking(models.Model):
         null=True,
         validators=[MinValueValidator(limit_value=0)]  # can't be negative
     )
-    club = models.ForeignKey('Club', on_delete=models.CASCADE, null=True, blank=True)
+    club = models.ForeignKey('Club', on_delete=models.CASCADE, null=True, blank=True, db_index=False)
     date = models.DateTimeField(auto_now=True, blank=True, null=True, max_length=100)
     status = models.CharField(max_length=25, choices=Status.choices, default=Status.ACTIVE)
+
+    # (screening_id, seats_taken) as last read from/written to the db, so that
+    # .save() knows how much to move the Screening's seats-sold counter by
+    _seats_as_stored = (None, 0)
+
+    class Meta:
+        indexes = [
+            # a Club's transactions for a month (see UWEFlixApp.transactions)
+            models.Index(fields=['club', 'date'], name='booking_club_date_idx'),
+            # a User's bookings for a month
+            models.Index(fields=['user', 'date'], name='booking_user_date_idx'),
+            # the cancellation requests, by date
+            models.Index(fields=['status', 'date'], name='booking_status_date_idx'),
+            # the Bookings holding a Screening's seats (see Screening.reconcile_seat_counts())
+            models.Index(fields=['screening', 'status'], name='booking_screening_status_idx'),
+        ]
+
     def __str__(self):
         return str(self.user)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields():
+            instance._seats_as_stored = (instance.screening_id, instance.seats_taken)
+        else:  # unknown, .save() will have to look it up
+            instance._seats_as_stored = None
+        return instance
+
+    @classmethod
+    def objects_with_details(cls):
+        """
+        Returns a QuerySet of Bookings with everything shown alongside them in
+        lists of Bookings (their User, Club, Movie and Screen) fetched in the
+        same query, rather than one query per Booking for each of them
+        """
+        return cls.objects.select_related('user', 'club', 'screening__movie', 'screening__screen')
+
+    @property
+    def number_of_tickets(self):
+        return self.number_of_adult_tickets + self.number_of_child_tickets + self.number_of_student_tickets
+
+    @property
+    def seats_taken(self):
+        """
+        The number of seats this Booking currently occupies in its Screening
+        """
+        if self.status in self.SEAT_HOLDING_STATUSES:
+            return self.number_of_tickets
+        return 0
+
+    def save(self, *args, **kwargs):
+        """
+        Override .save() to keep the seats-sold counter of the Screening(s)
+        involved in step with this Booking's tickets and status.
+
+        Raises NotEnoughSeats (and saves nothing) if the Screening doesn't have
+        enough seats left for the Booking.
+        """
+        from .screening import Screening  # avoid circular import
+
+        with transaction.atomic():
+            if self._seats_as_stored is None:
+                self._seats_as_stored = Booking.objects.get(pk=self.pk)._seats_as_stored
+            old_screening_id, old_seats = self._seats_as_stored
+            if old_screening_id != self.screening_id:
+                if old_screening_id is not None:
+                    Screening.adjust_seats_sold(old_screening_id, -old_seats)
+                seats_available = Screening.adjust_seats_sold(self.screening_id, self.seats_taken)
+            else:
+                seats_available = Screening.adjust_seats_sold(self.screening_id, self.seats_taken - old_seats)
+            if not seats_available:
+                raise NotEnoughSeats()  # also rolls back any seats released above
+            super().save(*args, **kwargs)
+        self._seats_as_stored = (self.screening_id, self.seats_taken)
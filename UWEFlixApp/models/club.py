@@ -1,12 +1,21 @@
 import hashlib
 
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F
 
 from UWEAuth.models import User
 
 
+class InsufficientFunds(ValidationError):
+    def __init__(self, message='Insufficient funds', *args, **kwargs):
+        super().__init__(message, *args, **kwargs)
+
+
 class Club(models.Model):
+    InsufficientFunds = InsufficientFunds
+
     name = models.CharField(max_length=25)
     '''
     TODO: using a third party model field type for credit card details or better
@@ -42,3 +51,33 @@ class Club(models.Model):
     
     def check_card(self, card_number):
         return self.card_number == hashlib.sha3_512(card_number.encode()).hexdigest()
+
+    @staticmethod
+    def debit(club_id, amount):
+        """
+        Atomically takes amount from the Club's balance, without reading it
+        first so that concurrent debits can't overwrite each other.
+
+        Raises InsufficientFunds (and takes nothing) if the balance is too low.
+        """
+        if not Club.objects.filter(id=club_id, balance__gte=amount).update(
+            balance=F('balance') - amount
+        ):
+            raise InsufficientFunds()
+
+    @staticmethod
+    def credit(club_id, amount):
+        """
+        Atomically adds amount to the Club's balance
+        """
+        Club.objects.filter(id=club_id).update(balance=F('balance') + amount)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # never write back our (possibly stale) copy of the balance, use
+            # .debit() and .credit() to change it instead
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'balance'
+            ]
+        return super().save(*args, **kwargs)
@@ -3,8 +3,15 @@ from django.db import models
 
 class MonthlyStatement(models.Model):
     club = models.ForeignKey('Club', on_delete=models.CASCADE)
-    date = models.DateField()
+    date = models.DateField()  # the first day of the month the statement is for
     amount = models.DecimalField(decimal_places=2, max_digits=10)
 
+    class Meta:
+        constraints = [
+            # one statement per Club per month, so that statements can be
+            # regenerated without duplicating them
+            models.UniqueConstraint(fields=['club', 'date'], name='monthly_statement_club_month_unique'),
+        ]
+
     def __str__(self):
         return str(self.id)
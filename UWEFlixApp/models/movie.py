@@ -2,7 +2,8 @@ from datetime import timedelta
 from math import ceil
 
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F
 
 
 class Movie(models.Model):
@@ -29,8 +30,32 @@ class Movie(models.Model):
     def minutes_long(self):
         return str(ceil(self.running_time.total_seconds() / 60))
     
+    # running_time as last read from/written to the db, so that .save() knows
+    # whether the stored finishing times of this Movie's Screenings need moving
+    _running_time_as_stored = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._running_time_as_stored = instance.__dict__.get('running_time')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.image:
             self.image.name = self.DEFAULT_IMAGE
 
-        super(Movie, self).save(*args, **kwargs)
+        running_time_changed = (
+            not self._state.adding and self._running_time_as_stored != self.running_time
+        )
+        if running_time_changed:
+            with transaction.atomic():
+                super(Movie, self).save(*args, **kwargs)
+                self.screening_set.update(
+                    finishing_at=ExpressionWrapper(
+                        F('showing_at') + self.running_time,
+                        output_field=models.DateTimeField()
+                    )
+                )
+        else:
+            super(Movie, self).save(*args, **kwargs)
+        self._running_time_as_stored = self.running_time
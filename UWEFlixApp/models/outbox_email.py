@@ -0,0 +1,118 @@
+from datetime import timedelta
+import random
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+
+class Status(models.TextChoices):
+    PENDING = ('Pending')
+    SENT = ('Sent')
+    FAILED = ('Failed')  # gave up after too many attempts
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent through the email API, so that the request
+    which wants it sent doesn't have to wait for it (or fail because of it).
+    Emails are sent by a separate worker (see the send_outbox_emails command),
+    which retries failures with exponential backoff.
+    """
+    Status = Status
+
+    payload = models.JSONField()  # what to POST to the email API
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's query for emails that are due
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email to {self.payload.get('email')} ({self.status})"
+
+    @classmethod
+    def due(cls):
+        return cls.objects.filter(status=Status.PENDING, next_attempt_at__lte=timezone.now())
+
+    def _while_claimed(self):
+        """
+        This email as a QuerySet, which is empty unless it's still pending
+        with the next_attempt_at this instance last saw. That's the lease
+        claim() sets, so once another worker has claimed the email (or it's
+        been marked sent or failed) updates through it do nothing.
+        """
+        return OutboxEmail.objects.filter(id=self.id, status=Status.PENDING, next_attempt_at=self.next_attempt_at)
+
+    def claim(self):
+        """
+        Marks this email as being attempted, so that no other worker picks it up
+        until the attempt has had time to finish. The check and the update are
+        a single UPDATE, so of several workers racing for the same email only
+        one of them gets it. Returns whether this one did.
+        """
+        lease_until = timezone.now() + timedelta(seconds=settings.OUTBOX_ATTEMPT_TIMEOUT_SECONDS)
+        claimed = self._while_claimed().update(attempts=F('attempts') + 1, next_attempt_at=lease_until)
+        if claimed:
+            self.attempts += 1
+            self.next_attempt_at = lease_until
+        return bool(claimed)
+
+    def release(self, retry_at):
+        """
+        Gives up the claim on this email without it counting as an attempt
+        (e.g. because the email API is known to be down), to be tried again
+        at retry_at. Like claim(), it's a single UPDATE, which only applies
+        while this worker still holds the claim.
+        """
+        released = self._while_claimed().update(attempts=F('attempts') - 1, next_attempt_at=retry_at)
+        if released:
+            self.attempts -= 1
+            self.next_attempt_at = retry_at
+        return bool(released)
+
+    def _update_while_claimed(self, **fields):
+        updated = self._while_claimed().update(**fields)
+        if updated:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        return bool(updated)
+
+    def mark_sent(self):
+        """
+        Records that the email was sent, unless this worker's claim on it ran
+        out and another worker has claimed it since (in which case that
+        worker's attempt decides what becomes of it). Returns whether it was
+        recorded.
+        """
+        return self._update_while_claimed(status=Status.SENT, sent_at=timezone.now(), last_error='')
+
+    def retry_delay(self):
+        """
+        How long to wait before the next attempt: doubling with every attempt
+        made so far, up to a limit, and jittered so that emails which failed
+        together don't all retry together
+        """
+        delay = min(
+            settings.OUTBOX_RETRY_BACKOFF_SECONDS * 2 ** (self.attempts - 1),
+            settings.OUTBOX_RETRY_BACKOFF_MAX_SECONDS
+        )
+        return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+    def mark_failed(self, error):
+        """
+        Records a failed attempt, scheduling another one unless there have been
+        too many already. Like mark_sent(), only while this worker still holds
+        the claim, returning whether it did.
+        """
+        if self.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            return self._update_while_claimed(status=Status.FAILED, last_error=str(error))
+        return self._update_while_claimed(next_attempt_at=timezone.now() + self.retry_delay(), last_error=str(error))
@@ -1,15 +1,34 @@
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Case, F, IntegerField, Sum, Q, When
+from django.db.models import F, IntegerField, Max, OuterRef, Subquery, Sum
 from django.db.models.functions import Coalesce
 
 from UWEFlixApp.models import Booking, Movie, Screen
 
 
 class Screening(models.Model):
-    movie = models.ForeignKey('Movie', on_delete=models.CASCADE)
-    screen = models.ForeignKey('Screen', on_delete=models.CASCADE)
+    # indexed by the composite indexes they lead (see Meta)
+    movie = models.ForeignKey('Movie', on_delete=models.CASCADE, db_index=False)
+    screen = models.ForeignKey('Screen', on_delete=models.CASCADE, db_index=False)
     showing_at = models.DateTimeField(auto_now=False, auto_now_add=False)
+    # stored rather than worked out from the Movie so clash checks can be indexed,
+    # set by .save() and kept up to date by Movie.save()
+    finishing_at = models.DateTimeField(editable=False)
+    # denormalised counts of seats taken by Bookings and held by SeatHolds,
+    # maintained by Booking.save() and SeatHold
+    seats_sold = models.IntegerField(default=0, editable=False)
+    seats_held = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = (
+            # clash checks, and a Screen's Screenings in order of showing
+            models.Index(
+                fields=('screen', 'showing_at', 'finishing_at'),
+                name='screening_screen_interval_idx'
+            ),
+            # a Movie's showtimes (see UWEFlixApp.showtimes)
+            models.Index(fields=('movie', 'showing_at'), name='screening_movie_showing_idx'),
+        )
 
     def __str__(self):
          return f"{self.movie} - {self.showing_at}"
@@ -17,58 +36,116 @@ class Screening(models.Model):
     @classmethod
     def objects_with_seats_remaining(cls):
         return cls.objects.annotate(
-            _seats_remaining=F('screen__capacity') - (
-                # subtract the sum of each ticket type across all bookings for this screening from the screen capacity
-                Case(
-                    When(
-                        booking__status__in=(Booking.Status.ACTIVE, Booking.Status.CANCELLATION_REQUESTED),
-                        then=Coalesce(Sum('booking__number_of_adult_tickets'), 0)
-                    ),
-                    default=0,
-                    output_field=IntegerField()
-                ) +
-                Case(
-                    When(
-                        booking__status__in=(Booking.Status.ACTIVE, Booking.Status.CANCELLATION_REQUESTED),
-                        then=Coalesce(Sum('booking__number_of_child_tickets'), 0)
-                    ),
-                    default=0,
-                    output_field=IntegerField()
-                ) +
-                Case(
-                    When(
-                        booking__status__in=(Booking.Status.ACTIVE, Booking.Status.CANCELLATION_REQUESTED),
-                        then=Coalesce(Sum('booking__number_of_student_tickets'), 0)
-                    ),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            )
+            _seats_remaining=F('screen__capacity') - F('seats_sold') - F('seats_held')
         )
 
     @property
     def seats_remaining(self):
         """
         Reuse existing queryset wrapper.
-        
-        A bit awkward but less code duplication.
+
+        If this Screening was loaded by objects_with_seats_remaining(), the
+        number it was annotated with is used, so that listing many Screenings
+        doesn't take a query for each. Otherwise the counters are always
+        re-read, as other Bookings may have been made since it was loaded.
         """
+        if '_seats_remaining' in self.__dict__:
+            return self._seats_remaining
         return Screening.objects_with_seats_remaining(
         ).filter(id=self.id).values_list('_seats_remaining')[0][0]
 
+    @staticmethod
+    def _adjust_seat_counter(counter, screening_id, change):
+        """
+        Atomically moves one of the seat counters of the given Screening by
+        change many seats (which may be negative), without reading it first.
+
+        Taking seats is conditional on there being enough of them left, the
+        check and the increment being a single UPDATE so that concurrent
+        Bookings can never oversell the Screen. If there aren't enough, any
+        expired SeatHolds on the Screening are released and it is tried again.
+        Returns whether it succeeded.
+        """
+        from .seat_hold import SeatHold  # avoid circular import
+
+        if change > 0:
+            capacity = Subquery(Screen.objects.filter(id=OuterRef('screen_id')).values('capacity'))
+            seats_available = Screening.objects.filter(
+                id=screening_id, seats_sold__lte=capacity - F('seats_held') - change
+            )
+            if seats_available.update(**{counter: F(counter) + change}):
+                return True
+            return (
+                SeatHold.release_expired(screening_id=screening_id) > 0 and
+                seats_available.update(**{counter: F(counter) + change}) > 0
+            )
+        if change < 0:
+            Screening.objects.filter(id=screening_id).update(**{counter: F(counter) + change})
+        return True
+
+    @staticmethod
+    def adjust_seats_sold(screening_id, change):
+        """
+        Moves the seats-sold counter, see _adjust_seat_counter()
+        """
+        return Screening._adjust_seat_counter('seats_sold', screening_id, change)
+
+    @staticmethod
+    def adjust_seats_held(screening_id, change):
+        """
+        Moves the seats-held counter, see _adjust_seat_counter()
+        """
+        return Screening._adjust_seat_counter('seats_held', screening_id, change)
+
     @classmethod
-    def objects_with_finish_times(cls):
+    def objects_with_seats_recounted(cls):
         """
-        Ideally, we'd turn this into a custom Manager, alas!
+        Annotates each Screening with the number of seats its Bookings and
+        SeatHolds actually occupy, for checking the seat counters against.
         """
-        # return cls.objects.prefetch_related('movie').annotate(
+        from .seat_hold import SeatHold  # avoid circular import
+
+        seats_sold = Booking.objects.filter(
+            screening=OuterRef('id'),
+            status__in=Booking.SEAT_HOLDING_STATUSES
+        ).order_by().values('screening').annotate(
+            total=Sum(
+                F('number_of_adult_tickets') +
+                F('number_of_child_tickets') +
+                F('number_of_student_tickets')
+            )
+        ).values('total')
+        seats_held = SeatHold.objects.filter(
+            screening=OuterRef('id')
+        ).order_by().values('screening').annotate(total=Sum('seats')).values('total')
         return cls.objects.annotate(
-            _finishing_at=(models.F('showing_at') + models.F('movie__running_time'))
+            _seats_sold_recounted=Coalesce(Subquery(seats_sold, output_field=IntegerField()), 0),
+            _seats_held_recounted=Coalesce(Subquery(seats_held, output_field=IntegerField()), 0),
         )
 
-    @property
-    def finishing_at(self):
-        return self.showing_at + self.movie.running_time
+    @classmethod
+    def reconcile_seat_counts(cls):
+        """
+        Recomputes the seats_sold and seats_held counters of every Screening
+        from its Bookings and SeatHolds, correcting any which have drifted (e.g.
+        because of raw or bulk writes to the Booking table which bypass
+        Booking.save()).
+
+        Returns a list of (screening id, old sold, old held, recounted sold,
+        recounted held) for each Screening that was corrected.
+        """
+        drifted = list(
+            cls.objects_with_seats_recounted().exclude(
+                seats_sold=F('_seats_sold_recounted'),
+                seats_held=F('_seats_held_recounted'),
+            ).values_list(
+                'id', 'seats_sold', 'seats_held',
+                '_seats_sold_recounted', '_seats_held_recounted'
+            )
+        )
+        for screening_id, _, _, sold, held in drifted:
+            cls.objects.filter(id=screening_id).update(seats_sold=sold, seats_held=held)
+        return drifted
 
     @property
     def clashes_with_others(self):
@@ -77,23 +154,42 @@ class Screening(models.Model):
         there is at least one other Screening for the same Screen as this one,
         whose time period of showing overlaps with this one's
         """
-        return Screening.objects_with_finish_times().filter(screen=self.screen).filter(
-            # these queries take care of "inside" and "front" or "back" overlaps
-            (~Q(_finishing_at__lte=self.showing_at) & Q(_finishing_at__lte=self.finishing_at)) |
-            (~Q(showing_at__gte=self.finishing_at) & Q(showing_at__gte=self.showing_at)) |
-            # this query takes care of "outside" overlaps
-            Q(showing_at__lte=self.showing_at, _finishing_at__gte=self.finishing_at)
-            # TODO: not sure if we need to provide the inverse of the first two terms in the orientation of the last one?
+        # treating showings as half-open [start, finish) intervals, two overlap
+        # exactly when each starts before the other finishes, which covers all
+        # the "inside", "outside", "front" and "back" cases at once and still
+        # lets a Screening start the very minute the previous one finishes
+        overlapping = Screening.objects.filter(
+            screen_id=self.screen_id,
+            showing_at__lt=self.finishing_at,
+            finishing_at__gt=self.showing_at,
         )
+        # nothing can overlap us that starts earlier than the longest film
+        # before we do, so bound the range scan of the interval index on that
+        longest_film = Movie.objects.aggregate(Max('running_time'))['running_time__max']
+        if longest_film is not None:
+            overlapping = overlapping.filter(showing_at__gt=self.showing_at - longest_film)
+        return overlapping.exclude(id=self.id).exists()
+
+    def set_finishing_at(self):
+        self.finishing_at = self.showing_at + self.movie.running_time
 
     def clean(self, *args, **kwargs):
         """
         Override .clean() to force validation to make sure Screenings do not clash
         """
+        self.set_finishing_at()
         if self.clashes_with_others:
             raise ValidationError('Screening would clash with other Screenings')
         return super().clean(*args, **kwargs)
 
     def save(self, *args, **kwargs):
+        self.set_finishing_at()
         self.full_clean()
+        if not self._state.adding and 'update_fields' not in kwargs:
+            # never write back our (possibly stale) copies of the seat
+            # counters, Bookings made since we were loaded would be lost
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('seats_sold', 'seats_held')
+            ]
         return super().save(*args, **kwargs)
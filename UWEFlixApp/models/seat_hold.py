@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
+
+from UWEFlixApp.models import Screening
+
+
+class SeatHold(models.Model):
+    """
+    Seats put aside on a Screening for a customer while they go through payment,
+    so that nobody else can book them in the meantime. Holds are only good for
+    a limited time, after which they are released back to the Screening.
+    """
+    screening = models.ForeignKey('Screening', on_delete=models.CASCADE)
+    seats = models.IntegerField(validators=[MinValueValidator(limit_value=1)])
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.seats} seat(s) for {self.screening_id} until {self.expires_at}"
+
+    @staticmethod
+    def hold_duration():
+        return timedelta(seconds=settings.SEAT_HOLD_SECONDS)
+
+    @classmethod
+    def hold(cls, screening_id, seats):
+        """
+        Puts seats many seats of the Screening on hold.
+
+        Raises Booking.NotEnoughSeats (and holds nothing) if there aren't enough.
+        """
+        from .booking import NotEnoughSeats  # avoid circular import
+
+        with transaction.atomic():
+            if not Screening.adjust_seats_held(screening_id, seats):
+                raise NotEnoughSeats()
+            return cls.objects.create(
+                screening_id=screening_id,
+                seats=seats,
+                expires_at=timezone.now() + cls.hold_duration()
+            )
+
+    def release(self):
+        """
+        Gives the held seats back to the Screening. Returns whether this call
+        released them, which is False if somebody else already had.
+        """
+        with transaction.atomic():
+            # only the caller who actually deletes the row gets to release the
+            # seats, in case of concurrent releases of the same SeatHold
+            released, _ = SeatHold.objects.filter(id=self.id).delete()
+            if released:
+                Screening.adjust_seats_held(self.screening_id, -self.seats)
+        return bool(released)
+
+    @classmethod
+    def release_expired(cls, screening_id=None):
+        """
+        Releases every SeatHold which has expired (just those on the given
+        Screening, if any), returning how many seats were released.
+        """
+        expired = cls.objects.filter(expires_at__lte=timezone.now())
+        if screening_id is not None:
+            expired = expired.filter(screening_id=screening_id)
+        return sum(hold.seats for hold in expired if hold.release())
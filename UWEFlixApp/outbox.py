@@ -0,0 +1,54 @@
+from django.conf import settings
+
+from .models import OutboxEmail
+from .service_client import CircuitOpenError, get_client
+
+
+def queue_email(payload):
+    """
+    Queues an email to be sent through the email API by the outbox worker,
+    returning straight away. payload is what gets POSTed to the API.
+    """
+    return OutboxEmail.objects.create(payload=payload)
+
+
+def post_to_email_api(payload):
+    """
+    Sends one email through the email API, raising if it wasn't accepted
+    """
+    response = get_client('email_api', settings.EMAIL_API_URL).post(json=payload, call='send email')
+    response.raise_for_status()
+
+
+def send_due_emails(batch_size=100, send=post_to_email_api):
+    """
+    Sends (or retries) up to batch_size of the emails in the outbox which are
+    due, using send(payload) to send each one.
+
+    Several workers can run this at once, as each email is claimed before it's
+    sent. An email that fails to send is retried later with exponential
+    backoff, until it runs out of attempts (see OutboxEmail.mark_failed()).
+    While the email API's circuit breaker is open nothing more is sent, and
+    that doesn't count as an attempt. If an attempt takes so long that
+    another worker claims the email in the meantime, its outcome is left to
+    that worker (so the email may be sent twice, but is never marked sent or
+    failed by both).
+
+    Returns (the number sent, the number that failed), not counting those.
+    """
+    sent = failed = 0
+    for email in OutboxEmail.due().order_by('next_attempt_at')[:batch_size]:
+        if not email.claim():
+            continue  # another worker got to it first
+        try:
+            send(email.payload)
+        except CircuitOpenError as e:
+            email.release(e.retry_at)
+            break
+        except Exception as e:
+            if email.mark_failed(e):
+                failed += 1
+        else:
+            if email.mark_sent():
+                sent += 1
+    return sent, failed
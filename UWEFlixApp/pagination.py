@@ -0,0 +1,294 @@
+"""
+Cursor (AKA keyset) pagination, for lists that can get long, like Bookings.
+
+Django's Paginator finds a page by OFFSET, which means the database reads and
+throws away every row before it, so the deeper the page the slower it is, and
+it counts every row on every page to know how many pages there are. Instead,
+each of our pages links to the next and previous pages with a cursor holding
+the ordering values of the row at its edge, and the next page is just the
+rows ordered after those values, which the database finds by going straight
+to them in an index on the ordering columns. So that the ordering is total,
+the primary key is always the last thing ordered by.
+
+The count (and so the number of pages) is only counted up to count_limit
+rows, after which it's approximate, i.e. "at least".
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+from math import ceil
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject, cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator:
+    """
+    Splits queryset into pages of per_page objects, ordered by ordering (by
+    default the queryset's own ordering) followed by the primary key. The
+    fields ordered by mustn't be null, and are best indexed together
+    with the primary key.
+
+    count_limit is the most rows that will be counted, or None to always
+    count them all, or 0 to not count them at all (in which case num_pages is
+    None).
+    """
+    def __init__(self, queryset, per_page, ordering=None, count_limit=1000):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.count_limit = count_limit
+        self.ordering = self._resolve_ordering(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+
+    def _resolve_ordering(self, ordering):
+        """
+        ordering as a list of (field path, field, descending), ending with the
+        primary key
+        """
+        pk_name = self.queryset.model._meta.pk.name
+        resolved = []
+        for name in ordering:
+            name = str(name)
+            descending = name.startswith('-')
+            path = name.lstrip('-')
+            path = pk_name if path == 'pk' else path
+            resolved.append((path, self._field(path), descending))
+        if not resolved or resolved[-1][0] != pk_name:
+            descending = resolved[0][2] if resolved else False
+            resolved.append((pk_name, self.queryset.model._meta.pk, descending))
+        return resolved
+
+    def _field(self, path):
+        model = self.queryset.model
+        for part in path.split('__'):
+            field = model._meta.get_field(part)
+            model = field.related_model
+        return field
+
+    def _order_by(self, backwards):
+        return [
+            f'{"-" if descending != backwards else ""}{path}'
+            for path, _, descending in self.ordering
+        ]
+
+    def _beyond(self, values, backwards):
+        """
+        A Q for the rows which come after values in the ordering (or before
+        them, if going backwards)
+        """
+        condition = Q()
+        equal_so_far = {}
+        for (path, _, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal_so_far, **{f'{path}__{lookup}': value})
+            equal_so_far[path] = value
+        return condition
+
+    def _values_of(self, obj):
+        values = []
+        for path, _, _ in self.ordering:
+            value = obj
+            for part in path.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, number, obj, backwards):
+        """
+        The cursor for page number, which starts after obj (or ends before it,
+        if backwards)
+        """
+        data = {'n': number, 'v': [_jsonable(value) for value in self._values_of(obj)]}
+        if backwards:
+            data['b'] = 1
+        return urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        (page number, ordering values, backwards) from a cursor, raising
+        InvalidCursor if it isn't one of ours
+        """
+        try:
+            data = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            number, values = int(data['n']), data['v']
+            if len(values) != len(self.ordering) or number < 1:
+                raise ValueError
+            values = [field.to_python(value) for (_, field, _), value in zip(self.ordering, values)]
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise InvalidCursor('That page does not exist')
+        return number, values, bool(data.get('b'))
+
+    def page(self, cursor=None):
+        """
+        The page the cursor leads to, or the first page if there isn't one,
+        raising InvalidCursor if it isn't a cursor
+        """
+        if not cursor:
+            page = self._page(1, None, False)
+        else:
+            page = self._page(*self.decode_cursor(cursor))
+        page.cursor = cursor or ''
+        return page
+
+    def get_page(self, cursor=None):
+        """
+        Like page(), but with the first page for an invalid cursor
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    def _page(self, number, values, backwards):
+        queryset = self.queryset.order_by(*self._order_by(backwards))
+        if values is not None:
+            queryset = queryset.filter(self._beyond(values, backwards))
+
+        def load():
+            rows = list(queryset[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            if backwards:
+                rows.reverse()
+                return rows, more, True
+            return rows, values is not None, more
+        return CursorPage(load, number, self)
+
+    @cached_property
+    def count(self):
+        """
+        How many objects there are, counting no further than one past
+        count_limit, so that having more than it shows (None if count_limit
+        is 0)
+        """
+        if self.count_limit == 0:
+            return None
+        queryset = self.queryset.order_by()
+        if self.count_limit is None:
+            return queryset.count()
+        return queryset[:self.count_limit + 1].count()
+
+    @property
+    def count_is_exact(self):
+        return self.count is not None and (self.count_limit is None or self.count <= self.count_limit)
+
+    @property
+    def num_pages(self):
+        """
+        How many pages there are (or at least are, if the count isn't exact),
+        or None if they aren't being counted
+        """
+        if self.count is None:
+            return None
+        return max(ceil(self.count / self.per_page), 1)
+
+
+class CursorPage:
+    """
+    A page of objects from a CursorPaginator, which is a sequence of them
+    like a Django Page. cursor is the cursor it was loaded with ('' for the
+    first page).
+
+    Like a Django Page's QuerySet, the objects aren't loaded until something
+    uses them (or whether there are pages either side), so a page whose
+    listing is in a {% cache %} block only queries for them when it misses.
+    load() returns (the objects, whether there's a previous page, whether
+    there's a next page).
+    """
+    cursor = ''
+
+    def __init__(self, load, number, paginator):
+        self._load = load
+        self.number = number
+        self.paginator = paginator
+
+    @cached_property
+    def _loaded(self):
+        object_list, has_previous, has_next = self._load()
+        return object_list, has_previous and bool(object_list), has_next and bool(object_list)
+
+    @property
+    def object_list(self):
+        return self._loaded[0]
+
+    @property
+    def _has_previous(self):
+        return self._loaded[1]
+
+    @property
+    def _has_next(self):
+        return self._loaded[2]
+
+    def __repr__(self):
+        return f'<Page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        # before loading the page, as templates try page_obj['cursor'] before page_obj.cursor
+        if not isinstance(index, (int, slice)):
+            raise TypeError(f'Page indices must be integers or slices, not {type(index).__name__}.')
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(self.number + 1, self.object_list[-1], backwards=False)
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        if self.number == 2:  # the first page has no cursor, so it's the same page wherever it's linked from
+            return ''
+        return self.paginator.encode_cursor(self.number - 1, self.object_list[0], backwards=True)
+
+
+class CursorPaginationMixin:
+    """
+    Makes a ListView paginate with a CursorPaginator, taking the cursor from
+    the cursor query parameter (an invalid one is a 404, like an invalid page
+    number is for other ListViews)
+    """
+    paginator_class = CursorPaginator
+    page_kwarg = 'cursor'
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        return self.paginator_class(queryset, per_page)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.page_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        # lazily, so that the page isn't loaded unless the template uses it
+        return (paginator, page, SimpleLazyObject(lambda: page.object_list),
+                SimpleLazyObject(page.has_other_pages))
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from . import cache
+from .models import Ticket
+
+# (version, {ticket type: price}) as last loaded by this process
+_price_table = (None, {})
+
+
+def round_up(value, dp):
+    """
+    Rounds up to dp many decimal places.
+
+    Because the bank normally doesn't let you keep the fractional penny and
+    charges you a whole extra penny for it, so do we!
+    """
+    initial = round(value, dp)
+    if initial < value:
+        initial += Decimal(1) / (10 ** dp)
+    return initial
+
+
+def ticket_prices():
+    """
+    The price of every type of Ticket, as {ticket type: price}.
+
+    Prices hardly ever change but are needed on every booking, so rather than
+    querying the Tickets each time they're kept in memory in this process and
+    only reloaded (all of them, with one query) when the version stamp of the
+    ticket_prices cache namespace no longer matches the one they were loaded at.
+    """
+    global _price_table
+    version = cache.version('ticket_prices')
+    loaded_version, prices = _price_table
+    if version is None or version != loaded_version:  # None with a dummy cache
+        cache.record_miss('ticket_prices')
+        # if the prices change while we load them, we'll be storing newer
+        # prices under the older version, which just means reloading next time
+        prices = dict(Ticket.objects.values_list('type', 'price'))
+        _price_table = (version, prices)
+    else:
+        cache.record_hit('ticket_prices')
+    return prices
+
+
+def invalidate_ticket_prices():
+    """
+    Makes every process reload the ticket prices the next time they're needed.
+
+    This has to be called after changing prices in a way that doesn't send
+    post_save (e.g. QuerySet.update()).
+    """
+    cache.bump_version('ticket_prices')
+
+
+def price_booking(number_of_adult_tickets, number_of_child_tickets,
+                  number_of_student_tickets, discount_rate=None):
+    """
+    Works out what a booking of the given tickets costs, as (subtotal, total),
+    where total is the subtotal after taking off any (Club) discount_rate.
+    """
+    prices = ticket_prices()
+    try:
+        subtotal = number_of_adult_tickets * prices['adult'] + \
+            number_of_child_tickets * prices['child'] + \
+            number_of_student_tickets * prices['student']
+    except KeyError as e:
+        raise Ticket.DoesNotExist(f'There is no {e.args[0]} Ticket') from None
+    total = subtotal
+    if discount_rate is not None:
+        total = round_up(subtotal * (1 - discount_rate), 2)
+    return subtotal, total
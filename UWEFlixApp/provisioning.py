@@ -0,0 +1,239 @@
+"""
+Creates many Users at once, e.g. the start of year's intake of Students or a
+new set of Club Reps, rather than registering each through its own form.
+
+Hashing passwords is deliberately slow, so for a big import it's what the time
+goes on. They're hashed across a pool of processes (one per CPU by default),
+after which every User is inserted with a single bulk_create(), and each is
+put in its Role's Group with a single bulk_create() on the Groups through
+table (bulk_create() doesn't call User.save(), which would otherwise do that
+for each User, see User.set_correct_groups_for_role()).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+import secrets
+from string import ascii_letters, digits
+
+import django
+from django.apps import apps
+from django.contrib.auth import password_validation
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from UWEAuth.models import User
+from .models import Club
+
+# the columns a row may have, of which username and password are required
+FIELDS = ('username', 'password', 'role', 'club', 'first_name', 'last_name', 'email', 'is_active')
+
+_TRUE, _FALSE = {'1', 'true', 'yes', 'y'}, {'0', 'false', 'no', 'n', ''}
+
+
+def generate_password(length=8):
+    """
+    A random password of letters and digits, like the ones given to Club
+    Reps when they're registered
+    """
+    return ''.join(secrets.choice(ascii_letters + digits) for _ in range(length))
+
+
+def read_users(file, format):
+    """
+    The rows of a CSV (with a header line naming the columns, see FIELDS) or
+    JSON (a list of objects with those keys) file, as a list of dicts
+    """
+    if format == 'csv':
+        return [
+            {key: value for key, value in row.items() if value != ''}
+            for row in csv.DictReader(file)
+        ]
+    if format == 'json':
+        rows = json.load(file)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('JSON must be a list of objects')
+        return rows
+    raise ValueError(f'Unknown format "{format}"')
+
+
+def import_users(rows, workers=None):
+    """
+    Creates a User for each row, a dict with keys from FIELDS. role may be a
+    Role's value, label or name (Student if not given), and club a Club's id
+    or name, which Club Reps must have. is_active defaults to true.
+
+    Every row is validated before anything is created, with the existing
+    usernames and Clubs each looked up in one query, and any row that isn't
+    valid is left out. The passwords are hashed across workers processes (by
+    default one per CPU, or with 1 or fewer, in this one).
+
+    Returns a tuple of (created Users, rejections), where rejections is a list
+    of (row number, reason) for each row that couldn't be imported, counting
+    rows from 1.
+    """
+    rows = [{key: _clean(value) for key, value in row.items()} for row in rows]
+    existing = set(User.objects.filter(
+        username__in=[row['username'] for row in rows if row.get('username')]
+    ).values_list('username', flat=True))
+    clubs = _find_clubs(row['club'] for row in rows if row.get('club'))
+
+    users, passwords, rejected = [], [], []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        try:
+            user, password = _build_user(row, existing, seen, clubs)
+        except ValidationError as e:
+            rejected.append((number, '; '.join(e.messages)))
+        else:
+            seen.add(user.username)
+            users.append(user)
+            passwords.append(password)
+
+    for user, password in zip(users, _hash_passwords(passwords, workers)):
+        user.password = password
+
+    group_ids = User.role_group_ids()
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):  # the database can't return ids from bulk inserts
+            ids = dict(User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+                user._state.adding = False
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=group_ids[user.role])
+            for user in users
+        ])
+    for user in users:
+        user._role_as_stored = user.role
+    return users, rejected
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def _find_clubs(references):
+    """
+    {reference: Club} for each Club referred to by id or by name (unless
+    more than one Club has that name)
+    """
+    references = {str(reference) for reference in references}
+    ids = [int(reference) for reference in references if reference.isdecimal()]
+    clubs = Club.objects.filter(id__in=ids) | Club.objects.filter(name__in=references)
+    found, ambiguous = {}, set()
+    for club in clubs:
+        if str(club.id) in references:
+            found[str(club.id)] = club
+        if club.name in references:
+            if club.name in found:
+                ambiguous.add(club.name)
+            found[club.name] = club
+    for name in ambiguous:
+        del found[name]
+    return found
+
+
+def _parse_role(value):
+    if value in (None, ''):
+        return User.Role.STUDENT
+    value = str(value).lower()
+    for role in User.Role:
+        if value in (role.value.lower(), role.label.lower(), role.name.lower()):
+            return role
+    raise ValidationError(f'"{value}" is not a Role')
+
+
+def _parse_bool(value, field):
+    if value is None or isinstance(value, bool):
+        return True if value is None else value
+    value = str(value).lower()
+    if value in _TRUE or value in _FALSE:
+        return value in _TRUE
+    raise ValidationError(f'{field} must be true or false, not "{value}"')
+
+
+def _build_user(row, existing, seen, clubs):
+    """
+    The unsaved User for row and its raw password, raising ValidationError
+    with everything that's wrong with it
+    """
+    errors = []
+    if None in row:  # csv.DictReader's key for the values past the last column
+        errors.append('More values than columns')
+    unknown = sorted(key for key in set(row) - set(FIELDS) if key is not None)
+    if unknown:
+        errors.append(f'Unknown column(s) {", ".join(unknown)}')
+
+    username = str(row.get('username') or '')
+    if not username:
+        errors.append('username is required')
+    elif username in existing or username in seen:
+        errors.append(f'username "{username}" is already taken')
+
+    role = club = None
+    try:
+        role = _parse_role(row.get('role'))
+    except ValidationError as e:
+        errors.extend(e.messages)
+    if row.get('club'):
+        club = clubs.get(str(row['club']))
+        if club is None:
+            errors.append(f'"{row["club"]}" is not a Club')
+    elif role == User.Role.CLUB_REP:
+        errors.append('Club Rep must have a Club!')
+
+    try:
+        is_active = _parse_bool(row.get('is_active'), 'is_active')
+    except ValidationError as e:
+        errors.extend(e.messages)
+        is_active = True
+
+    user = User(
+        username=username, role=role or User.Role.STUDENT, club=club, is_active=is_active,
+        first_name=row.get('first_name') or '', last_name=row.get('last_name') or '',
+        email=User.objects.normalize_email(row.get('email') or ''),
+    )
+    try:
+        # the Clubs have already been checked, which would be a query each here
+        user.clean_fields(exclude=['password', 'club', 'requested_club'])
+    except ValidationError as e:
+        errors.extend(
+            f'{field}: {message}' for field, messages in e.message_dict.items() for message in messages
+        )
+
+    password = str(row.get('password') or '')
+    if not password:
+        errors.append('password is required')
+    else:
+        try:
+            password_validation.validate_password(password, user)
+        except ValidationError as e:
+            errors.extend(e.messages)
+
+    if errors:
+        raise ValidationError(errors)
+    return user, password
+
+
+def _hash_passwords(passwords, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(passwords) <= 1:
+        return [make_password(password) for password in passwords]
+    workers = min(workers, len(passwords))
+    with ProcessPoolExecutor(workers, initializer=_setup_worker) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(len(passwords) // (workers * 4), 1)))
+
+
+def _setup_worker():
+    """
+    Sets Django up in a worker process, if it wasn't forked from one where
+    it already was (make_password() needs the settings)
+    """
+    if not apps.ready:
+        django.setup()
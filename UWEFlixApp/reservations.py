@@ -0,0 +1,58 @@
+from django.db import transaction
+
+from .models import Booking, Club, SeatHold
+
+
+def reserve_booking(screening, number_of_adult_tickets, number_of_child_tickets,
+                    number_of_student_tickets, total_price, user=None, club=None,
+                    hold_id=None):
+    """
+    Books seats for a Screening, paying from the Club's balance for Club bookings.
+
+    Taking the seats and debiting the Club happen in one transaction, each as a
+    single conditional UPDATE, so that however many buyers race for the same
+    Screening (or Club) the Screen can't be oversold and no debit gets lost.
+    If either step fails, neither happens.
+
+    If the customer already has a SeatHold for the Screening (see hold_seats()),
+    pass its id as hold_id and its seats will be turned into the Booking's. The
+    hold is released in the same transaction as the seats are booked, so no one
+    else can take them in between, and if it has already expired the Booking
+    simply takes any seats still available instead.
+
+    Raises Booking.NotEnoughSeats or Club.InsufficientFunds (both of which are
+    ValidationErrors) if the booking can't be made.
+    """
+    with transaction.atomic():
+        if hold_id is not None:
+            hold = SeatHold.objects.filter(id=hold_id).first()
+            if hold is not None:
+                hold.release()
+        booking = Booking.objects.create(
+            user=user,
+            screening=screening,
+            number_of_adult_tickets=number_of_adult_tickets,
+            number_of_child_tickets=number_of_child_tickets,
+            number_of_student_tickets=number_of_student_tickets,
+            total_price=total_price,
+            club=club,
+        )
+        if club is not None:
+            Club.debit(club.id, total_price)
+    return booking
+
+
+def hold_seats(screening, seats, replacing_hold_id=None):
+    """
+    Puts seats on hold for a customer who is about to pay for them, replacing
+    any hold they already had (e.g. if they went back and changed their mind).
+
+    Raises Booking.NotEnoughSeats if there aren't enough seats to hold, in which
+    case the customer's existing hold is left as it was.
+    """
+    with transaction.atomic():
+        if replacing_hold_id is not None:
+            old_hold = SeatHold.objects.filter(id=replacing_hold_id).first()
+            if old_hold is not None:
+                old_hold.release()
+        return SeatHold.hold(screening.id, seats)
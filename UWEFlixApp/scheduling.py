@@ -0,0 +1,102 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Movie, Screen, Screening
+from .showtimes import invalidate_showtimes
+
+
+def schedule_screenings(proposals):
+    """
+    Creates many Screenings at once, e.g. a whole week's programme for every
+    Screen in the cinema.
+
+    proposals is an iterable of (movie, screen, showing_at) tuples, where movie
+    and screen may be either model instances or ids. Rather than validating
+    each Screening with its own clash query like Screening.save() does, the
+    existing Screenings on the Screens involved are loaded in one go and
+    clashes are found in memory by sweeping through each Screen's showings in
+    order of start time, after which every proposal that fits is inserted with
+    a single bulk_create(). Where proposals clash with each other, the one
+    starting first wins (or the first given, if they start together).
+
+    Returns a tuple of (created Screenings, rejections), where rejections is a
+    list of (proposal, reason) for each proposal that couldn't be scheduled.
+    """
+    proposals = list(proposals)
+    rejected = []
+    movies = Movie.objects.in_bulk({_id_of(movie) for movie, _, _ in proposals})
+
+    with transaction.atomic():
+        # lock the Screens so that two schedulers can't interleave on one
+        screens = {
+            screen.id: screen for screen in
+            Screen.objects.select_for_update().filter(
+                id__in={_id_of(screen) for _, screen, _ in proposals}
+            )
+        }
+
+        candidates_by_screen = defaultdict(list)
+        for index, proposal in enumerate(proposals):
+            movie, screen, showing_at = proposal
+            movie, screen = movies.get(_id_of(movie)), screens.get(_id_of(screen))
+            if movie is None:
+                rejected.append((proposal, 'Movie does not exist'))
+            elif screen is None:
+                rejected.append((proposal, 'Screen does not exist'))
+            else:
+                candidates_by_screen[screen.id].append((
+                    showing_at, index, Screening(
+                        movie=movie, screen=screen, showing_at=showing_at,
+                        finishing_at=showing_at + movie.running_time
+                    )
+                ))
+
+        booked_by_screen = _existing_showings(candidates_by_screen)
+        accepted = []
+        for screen_id, candidates in candidates_by_screen.items():
+            booked_starts, booked_finishes = booked_by_screen[screen_id]
+            latest_accepted_finish = None
+            for _, index, screening in sorted(candidates, key=lambda c: (c[0], c[1])):
+                # existing Screenings can't overlap each other, so sorted by
+                # start they are sorted by finish too, and the only one which
+                # could overlap is the first to finish after we start
+                following = bisect_right(booked_finishes, screening.showing_at)
+                if following < len(booked_starts) and booked_starts[following] < screening.finishing_at:
+                    rejected.append((proposals[index], 'Clashes with an existing Screening'))
+                elif latest_accepted_finish is not None and latest_accepted_finish > screening.showing_at:
+                    rejected.append((proposals[index], 'Clashes with another proposed Screening'))
+                else:
+                    accepted.append(screening)
+                    latest_accepted_finish = screening.finishing_at
+
+        created = Screening.objects.bulk_create(accepted)
+        for movie_id in {screening.movie_id for screening in created}:
+            invalidate_showtimes(movie_id)  # bulk_create() doesn't send post_save
+    return created, rejected
+
+
+def _id_of(instance_or_id):
+    return getattr(instance_or_id, 'id', instance_or_id)
+
+
+def _existing_showings(candidates_by_screen):
+    """
+    Loads the (start, finish) times of every Screening already on the given
+    Screens which overlaps the period covered by the candidates, with a single
+    query. Returns {screen id: (sorted starts, sorted finishes)}.
+    """
+    booked = defaultdict(lambda: ([], []))
+    if not candidates_by_screen:
+        return booked
+    all_candidates = [c[2] for candidates in candidates_by_screen.values() for c in candidates]
+    for screen_id, showing_at, finishing_at in Screening.objects.filter(
+        screen_id__in=candidates_by_screen.keys(),
+        showing_at__lt=max(c.finishing_at for c in all_candidates),
+        finishing_at__gt=min(c.showing_at for c in all_candidates),
+    ).order_by('screen_id', 'showing_at').values_list('screen_id', 'showing_at', 'finishing_at'):
+        starts, finishes = booked[screen_id]
+        starts.append(showing_at)
+        finishes.append(finishing_at)
+    return booked
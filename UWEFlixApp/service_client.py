@@ -0,0 +1,315 @@
+"""
+A client for the other services the app calls over HTTP (so far, just the
+email API). Every call to another service should go through one of these, see
+get_client().
+
+Each client keeps a pooled requests.Session, so connections are kept alive and
+reused rather than opened for every call, and every call has connect and read
+timeouts, so a slow service can't hold up a worker indefinitely.
+
+Calls that fail because the service couldn't be reached (or timed out, or
+answered 5xx) are retried with backoff, but only while the client's retry
+budget allows, so that when a service is struggling we don't multiply its load
+with retries. Calls which might not be safe to repeat, i.e. POSTs that reached
+the service, are never retried. Enough failures in a row trip the client's
+circuit breaker, after which calls fail straight away with CircuitOpenError
+until the service has had some time to recover.
+
+The latency of every call is counted in a histogram per kind of call, see
+ServiceClient.stats().
+"""
+from bisect import bisect_left
+from datetime import timedelta
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# upper bounds of the latency histograms' buckets, in milliseconds (there's
+# another bucket after the last for anything slower)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# methods which can safely be repeated even if the service may have got them
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a service whose circuit breaker is open,
+    because it has been failing. retry_at is when it will next be tried.
+    """
+    def __init__(self, service, retry_at):
+        super().__init__(f'{service} is unavailable, not calling it again for now')
+        self.service = service
+        self.retry_at = retry_at
+
+
+class LatencyHistogram:
+    """
+    Counts of how long calls took, in buckets (see LATENCY_BUCKETS_MS)
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ms = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, ms):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, ms)] += 1
+            self.total_ms += ms
+
+    def percentile(self, p):
+        """
+        The upper bound of the bucket the p-th percentile falls in (None if
+        there are no calls, or it's slower than the last bucket)
+        """
+        with self.lock:
+            counts = list(self.counts)
+        remaining = sum(counts) * p / 100
+        if not remaining:
+            return None
+        for bound, count in zip(self.buckets, counts):
+            remaining -= count
+            if remaining <= 0:
+                return bound
+        return None
+
+    def as_dict(self):
+        with self.lock:
+            counts = list(self.counts)
+            total_ms = self.total_ms
+        calls = sum(counts)
+        return {
+            'calls': calls,
+            'mean_ms': total_ms / calls if calls else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'buckets': {
+                **{f'<={bound}ms': count for bound, count in zip(self.buckets, counts)},
+                f'>{self.buckets[-1]}ms': counts[-1],
+            },
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold failures in a row, and stays open for
+    reset_seconds. After that one trial call is let through (it's "half
+    open"), which closes it again if it succeeds or re-opens it if not.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half open'
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_running:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def retry_at(self):
+        """
+        When the next call will be let through, as a datetime
+        """
+        if self.opened_at is None:
+            return timezone.now()
+        remaining = max(self.opened_at + self.reset_seconds - time.monotonic(), 0)
+        return timezone.now() + timedelta(seconds=remaining)
+
+    def allow(self):
+        """
+        Whether a call can be made now, which if it's half open, takes the
+        one trial call
+        """
+        with self.lock:
+            state = self.state
+            if state == self.HALF_OPEN:
+                self.trial_running = True
+            return state != self.OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class RetryBudget:
+    """
+    Limits retries to a proportion of calls: every call adds ratio to the
+    balance and every retry takes 1 from it. The balance starts at (and
+    can't go above) burst, so that there's a little room to retry even when
+    calls are rare, but a run of failures soon uses it up.
+    """
+    def __init__(self, ratio, burst):
+        self.ratio = ratio
+        self.burst = burst
+        self.balance = burst
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.balance = min(self.balance + self.ratio, self.burst)
+
+    def withdraw(self):
+        """
+        Takes a retry from the budget, returning whether there was one
+        """
+        with self.lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+class ServiceClient:
+    """
+    Calls the service at base_url, see the module's docstring
+    """
+    def __init__(self, name, base_url, connect_timeout=3.05, read_timeout=10, pool_size=10,
+                 max_retries=2, retry_backoff=0.1, retry_budget_ratio=0.2, retry_budget_burst=10,
+                 failure_threshold=5, reset_seconds=30):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.retry_budget = RetryBudget(retry_budget_ratio, retry_budget_burst)
+        self.retries = 0
+        self.histograms = {}
+        self.histograms_lock = threading.Lock()
+        self.session = requests.Session()
+        # we do our own retrying, so the adapter doesn't
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def histogram(self, call):
+        with self.histograms_lock:
+            if call not in self.histograms:
+                self.histograms[call] = LatencyHistogram()
+            return self.histograms[call]
+
+    def request(self, method, path='', call=None, **kwargs):
+        """
+        Makes a request to the service, see requests.request() for the
+        arguments. call names the kind of call, for its latency histogram
+        (by default the method and path).
+
+        Returns the response, which may be an error response from the
+        service, unless the service couldn't be reached (or answered with a
+        server error) even after any retries, in which case that error is
+        raised. Raises CircuitOpenError if the service is known to be down.
+        """
+        method = method.upper()
+        url = self.base_url + path
+        histogram = self.histogram(call or f'{method} {path or "/"}')
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name, self.breaker.retry_at)
+        self.retry_budget.deposit()
+
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except requests.RequestException as e:
+                histogram.record((time.perf_counter() - started) * 1000)
+                self.breaker.record_failure()
+                if (attempt == self.max_retries or (_may_have_arrived(e) and method not in IDEMPOTENT_METHODS)
+                        or not self.breaker.allow() or not self.retry_budget.withdraw()):
+                    raise
+                self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+            except BaseException:
+                # anything else (e.g. a bad argument) isn't retried, but still
+                # has to end a half open circuit's trial, or none would follow
+                self.breaker.record_failure()
+                raise
+            else:
+                histogram.record((time.perf_counter() - started) * 1000)
+                self.breaker.record_success()
+                return response
+
+    def get(self, path='', **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path='', **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def stats(self):
+        with self.histograms_lock:
+            histograms = dict(self.histograms)
+        return {
+            'circuit': self.breaker.state,
+            'retries': self.retries,
+            'calls': {call: histogram.as_dict() for call, histogram in histograms.items()},
+        }
+
+
+def _may_have_arrived(error):
+    """
+    Whether a failed request might have reached the service (and been acted
+    on), i.e. it isn't that we couldn't connect
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return not isinstance(reason, NewConnectionError)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, base_url):
+    """
+    The process's client for the named service at base_url, set up from the
+    SERVICE_* settings the first time it's needed
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None or client.base_url != base_url:
+            client = _clients[name] = ServiceClient(
+                name, base_url,
+                connect_timeout=settings.SERVICE_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=settings.SERVICE_READ_TIMEOUT_SECONDS,
+                max_retries=settings.SERVICE_MAX_RETRIES,
+                retry_budget_ratio=settings.SERVICE_RETRY_BUDGET_RATIO,
+                failure_threshold=settings.SERVICE_CIRCUIT_FAILURE_THRESHOLD,
+                reset_seconds=settings.SERVICE_CIRCUIT_RESET_SECONDS,
+            )
+        return client
+
+
+def stats():
+    """
+    The stats of every service client in this process, as {name: stats}
+    """
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: client.stats() for name, client in clients.items()}
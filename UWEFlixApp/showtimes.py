@@ -0,0 +1,49 @@
+from itertools import groupby
+
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import cache
+from .models import Screening
+
+# how long a Movie's rendered showtimes are cached for at most. Writes to its
+# Screenings and Bookings clear them straight away, so this only bounds how
+# long a Screening that's become full through SeatHolds can still be listed
+# (picking it then just gets the usual not-enough-seats warning)
+SHOWTIMES_TIMEOUT = 60
+
+
+def showtimes_by_day(movie_id):
+    """
+    The times of the Movie's Screenings which still have seats, grouped by day
+    in showing order, as [(day, [{'id': ..., 'showing_at': ...}, ...]), ...].
+
+    This is one query, already sorted by the database, so the Screenings can
+    be grouped in a single pass as they come.
+    """
+    screenings = Screening.objects_with_seats_remaining().filter(
+        movie_id=movie_id, _seats_remaining__gte=1
+    ).order_by('showing_at').values('id', 'showing_at')
+    return [
+        (day, list(times)) for day, times in groupby(
+            screenings, key=lambda s: timezone.localtime(s['showing_at']).strftime('%d/%m/%Y')
+        )
+    ]
+
+
+def rendered_showtimes(movie_id):
+    """
+    The HTML of the Movie's showtimes tabs, which is cached (it's the same for
+    every customer) until one of the Movie's Screenings or Bookings changes.
+    """
+    return mark_safe(cache.get_or_set('showtimes', [movie_id], lambda: render_to_string(
+        'UWEFlixApp/showtimes.html', {'showtimes': showtimes_by_day(movie_id)}
+    ), SHOWTIMES_TIMEOUT))
+
+
+def invalidate_showtimes(movie_id):
+    """
+    Clears the Movie's cached showtimes
+    """
+    cache.delete('showtimes', movie_id)
@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Booking, Movie, Screening, Ticket
+from .pricing import invalidate_ticket_prices
+from .showtimes import invalidate_showtimes
+
+
+@receiver(post_delete, sender=Booking)
+def release_seats_of_deleted_booking(sender, instance, **kwargs):
+    """
+    Give the seats of a deleted Booking back to its Screening.
+
+    This is a signal rather than an override of Booking.delete() so that it
+    also catches Bookings deleted in bulk or by cascade (e.g. when their User
+    is deleted).
+    """
+    if instance._seats_as_stored is not None:
+        screening_id, seats = instance._seats_as_stored
+    else:
+        screening_id, seats = instance.screening_id, instance.seats_taken
+    if screening_id is not None:
+        Screening.adjust_seats_sold(screening_id, -seats)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_cached_ticket_prices(sender, **kwargs):
+    """
+    Stop anyone using the cached price of a Ticket that has been changed
+    """
+    invalidate_ticket_prices()
+
+
+@receiver(post_save, sender=Screening)
+@receiver(post_delete, sender=Screening)
+def invalidate_showtimes_of_screening(sender, instance, **kwargs):
+    """
+    A Screening being added, moved or removed changes its Movie's showtimes
+    """
+    invalidate_showtimes(instance.movie_id)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_showtimes_of_booking(sender, instance, **kwargs):
+    """
+    A Booking changing can fill up (or free up) its Screening, changing
+    whether it's listed in its Movie's showtimes
+    """
+    if Booking.screening.is_cached(instance):
+        movie_id = instance.screening.movie_id
+    else:
+        movie_id = Screening.objects.filter(
+            id=instance.screening_id
+        ).values_list('movie_id', flat=True).first()
+    if movie_id is not None:  # otherwise the Screening's own delete handles it
+        invalidate_showtimes(movie_id)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_catalogue(sender, **kwargs):
+    """
+    Any change to a Movie changes the catalogue pages
+    """
+    cache.bump_version('catalogue')
@@ -0,0 +1,42 @@
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Club, MonthlyStatement
+from .transactions import bookings_in_month
+
+
+def create_monthly_statements(month=None):
+    """
+    Creates a MonthlyStatement for every Club, of the total of its bookings
+    made in the month containing the date month (by default this month).
+
+    Rather than totting up each Club's bookings in turn, the month's bookings
+    are summed per Club by the database in one grouped query and all the
+    statements are written with a single bulk insert, so this takes the same
+    handful of queries however many Clubs there are. Statements are unique per
+    Club and month, so running it again for the same month just brings the
+    existing statements up to date instead of adding more.
+
+    Returns the number of statements written.
+    """
+    month = (month or timezone.localdate()).replace(day=1)
+    amounts = dict(
+        bookings_in_month(month, club__isnull=False)
+        .values_list('club')
+        .annotate(amount=Sum('total_price'))
+        .order_by()
+    )
+    statements = [
+        MonthlyStatement(club_id=club_id, date=month, amount=amounts.get(club_id) or 0)
+        for club_id in Club.objects.values_list('id', flat=True)
+    ]
+    # MySQL's ON DUPLICATE KEY UPDATE applies to any unique constraint, and
+    # Django won't let it be given the fields of one
+    features = connections[MonthlyStatement.objects.db].features
+    unique_fields = ['club', 'date'] if features.supports_update_conflicts_with_target else None
+    MonthlyStatement.objects.bulk_create(
+        statements, batch_size=1000,
+        update_conflicts=True, unique_fields=unique_fields, update_fields=['amount'],
+    )
+    return len(statements)
@@ -1,11 +1,40 @@
-from datetime import datetime
-
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+import hashlib
+import random
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+import requests
 
 from UWEAuth.models import User
-from .models import Club, MonthlyStatement, Movie, Screen, Screening
+from .models import Booking, Club, MonthlyStatement, Movie, OutboxEmail, Screen, Screening, SeatHold, Ticket
+from .outbox import queue_email, send_due_emails
+from .pagination import CursorPaginator, InvalidCursor
+from . import cache as app_cache
+from .pricing import invalidate_ticket_prices, price_booking, ticket_prices
+from .provisioning import import_users, read_users
+from .reservations import hold_seats, reserve_booking
+from .scheduling import schedule_screenings
+from .service_client import CircuitBreaker, CircuitOpenError, ServiceClient
+from .showtimes import showtimes_by_day
+from .statements import create_monthly_statements
+from .transactions import bookings_in_month, club_transactions, next_month, previous_month
 
 class HomePageTests(TestCase):
     def test_home_page_status_code(self):
@@ -448,3 +477,1417 @@ class ClashingScreeningsTest(TestCase):
         """
         for model in (Screening, Screen, Movie):  # delete in correct order for db constraints
             model.objects.all().delete()
+
+
+def create_test_screening(capacity=10, showing_at=None):
+    """
+    Makes a Screening (and a Movie and Screen for it) a week from now, unless
+    told otherwise
+    """
+    return Screening.objects.create(
+        movie=Movie.objects.create(name='Tron', running_time=timedelta(minutes=96)),
+        screen=Screen.objects.create(name='Screen 1', capacity=capacity),
+        showing_at=showing_at or timezone.now() + timedelta(days=7)
+    )
+
+def create_test_booking(screening, adult=0, child=0, student=0, **kwargs):
+    return Booking.objects.create(
+        screening=screening,
+        number_of_adult_tickets=adult,
+        number_of_child_tickets=child,
+        number_of_student_tickets=student,
+        **kwargs
+    )
+
+class SeatsSoldCounterTest(TestCase):
+    """
+    The seats-sold counter on Screening should always agree with the Bookings
+    """
+    def setUp(self):
+        self.screening = create_test_screening(capacity=10)
+
+    def assertSeatsSold(self, expected):
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.seats_sold, expected)
+        self.assertEqual(self.screening.seats_remaining, 10 - expected)
+
+    def test_creating_bookings_takes_seats(self):
+        create_test_booking(self.screening, adult=2, child=1)
+        create_test_booking(self.screening, student=3)
+        self.assertSeatsSold(6)
+
+    def test_cancellation_requested_still_takes_seats(self):
+        booking = create_test_booking(self.screening, adult=2)
+        booking.status = Booking.Status.CANCELLATION_REQUESTED
+        booking.save()
+        self.assertSeatsSold(2)
+
+    def test_cancelling_booking_releases_seats(self):
+        booking = create_test_booking(self.screening, adult=2)
+        booking.status = Booking.Status.CANCELLED
+        booking.save()
+        self.assertSeatsSold(0)
+        # saving it again must not release the seats twice
+        booking.save()
+        self.assertSeatsSold(0)
+
+    def test_cancelling_freshly_loaded_booking_releases_seats(self):
+        booking_id = create_test_booking(self.screening, adult=4).id
+        booking = Booking.objects.get(id=booking_id)
+        booking.status = Booking.Status.CANCELLED
+        booking.save()
+        self.assertSeatsSold(0)
+
+    def test_deleting_booking_releases_seats(self):
+        create_test_booking(self.screening, adult=1)
+        create_test_booking(self.screening, adult=2).delete()
+        self.assertSeatsSold(1)
+
+    def test_bulk_deleting_bookings_releases_seats(self):
+        create_test_booking(self.screening, adult=1)
+        create_test_booking(self.screening, adult=2, status=Booking.Status.CANCELLED)
+        Booking.objects.all().delete()
+        self.assertSeatsSold(0)
+
+    def test_editing_screening_keeps_counter(self):
+        stale = Screening.objects.get(id=self.screening.id)
+        create_test_booking(self.screening, adult=3)
+        stale.showing_at += timedelta(hours=1)
+        stale.save()
+        self.assertSeatsSold(3)
+
+    def test_reconcile_corrects_drift(self):
+        create_test_booking(self.screening, adult=3)
+        Screening.objects.filter(id=self.screening.id).update(seats_sold=7)
+        out = StringIO()
+        call_command('reconcile_seat_counts', stdout=out)
+        self.assertIn('1 Screening(s) corrected', out.getvalue())
+        self.assertSeatsSold(3)
+
+    def test_reconcile_corrects_held_seats(self):
+        SeatHold.hold(self.screening.id, 2)
+        Screening.objects.filter(id=self.screening.id).update(seats_held=0)
+        call_command('reconcile_seat_counts', stdout=StringIO())
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.seats_held, 2)
+
+    def test_seats_remaining_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.screening.seats_remaining
+
+    def test_seats_remaining_reuses_annotation(self):
+        create_test_booking(self.screening, adult=3)
+        screening = Screening.objects_with_seats_remaining().get(id=self.screening.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(screening.seats_remaining, 7)
+
+def create_test_club(balance=0):
+    club = Club.objects.create(name="UWEFlix", card_number="123456", card_expiry="2020-12-31", discount_rate=0.1, address="Bristol")
+    Club.credit(club.id, balance)
+    return club
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        self.screening = create_test_screening(capacity=10)
+        self.club = create_test_club(balance=Decimal('20.00'))
+
+    def test_reservation_takes_seats_and_debits_club(self):
+        reserve_booking(self.screening, 0, 0, 4, Decimal('15.00'), club=self.club)
+        self.club.refresh_from_db()
+        self.assertEqual(self.club.balance, Decimal('5.00'))
+        self.assertEqual(self.screening.seats_remaining, 6)
+
+    def test_not_enough_seats(self):
+        reserve_booking(self.screening, 8, 0, 0, Decimal('0.00'))
+        with self.assertRaises(Booking.NotEnoughSeats):
+            reserve_booking(self.screening, 3, 0, 0, Decimal('0.00'))
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.screening.seats_remaining, 2)
+
+    def test_insufficient_funds_takes_no_seats(self):
+        with self.assertRaises(Club.InsufficientFunds):
+            reserve_booking(self.screening, 0, 0, 1, Decimal('20.01'), club=self.club)
+        self.club.refresh_from_db()
+        self.assertEqual(self.club.balance, Decimal('20.00'))
+        self.assertEqual(self.screening.seats_remaining, 10)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_reactivating_booking_is_checked_against_capacity(self):
+        booking = create_test_booking(self.screening, adult=5, status=Booking.Status.CANCELLED)
+        create_test_booking(self.screening, adult=6)
+        booking.status = Booking.Status.ACTIVE
+        with self.assertRaises(Booking.NotEnoughSeats):
+            booking.save()
+        self.assertEqual(self.screening.seats_remaining, 4)
+
+    def test_saving_club_keeps_balance(self):
+        stale = Club.objects.get(id=self.club.id)
+        Club.debit(self.club.id, Decimal('5.00'))
+        stale.name = 'Renamed'
+        stale.save()
+        self.club.refresh_from_db()
+        self.assertEqual(self.club.balance, Decimal('15.00'))
+
+    def test_confirm_booking_shows_warning_when_sold_out(self):
+        reserve_booking(self.screening, 9, 0, 0, Decimal('0.00'))
+        session = self.client.session
+        session.update({
+            'selected_screening': self.screening.id,
+            'number_of_adult_tickets': '2',
+            'number_of_child_tickets': '0',
+            'number_of_student_tickets': '0',
+        })
+        session.save()
+        response = self.client.post(reverse('confirm_booking'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Not enough seats remaining')
+        self.assertEqual(Booking.objects.count(), 1)
+
+class ReservationStressTest(TransactionTestCase):
+    """
+    Hammer a single Screening (and Club) with concurrent buyers, none of whom
+    should be able to oversell it
+    """
+    BUYERS = 200
+
+    def race(self, buy):
+        """
+        Runs buy() in BUYERS many threads at once, returning how many succeeded
+        """
+        start = threading.Barrier(self.BUYERS)
+        successes = []
+
+        def buyer():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        buy()
+                    except OperationalError:
+                        # SQLite locks the whole (shared in-memory) test database
+                        # rather than rows, so just retry until it's our turn
+                        time.sleep(random.uniform(0, 0.05))
+                        continue
+                    except ValidationError:
+                        return
+                    successes.append(True)
+                    return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(successes)
+
+    def test_no_oversell(self):
+        screening = create_test_screening(capacity=50)
+        sold = self.race(lambda: reserve_booking(screening, 1, 0, 0, Decimal('4.99')))
+        self.assertEqual(sold, 50)
+        self.assertEqual(Booking.objects.count(), 50)
+        screening.refresh_from_db()
+        self.assertEqual(screening.seats_sold, 50)
+        self.assertEqual(screening.seats_remaining, 0)
+
+    def test_no_lost_club_debits(self):
+        screening = create_test_screening(capacity=self.BUYERS)
+        club = create_test_club(balance=Decimal('30.00'))
+        sold = self.race(lambda: reserve_booking(screening, 0, 0, 1, Decimal('1.00'), club=club))
+        self.assertEqual(sold, 30)
+        club.refresh_from_db()
+        self.assertEqual(club.balance, Decimal('0.00'))
+        self.assertEqual(screening.seats_remaining, self.BUYERS - 30)
+
+class SeatHoldTest(TestCase):
+    def setUp(self):
+        self.screening = create_test_screening(capacity=10)
+
+    def expire_all_holds(self):
+        SeatHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_held_seats_are_unavailable(self):
+        hold_seats(self.screening, 6)
+        self.assertEqual(self.screening.seats_remaining, 4)
+        with self.assertRaises(Booking.NotEnoughSeats):
+            hold_seats(self.screening, 5)
+        with self.assertRaises(Booking.NotEnoughSeats):
+            reserve_booking(self.screening, 5, 0, 0, Decimal('0.00'))
+
+    def test_hold_lasts_as_long_as_session(self):
+        hold = hold_seats(self.screening, 1)
+        self.assertAlmostEqual(
+            hold.expires_at,
+            timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE),
+            delta=timedelta(seconds=10)
+        )
+
+    def test_replacing_hold_releases_old_one(self):
+        first = hold_seats(self.screening, 6)
+        hold_seats(self.screening, 8, replacing_hold_id=first.id)
+        self.assertEqual(self.screening.seats_remaining, 2)
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+    def test_failed_replacement_keeps_old_hold(self):
+        first = hold_seats(self.screening, 6)
+        reserve_booking(self.screening, 4, 0, 0, Decimal('0.00'))
+        with self.assertRaises(Booking.NotEnoughSeats):
+            hold_seats(self.screening, 7, replacing_hold_id=first.id)
+        self.assertTrue(SeatHold.objects.filter(id=first.id).exists())
+        self.assertEqual(self.screening.seats_remaining, 0)
+
+    def test_converting_hold_to_booking(self):
+        hold = hold_seats(self.screening, 10)
+        reserve_booking(self.screening, 4, 3, 3, Decimal('0.00'), hold_id=hold.id)
+        self.screening.refresh_from_db()
+        self.assertEqual((self.screening.seats_sold, self.screening.seats_held), (10, 0))
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_converting_expired_hold_to_booking(self):
+        hold = hold_seats(self.screening, 3)
+        self.expire_all_holds()
+        SeatHold.release_expired()
+        reserve_booking(self.screening, 3, 0, 0, Decimal('0.00'), hold_id=hold.id)
+        self.screening.refresh_from_db()
+        self.assertEqual((self.screening.seats_sold, self.screening.seats_held), (3, 0))
+
+    def test_expired_holds_released_lazily(self):
+        hold_seats(self.screening, 10)
+        self.expire_all_holds()
+        reserve_booking(self.screening, 4, 0, 0, Decimal('0.00'))
+        self.screening.refresh_from_db()
+        self.assertEqual((self.screening.seats_sold, self.screening.seats_held), (4, 0))
+
+    def test_sweeper_releases_only_expired_holds(self):
+        hold_seats(self.screening, 3)
+        self.expire_all_holds()
+        hold_seats(self.screening, 2)
+        out = StringIO()
+        call_command('release_expired_seat_holds', stdout=out)
+        self.assertIn('3 held seat(s) released', out.getvalue())
+        self.assertEqual(self.screening.seats_remaining, 8)
+        self.assertEqual(SeatHold.objects.count(), 1)
+
+    def test_releasing_twice_only_releases_once(self):
+        hold = hold_seats(self.screening, 3)
+        self.assertTrue(hold.release())
+        self.assertFalse(hold.release())
+        self.assertEqual(self.screening.seats_remaining, 10)
+
+    def test_booking_flow_holds_then_books(self):
+        response = self.client.post(reverse('create_booking', args=[self.screening.id]), {
+            'number_of_adult_tickets': '2',
+            'number_of_child_tickets': '1',
+            'number_of_student_tickets': '0',
+        })
+        self.assertRedirects(response, reverse('payment_page'), fetch_redirect_response=False)
+        self.assertEqual(self.screening.seats_remaining, 7)
+        self.assertEqual(SeatHold.objects.get().seats, 3)
+
+        response = self.client.post(reverse('confirm_booking'))
+        self.assertRedirects(response, reverse('email_confirmation'), fetch_redirect_response=False)
+        self.screening.refresh_from_db()
+        self.assertEqual((self.screening.seats_sold, self.screening.seats_held), (3, 0))
+        self.assertNotIn('seat_hold', self.client.session)
+
+class ScreeningFinishingTimeTest(TestCase):
+    def setUp(self):
+        self.screening = create_test_screening()
+
+    def test_finishing_time_is_stored(self):
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.finishing_at, self.screening.showing_at + timedelta(minutes=96))
+
+    def test_changing_running_time_moves_finishing_times(self):
+        movie = Movie.objects.get(id=self.screening.movie_id)
+        movie.running_time = timedelta(minutes=120)
+        movie.save()
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.finishing_at, self.screening.showing_at + timedelta(minutes=120))
+
+    def test_unchanged_running_time_leaves_screenings_alone(self):
+        movie = Movie.objects.get(id=self.screening.movie_id)
+        movie.name = 'Tron: Legacy'
+        with self.assertNumQueries(1):
+            movie.save()
+
+    def test_moving_screening_moves_finishing_time(self):
+        self.screening.showing_at += timedelta(hours=2)
+        self.screening.save()
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.finishing_at, self.screening.showing_at + timedelta(minutes=96))
+
+    def test_clash_check_is_a_single_indexed_query(self):
+        later = Screening(
+            movie=self.screening.movie, screen=self.screening.screen,
+            showing_at=self.screening.showing_at + timedelta(minutes=95)
+        )
+        later.set_finishing_at()
+        with self.assertNumQueries(2):  # longest film, then the overlap check
+            self.assertTrue(later.clashes_with_others)
+
+class ScheduleScreeningsTest(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(name='Heat', running_time=timedelta(minutes=100))
+        self.screens = [Screen.objects.create(name=f'Screen {i}', capacity=50) for i in range(3)]
+        self.monday = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=7)
+
+    def test_schedules_block_bookings(self):
+        proposals = [
+            (self.movie, screen, self.monday + timedelta(minutes=100 * i))
+            for screen in self.screens for i in range(5)
+        ]
+        created, rejected = schedule_screenings(proposals)
+        self.assertEqual(len(created), 15)
+        self.assertEqual(rejected, [])
+        screening = Screening.objects.order_by('showing_at').first()
+        self.assertEqual(screening.finishing_at, screening.showing_at + timedelta(minutes=100))
+
+    def test_rejects_clashes_with_existing_screenings(self):
+        Screening.objects.create(movie=self.movie, screen=self.screens[0], showing_at=self.monday)
+        clashing = (self.movie, self.screens[0], self.monday + timedelta(minutes=99))
+        created, rejected = schedule_screenings([
+            clashing,
+            (self.movie, self.screens[0], self.monday + timedelta(minutes=100)),
+            (self.movie, self.screens[1], self.monday + timedelta(minutes=99)),
+        ])
+        self.assertEqual(len(created), 2)
+        self.assertEqual(rejected, [(clashing, 'Clashes with an existing Screening')])
+
+    def test_rejects_clashes_between_proposals(self):
+        first = (self.movie.id, self.screens[0].id, self.monday + timedelta(minutes=30))
+        second = (self.movie.id, self.screens[0].id, self.monday)
+        created, rejected = schedule_screenings([first, second])
+        self.assertEqual([s.showing_at for s in created], [self.monday])
+        self.assertEqual(rejected, [(first, 'Clashes with another proposed Screening')])
+
+    def test_rejects_unknown_movies_and_screens(self):
+        created, rejected = schedule_screenings([
+            (self.movie.id + 1, self.screens[0], self.monday),
+            (self.movie, self.screens[-1].id + 1, self.monday),
+        ])
+        self.assertEqual(created, [])
+        self.assertEqual([reason for _, reason in rejected], ['Movie does not exist', 'Screen does not exist'])
+
+    def test_query_count_does_not_grow_with_schedule(self):
+        proposals = [
+            (self.movie, screen, self.monday + timedelta(days=day, minutes=120 * i))
+            for screen in self.screens for day in range(7) for i in range(6)
+        ]
+        # movies, screens, existing showings and the insert, plus the savepoint
+        with self.assertNumQueries(6):
+            created, _ = schedule_screenings(proposals)
+        self.assertEqual(len(created), len(proposals))
+
+class TicketPricesTest(TestCase):
+    def tearDown(self):
+        # the price changes are rolled back, but the process-local table
+        # doesn't know that
+        invalidate_ticket_prices()
+
+    def test_price_booking(self):
+        self.assertEqual(price_booking(1, 2, 3), (Decimal('22.94'), Decimal('22.94')))
+
+    def test_discount_rounds_up(self):
+        self.assertEqual(price_booking(0, 0, 10, Decimal('0.15')), (Decimal('39.90'), Decimal('33.92')))
+
+    def test_warm_cache_queries_nothing(self):
+        ticket_prices()
+        with self.assertNumQueries(0):
+            price_booking(1, 1, 1)
+
+    def test_saving_ticket_reloads_prices(self):
+        ticket_prices()
+        ticket = Ticket.objects.get(type='adult')
+        ticket.price = Decimal('6.50')
+        ticket.save()
+        self.assertEqual(price_booking(2, 0, 0), (Decimal('13.00'), Decimal('13.00')))
+
+    def test_change_ticket_price_reloads_prices(self):
+        self.client.force_login(create_test_user_of_role(User.Role.CINEMA_MANAGER))
+        ticket_prices()
+        self.client.post(reverse('change_ticket_price'), {
+            'adult_ticket_price': '5.00', 'child_ticket_price': '3.00', 'student_ticket_price': '4.00',
+        })
+        self.assertEqual(ticket_prices(), {'adult': Decimal('5.00'), 'child': Decimal('3.00'), 'student': Decimal('4.00')})
+
+    def test_confirm_booking_doesnt_query_tickets(self):
+        screening = create_test_screening()
+        session = self.client.session
+        session.update({
+            'selected_screening': screening.id,
+            'number_of_adult_tickets': '1',
+            'number_of_child_tickets': '1',
+            'number_of_student_tickets': '0',
+        })
+        session.save()
+        ticket_prices()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('confirm_booking'))
+        self.assertContains(response, '7.98')
+        self.assertFalse([q for q in queries if Ticket._meta.db_table in q['sql']])
+
+class MonthlyStatementGenerationTest(TestCase):
+    def setUp(self):
+        self.screening = create_test_screening(capacity=100)
+        self.clubs = [create_test_club(balance=Decimal('100.00')) for _ in range(3)]
+
+    def book(self, club, total_price, date):
+        booking = reserve_booking(self.screening, 0, 0, 1, Decimal(total_price), club=club)
+        Booking.objects.filter(id=booking.id).update(date=date)  # date is auto_now
+
+    def statements(self):
+        return dict(MonthlyStatement.objects.values_list('club', 'amount'))
+
+    def test_sums_each_clubs_bookings_for_the_month(self):
+        october = timezone.make_aware(datetime(2026, 10, 1))
+        self.book(self.clubs[0], '10.00', october)
+        self.book(self.clubs[0], '5.50', october + timedelta(days=30, hours=23))
+        self.book(self.clubs[0], '7.00', october - timedelta(seconds=1))  # September
+        self.book(self.clubs[1], '3.00', october + timedelta(days=31))  # November
+        self.book(None, '2.00', october)  # not a club booking
+        create_monthly_statements(october.date())
+        self.assertEqual(self.statements(), {
+            self.clubs[0].id: Decimal('15.50'), self.clubs[1].id: 0, self.clubs[2].id: 0,
+        })
+        self.assertEqual(set(MonthlyStatement.objects.values_list('date', flat=True)), {october.date()})
+
+    def test_rerunning_updates_rather_than_duplicates(self):
+        create_monthly_statements()
+        self.book(self.clubs[2], '8.00', timezone.now())
+        create_monthly_statements()
+        self.assertEqual(MonthlyStatement.objects.count(), 3)
+        self.assertEqual(self.statements()[self.clubs[2].id], Decimal('8.00'))
+
+    def test_query_count_doesnt_grow_with_clubs(self):
+        for _ in range(20):
+            create_test_club()
+        # bookings, clubs and the insert
+        with self.assertNumQueries(3):
+            create_monthly_statements()
+
+    def test_upsert_without_conflict_target(self):
+        # as on MySQL, where naming the unique fields raises NotSupportedError
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(create_monthly_statements(), 3)
+        insert = [query['sql'] for query in queries if query['sql'].startswith('INSERT')][0]
+        self.assertNotIn('ON CONFLICT("club_id", "date")', insert)
+        self.assertEqual(MonthlyStatement.objects.count(), 3)
+
+    def test_command(self):
+        self.book(self.clubs[1], '4.00', timezone.make_aware(datetime(2025, 2, 14)))
+        out = StringIO()
+        call_command('create_monthly_statements', '2025-02', stdout=out)
+        self.assertIn('3 monthly statement(s) written', out.getvalue())
+        self.assertEqual(self.statements()[self.clubs[1].id], Decimal('4.00'))
+
+class TransactionsTest(TestCase):
+    def setUp(self):
+        self.screening = create_test_screening(capacity=100)
+        self.club = create_test_club(balance=Decimal('100.00'))
+        self.march = timezone.make_aware(datetime(2025, 3, 1))
+        for total_price, date in [
+            ('6.00', self.march),
+            ('4.50', self.march + timedelta(days=30, hours=23)),
+            ('9.00', self.march + timedelta(days=31)),  # April
+            ('2.00', self.march.replace(year=2024)),  # the year before
+        ]:
+            booking = reserve_booking(self.screening, 0, 0, 1, Decimal(total_price), club=self.club)
+            Booking.objects.filter(id=booking.id).update(date=date)  # date is auto_now
+
+    def test_month_takes_year_into_account(self):
+        self.assertEqual(bookings_in_month(self.march.date()).count(), 2)
+
+    def test_total_is_summed_by_the_database(self):
+        bookings, total = club_transactions(self.club, self.march.date())
+        self.assertEqual(total, Decimal('10.50'))
+        self.assertEqual(len(bookings), 2)
+        _, total = club_transactions(self.club, datetime(1999, 1, 1).date())
+        self.assertEqual(total, 0)
+
+    def test_club_month_query_uses_index(self):
+        plan = bookings_in_month(self.march.date(), club=self.club).explain()
+        self.assertIn('booking_club_date_idx', plan)
+
+    def test_month_arithmetic(self):
+        self.assertEqual(next_month(datetime(2025, 12, 15).date()), datetime(2026, 1, 1).date())
+        self.assertEqual(previous_month(datetime(2025, 1, 31).date()), datetime(2024, 12, 1).date())
+
+    def test_view_club_transactions_for_chosen_month(self):
+        self.client.force_login(create_test_user_of_role(User.Role.ACCOUNT_MANAGER))
+        response = self.client.get(reverse('view_club_transactions', args=[self.club.id]), {'month': '2025-04'})
+        self.assertEqual(response.context['total'], Decimal('9.00'))
+        self.assertContains(response, 'April 2025 Transactions')
+        self.assertContains(response, '?month=2025-05')
+
+    def test_months_without_a_month_either_side_fall_back_to_this_month(self):
+        self.client.force_login(create_test_user_of_role(User.Role.ACCOUNT_MANAGER))
+        this_month = timezone.localdate().replace(day=1)
+        for month in ('9999-12', '0001-01', '9999-01', '0001-12'):
+            response = self.client.get(reverse('view_club_transactions', args=[self.club.id]), {'month': month})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['month'], this_month)
+        response = self.client.get(reverse('view_club_transactions', args=[self.club.id]), {'month': '9998-12'})
+        self.assertEqual(response.context['month'], datetime(9998, 12, 1).date())
+
+class QueryBudgetMixin:
+    """
+    Adds assertQueryBudget() to a TestCase, for checking that a list page
+    takes a fixed number of queries no matter how many rows are on it (i.e.
+    that nothing on it is being looked up separately for each row).
+    """
+    def assertQueryBudget(self, url, budget, add_rows, data=None):
+        """
+        Loads url with six rows on it and again with fifteen (adding them by
+        calling add_rows(n) to add n rows), and checks both take the same
+        number of queries, at most budget. Both are more than a page of five,
+        so paginated lists count their rows (once) both times.
+        """
+        query_counts = []
+        for new_rows in (6, 9):
+            add_rows(new_rows)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries))
+        self.assertEqual(
+            query_counts[0], query_counts[1],
+            f'{url} took {query_counts[0]} queries for six rows but {query_counts[1]} for fifteen'
+        )
+        self.assertLessEqual(query_counts[0], budget, f'{url} is over its query budget')
+
+
+class ListQueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.screening = create_test_screening(capacity=1000)
+        self.club = create_test_club(balance=Decimal('1000.00'))
+        self.user_count = 0
+
+    def create_user(self, role, **kwargs):
+        self.user_count += 1
+        return User.objects.create(username=f'user{self.user_count}', role=role, **kwargs)
+
+    def log_in_as(self, role, **kwargs):
+        user = self.create_user(role, **kwargs)
+        self.client.force_login(user)
+        return user
+
+    def add_bookings(self, **kwargs):
+        def add_rows(n):
+            for _ in range(n):
+                create_test_booking(self.screening, adult=1, total_price=Decimal('4.99'), **{
+                    'user': self.create_user(User.Role.STUDENT), 'club': self.club, **kwargs
+                })
+        return add_rows
+
+    def test_show_all_bookings(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+        self.assertQueryBudget(reverse('show_all_bookings'), 4, self.add_bookings())
+
+    def test_show_club_bookings(self):
+        self.log_in_as(User.Role.CLUB_REP, club=self.club)
+        self.assertQueryBudget(reverse('show_club_bookings'), 5, self.add_bookings())
+
+    def test_show_user_bookings(self):
+        user = self.log_in_as(User.Role.STUDENT)
+        self.assertQueryBudget(reverse('show_user_bookings'), 4, self.add_bookings(user=user))
+
+    def test_show_requested_bookings(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+        self.assertQueryBudget(
+            reverse('show_requested_bookings'), 3,
+            self.add_bookings(status=Booking.Status.CANCELLATION_REQUESTED)
+        )
+
+    def test_view_transactions(self):
+        self.log_in_as(User.Role.CLUB_REP, club=self.club)
+        self.assertQueryBudget(reverse('view_transactions'), 5, self.add_bookings())
+
+    def test_view_club_transactions(self):
+        self.log_in_as(User.Role.ACCOUNT_MANAGER)
+        self.assertQueryBudget(reverse('view_club_transactions', args=[self.club.id]), 5, self.add_bookings())
+
+    def test_view_monthly_statement(self):
+        self.log_in_as(User.Role.ACCOUNT_MANAGER)
+
+        def add_statements(n):
+            for _ in range(n):
+                MonthlyStatement.objects.create(club=create_test_club(), date=timezone.localdate(), amount=0)
+        self.assertQueryBudget(reverse('view_monthly_statement'), 4, add_statements)
+
+    def test_waiting_approval(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+
+        def add_users(n):
+            for _ in range(n):
+                self.create_user(User.Role.STUDENT, is_active=False, club=self.club)
+        self.assertQueryBudget(reverse('waiting_approval'), 3, add_users)
+
+    def test_view_staff_accounts(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+
+        def add_users(n):
+            for _ in range(n):
+                self.create_user(User.Role.ACCOUNT_MANAGER)
+        self.assertQueryBudget(reverse('view_staff_accounts'), 4, add_users)
+
+    def test_view_clubs(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+        self.assertQueryBudget(reverse('view_clubs'), 4, lambda n: [create_test_club() for _ in range(n)])
+
+    def test_show_all_screening(self):
+        self.log_in_as(User.Role.CINEMA_MANAGER)
+
+        def add_screenings(n):
+            for _ in range(n):
+                create_test_booking(create_test_screening(), adult=2)
+        self.assertQueryBudget(reverse('show_all_screening'), 4, add_screenings)
+
+    def test_list_movies(self):
+        self.assertQueryBudget(reverse('list-movies'), 2, lambda n: [
+            Movie.objects.create(name='Tron', running_time=timedelta(minutes=96)) for _ in range(n)
+        ])
+
+    def test_list_screen(self):
+        self.assertQueryBudget(reverse('list-screen'), 2, lambda n: [
+            Screen.objects.create(name='Screen', capacity=10) for _ in range(n)
+        ])
+
+
+class ShowtimesTest(TestCase):
+    def setUp(self):
+        cache.clear()  # ids are reused between tests, so cached pages could be too
+        self.morning = timezone.make_aware(datetime(2030, 5, 1, 10, 0))
+        self.screening = create_test_screening(capacity=2, showing_at=self.morning)
+        self.movie = self.screening.movie
+        for showing_at in (self.morning + timedelta(hours=4), self.morning + timedelta(days=1)):
+            Screening.objects.create(movie=self.movie, screen=self.screening.screen, showing_at=showing_at)
+
+    def test_grouped_by_day_in_one_query(self):
+        with self.assertNumQueries(1):
+            showtimes = showtimes_by_day(self.movie.id)
+        self.assertEqual(
+            [(day, [t['showing_at'].hour for t in times]) for day, times in showtimes],
+            [('01/05/2030', [10, 14]), ('02/05/2030', [10])]
+        )
+
+    def test_full_screenings_arent_listed(self):
+        create_test_booking(self.screening, adult=2)
+        self.assertEqual([len(times) for _, times in showtimes_by_day(self.movie.id)], [1, 1])
+
+    def test_page_is_cached(self):
+        url = reverse('show_screenings', args=[self.movie.id])
+        self.client.get(url)
+        with self.assertNumQueries(1):  # just the Movie
+            response = self.client.get(url)
+        self.assertContains(response, '14:00')
+
+    def test_booking_clears_cache(self):
+        url = reverse('show_screenings', args=[self.movie.id])
+        self.assertContains(self.client.get(url), '01/05/2030')
+        booking = create_test_booking(self.screening, adult=2)
+        self.assertEqual(self.client.get(url).content.decode().count('10:00'), 1)
+        booking.delete()
+        self.assertEqual(self.client.get(url).content.decode().count('10:00'), 2)
+
+    def test_new_screening_clears_cache(self):
+        url = reverse('show_screenings', args=[self.movie.id])
+        self.client.get(url)
+        Screening.objects.create(movie=self.movie, screen=self.screening.screen, showing_at=self.morning + timedelta(days=2))
+        self.assertContains(self.client.get(url), '03/05/2030')
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """
+    Just enough of a Redis server (speaking its RESP protocol) to run Django's
+    RedisCache against in tests, without needing a real one. Expiry times are
+    accepted but ignored.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespStandInHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+        self.url = 'redis://127.0.0.1:{}'.format(self.server_address[1])
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def run(self, command, *args):
+        data = self.data
+        if command == b'GET':
+            return data.get(args[0])
+        if command == b'MGET':
+            return [data.get(key) for key in args]
+        if command == b'SET':
+            options = [a.upper() for a in args[2:]]
+            if (b'NX' in options and args[0] in data) or (b'XX' in options and args[0] not in data):
+                return None
+            data[args[0]] = args[1]
+            return 'OK'
+        if command == b'MSET':
+            data.update(zip(args[::2], args[1::2]))
+            return 'OK'
+        if command == b'INCRBY':
+            data[args[0]] = b'%d' % (int(data.get(args[0], b'0')) + int(args[1]))
+            return int(data[args[0]])
+        if command == b'DEL':
+            return sum(data.pop(key, None) is not None for key in args)
+        if command == b'EXISTS':
+            return sum(key in data for key in args)
+        if command in (b'EXPIRE', b'PERSIST'):
+            return int(args[0] in data)
+        if command == b'FLUSHDB':
+            data.clear()
+            return 'OK'
+        if command == b'PING':
+            return 'PONG'
+        raise ValueError('unknown command {}'.format(command.decode()))
+
+
+class RespStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queued = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                request.append(self.rfile.read(length + 2)[:-2])
+            command, args = request[0].upper(), request[1:]
+            if command == b'MULTI':
+                queued = []
+                self.reply('OK')
+            elif command == b'EXEC':
+                with self.server.lock:
+                    self.reply([self.server.run(*c) for c in queued])
+                queued = None
+            elif queued is not None:
+                queued.append((command, *args))
+                self.reply('QUEUED')
+            else:
+                with self.server.lock:
+                    try:
+                        result = self.server.run(command, *args)
+                    except ValueError as e:
+                        result = e
+                self.reply(result)
+
+    def reply(self, value):
+        self.wfile.write(self.encode(value))
+
+    def encode(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, Exception):
+            return '-ERR {}\r\n'.format(value).encode()
+        if isinstance(value, str):
+            return '+{}\r\n'.format(value).encode()
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        return b'*%d\r\n' % len(value) + b''.join(self.encode(v) for v in value)
+
+
+class CacheHelpersTests:
+    """
+    Tests of UWEFlixApp.cache, run against each of the cache backends that can
+    be configured in settings (see the subclasses below)
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_get_or_set_counts_hits_and_misses(self):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return 'showtimes'
+        for _ in range(3):
+            self.assertEqual(app_cache.get_or_set('showtimes', [1], compute), 'showtimes')
+        self.assertEqual(len(computed), 1)
+        self.assertEqual(app_cache.stats()['showtimes'], {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+    def test_bump_version_invalidates_namespace(self):
+        app_cache.get_or_set('showtimes', [1], lambda: 'old')
+        app_cache.get_or_set('showtimes', [2], lambda: 'old')
+        app_cache.bump_version('showtimes')
+        self.assertEqual(app_cache.get_or_set('showtimes', [1], lambda: 'new'), 'new')
+        self.assertEqual(app_cache.get_or_set('showtimes', [2], lambda: 'new'), 'new')
+
+    def test_delete_removes_one_key(self):
+        app_cache.get_or_set('showtimes', [1], lambda: 'old')
+        app_cache.get_or_set('showtimes', [2], lambda: 'old')
+        app_cache.delete('showtimes', 1)
+        self.assertEqual(app_cache.get_or_set('showtimes', [1], lambda: 'new'), 'new')
+        self.assertEqual(app_cache.get_or_set('showtimes', [2], lambda: 'new'), 'old')
+
+    def test_ticket_prices_follow_version(self):
+        self.assertEqual(ticket_prices()['adult'], Decimal('4.99'))
+        Ticket.objects.filter(type='adult').update(price=Decimal('5.49'))
+        self.assertEqual(ticket_prices()['adult'], Decimal('4.99'))  # still cached
+        invalidate_ticket_prices()
+        self.assertEqual(ticket_prices()['adult'], Decimal('5.49'))
+        invalidate_ticket_prices()  # forget the rolled back price
+
+    def test_cache_stats_view(self):
+        app_cache.get_or_set('showtimes', [1], lambda: 'showtimes')
+        self.client.force_login(create_test_user_of_role(User.Role.CINEMA_MANAGER))
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(response.json()['showtimes']['misses'], 1)
+
+
+class LocMemCacheTest(CacheHelpersTests, TestCase):
+    pass
+
+
+class FileBasedCacheTest(CacheHelpersTests, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        super().setUp()
+
+
+class RedisCacheTest(CacheHelpersTests, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = RespStandIn()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.settings_override = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': cls.server.url,
+        }})
+        cls.settings_override.enable()
+        cls.addClassCleanup(cls.settings_override.disable)
+        super().setUpClass()
+
+    def test_values_are_in_the_stand_in(self):
+        app_cache.get_or_set('showtimes', [1], lambda: 'showtimes')
+        self.assertTrue(any(b'showtimes' in key for key in self.server.data))
+
+
+class CatalogueCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(name='Tron', running_time=timedelta(minutes=96))
+        self.url = reverse('booking_start')
+
+    def test_listing_is_cached(self):
+        self.client.get(self.url)
+        # neither the Movies nor the pages (which are counted in the cached block) are queried
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Tron')
+
+    def test_revalidates_with_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_revalidates_with_last_modified(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changing_a_movie_changes_the_page(self):
+        etag = self.client.get(self.url)['ETag']
+        self.movie.name = 'Tron: Legacy'
+        self.movie.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Tron: Legacy')
+
+    def test_page_still_varies_by_user(self):
+        anonymous = self.client.get(self.url)
+        self.client.force_login(create_test_user_of_role(User.Role.STUDENT))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Logout')
+        self.assertIn('Cookie', response['Vary'])
+
+
+class OutboxTest(TestCase):
+    def fail_to_send(self, payload):
+        raise ConnectionError('email API is down')
+
+    def test_email_confirmation_queues_email(self):
+        screening = create_test_screening()
+        # with a club discount, which the email should show rather than the full price
+        booking = create_test_booking(screening, adult=1, student=2, total_price=Decimal('17.85'))
+        session = self.client.session
+        session['booking_id'] = booking.id
+        session.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('email_confirmation'), {'email_address': 'flynn@encom.com'})
+        queries = [query['sql'] for query in queries]  # before the next request clears them
+        # the Booking, Screening, Movie and Screen in a single query, without looking up prices
+        for table in ('booking', 'screening', 'movie', 'screen'):
+            self.assertEqual(len([sql for sql in queries if sql.startswith('SELECT') and f'"UWEFlixApp_{table}"' in sql]), 1)
+        self.assertFalse([sql for sql in queries if 'UWEFlixApp_ticket' in sql])
+        self.assertRedirects(response, reverse('home'))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.payload, {
+            'name': 'UWEFlix', 'email': 'flynn@encom.com', 'movie': 'Tron', 'screen': 'Screen 1',
+            'date': screening.showing_at.strftime("%d %B %Y - %H:%M"),
+            'total_tickets': 3, 'total_price': '17.85', 'id': booking.id,
+        })
+
+    def test_sends_due_emails(self):
+        queue_email({'email': 'flynn@encom.com'})
+        sent = []
+        self.assertEqual(send_due_emails(send=sent.append), (1, 0))
+        self.assertEqual(sent, [{'email': 'flynn@encom.com'}])
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.Status.SENT)
+        self.assertEqual(send_due_emails(send=sent.append), (0, 0))  # not sent twice
+
+    def test_failed_email_is_retried_later(self):
+        queue_email({'email': 'flynn@encom.com'})
+        self.assertEqual(send_due_emails(send=self.fail_to_send), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.PENDING, 1))
+        self.assertIn('email API is down', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(send_due_emails(send=self.fail_to_send), (0, 0))  # not due yet
+
+    def test_backoff_doubles_up_to_limit(self):
+        email = OutboxEmail(payload={})
+        delays = []
+        for attempts in (1, 2, 3, 20):
+            email.attempts = attempts
+            delays.append(email.retry_delay().total_seconds())
+        base = settings.OUTBOX_RETRY_BACKOFF_SECONDS
+        for delay, expected in zip(delays, (base, base * 2, base * 4, settings.OUTBOX_RETRY_BACKOFF_MAX_SECONDS)):
+            self.assertTrue(expected / 2 <= delay <= expected)
+
+    def test_gives_up_after_max_attempts(self):
+        queue_email({'email': 'flynn@encom.com'})
+        for _ in range(settings.OUTBOX_MAX_ATTEMPTS):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            send_due_emails(send=self.fail_to_send)
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.FAILED, settings.OUTBOX_MAX_ATTEMPTS))
+
+    def test_only_one_worker_claims_an_email(self):
+        queue_email({'email': 'flynn@encom.com'})
+        first, second = OutboxEmail.objects.get(), OutboxEmail.objects.get()
+        self.assertTrue(first.claim())
+        self.assertFalse(second.claim())
+
+    def test_release_only_undoes_its_own_claim(self):
+        queue_email({'email': 'flynn@encom.com'})
+        email = OutboxEmail.objects.get()
+        self.assertTrue(email.claim())
+        retry_at = timezone.now() + timedelta(seconds=30)
+        OutboxEmail.objects.update(next_attempt_at=retry_at - timedelta(seconds=1))  # e.g. its claim ran out
+        self.assertFalse(email.release(retry_at))
+        self.assertEqual(OutboxEmail.objects.get().attempts, 1)
+        email = OutboxEmail.objects.get()
+        self.assertTrue(email.release(retry_at))
+        email.refresh_from_db()
+        self.assertEqual((email.attempts, email.next_attempt_at), (0, retry_at))
+
+    def test_lost_claim_leaves_outcome_to_new_claimant(self):
+        queue_email({'email': 'flynn@encom.com'})
+
+        def send_slowly(payload):
+            # meanwhile the claim runs out, and another worker claims the email
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertTrue(OutboxEmail.objects.get().claim())
+
+        self.assertEqual(send_due_emails(send=send_slowly), (0, 0))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.PENDING, 2))
+        self.assertGreater(email.next_attempt_at, timezone.now())  # the other worker's claim
+
+    def test_lost_claim_doesnt_resurrect_failed_email(self):
+        queue_email({'email': 'flynn@encom.com'})
+        stale = OutboxEmail.objects.get()
+        self.assertTrue(stale.claim())
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        current = OutboxEmail.objects.get()
+        self.assertTrue(current.claim())
+        current.attempts = settings.OUTBOX_MAX_ATTEMPTS
+        self.assertTrue(current.mark_failed('email API is down'))
+        self.assertFalse(stale.mark_failed('timed out'))
+        self.assertFalse(stale.mark_sent())
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.last_error), (OutboxEmail.Status.FAILED, 'email API is down'))
+
+    def test_command(self):
+        queue_email({'email': 'flynn@encom.com'})
+        OutboxEmail.objects.update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        out = StringIO()
+        call_command('send_outbox_emails', stdout=out)
+        self.assertIn('0 email(s) sent, 0 failed', out.getvalue())
+
+    def test_circuit_open_does_not_use_up_attempts(self):
+        queue_email({'email': 'flynn@encom.com'})
+        retry_at = timezone.now() + timedelta(seconds=30)
+
+        def circuit_open(payload):
+            raise CircuitOpenError('email_api', retry_at)
+
+        self.assertEqual(send_due_emails(send=circuit_open), (0, 0))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.next_attempt_at),
+                         (OutboxEmail.Status.PENDING, 0, retry_at))
+
+
+class HTTPStandIn(ThreadingHTTPServer):
+    """
+    A web server which answers every request with the next of responses, a
+    list of (status, seconds to wait first), repeating the last one forever.
+    Counts the connections and requests it gets.
+    """
+    daemon_threads = True
+
+    def __init__(self, responses):
+        super().__init__(('127.0.0.1', 0), HTTPStandInHandler)
+        self.responses = list(responses)
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server_address[1])
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        pass  # e.g. the client having timed out and hung up
+
+
+class HTTPStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # so connections are kept alive
+    wbufsize = -1  # so each response goes in one write, rather than waiting on delayed ACKs
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            responses = self.server.responses
+            status, delay = responses.pop(0) if len(responses) > 1 else responses[0]
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class ServiceClientTest(TestCase):
+    def make_client(self, responses, **kwargs):
+        server = HTTPStandIn(responses)
+        self.addCleanup(server.stop)
+        kwargs.setdefault('retry_backoff', 0)
+        client = ServiceClient('test', server.url, **kwargs)
+        self.addCleanup(client.session.close)
+        return client, server
+
+    def test_connections_are_reused(self):
+        client, server = self.make_client([(200, 0)])
+        for _ in range(5):
+            self.assertEqual(client.post(json={'email': 'flynn@encom.com'}).status_code, 200)
+        self.assertEqual((server.requests, server.connections), (5, 1))
+
+    def test_read_timeout(self):
+        client, server = self.make_client([(200, 0.5)], read_timeout=0.1)
+        started = time.perf_counter()
+        with self.assertRaises(requests.ReadTimeout):
+            client.post(json={})
+        self.assertLess(time.perf_counter() - started, 0.4)
+        # the POST may have been acted on, so it isn't retried
+        self.assertEqual(server.requests, 1)
+
+    def test_server_errors_are_retried(self):
+        client, server = self.make_client([(503, 0), (503, 0), (200, 0)])
+        self.assertEqual(client.get().status_code, 200)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(client.stats()['retries'], 2)
+
+        # but only as far as the retry budget goes
+        client, server = self.make_client([(503, 0)], retry_budget_ratio=0, retry_budget_burst=1)
+        with self.assertRaises(requests.HTTPError):
+            client.get()
+        with self.assertRaises(requests.HTTPError):
+            client.get()
+        self.assertEqual(server.requests, 3)
+
+    def test_client_errors_are_returned(self):
+        client, server = self.make_client([(400, 0)])
+        self.assertEqual(client.get().status_code, 400)
+        self.assertEqual((server.requests, client.breaker.state), (1, CircuitBreaker.CLOSED))
+
+    def test_unreachable_service_is_retried(self):
+        with socket.socket() as s:  # a port with nothing listening on it
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        client = ServiceClient('test', f'http://127.0.0.1:{port}/', retry_backoff=0)
+        with self.assertRaises(requests.ConnectionError):
+            client.post(json={})  # safe to retry, as it never got there
+        self.assertEqual(client.stats()['retries'], 2)
+
+    def test_circuit_breaker(self):
+        client, server = self.make_client(
+            [(500, 0), (500, 0), (200, 0)], max_retries=0, failure_threshold=2, reset_seconds=0.2
+        )
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.get()
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            client.get()
+        self.assertEqual(server.requests, 2)  # it wasn't called
+        self.assertGreater(raised.exception.retry_at, timezone.now())
+
+        time.sleep(0.2)
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(client.get().status_code, 200)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_ends_half_open_trial(self):
+        client, server = self.make_client([(500, 0), (200, 0)], max_retries=0, failure_threshold=1, reset_seconds=0.1)
+        with self.assertRaises(requests.HTTPError):
+            client.get()
+        time.sleep(0.1)
+        with mock.patch.object(client.session, 'request', side_effect=ValueError('not a requests error')), \
+                self.assertRaises(ValueError):
+            client.get()  # the trial call
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)  # again, rather than stuck waiting on the trial
+        time.sleep(0.1)
+        self.assertEqual(client.get().status_code, 200)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_latency_histogram(self):
+        client, server = self.make_client([(200, 0.03)])
+        for _ in range(4):
+            client.post(json={}, call='send email')
+        latency = client.stats()['calls']['send email']
+        self.assertEqual(latency['calls'], 4)
+        self.assertEqual(latency['buckets']['<=25ms'], 0)
+        self.assertGreaterEqual(latency['p50_ms'], 50)
+        self.assertGreaterEqual(latency['mean_ms'], 30)
+
+    def test_outbox_sends_through_client(self):
+        client, server = self.make_client([(200, 0)])
+        queue_email({'email': 'flynn@encom.com'})
+        queue_email({'email': 'sam@encom.com'})
+        with override_settings(EMAIL_API_URL=server.url):
+            self.assertEqual(send_due_emails(), (2, 0))
+            queue_email({'email': 'alan@encom.com'})
+            out = StringIO()
+            call_command('send_outbox_emails', verbosity=2, stdout=out)
+        self.assertEqual((server.requests, server.connections), (3, 1))
+        self.assertIn('1 email(s) sent', out.getvalue())
+        self.assertIn('email_api send email: 3 call(s)', out.getvalue())
+
+    def test_email_api_failing_to_send_keeps_email_pending(self):
+        # what the email API answers when the SMTP server won't take the email
+        client, server = self.make_client([(502, 0)])
+        queue_email({'email': 'flynn@encom.com'})
+        with override_settings(EMAIL_API_URL=server.url):
+            self.assertEqual(send_due_emails(), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.PENDING, 1))
+        self.assertIn('502', email.last_error)
+        self.assertEqual(server.requests, 1)  # the POST may have been acted on, so it isn't retried
+
+
+class ImportUsersTest(TestCase):
+    def setUp(self):
+        self.club = create_test_club()
+
+    def rows(self, count, prefix='student'):
+        return [{'username': f'{prefix}{i}', 'password': 'popcorn-and-pic-n-mix'} for i in range(count)]
+
+    def test_imports_users_into_their_role_groups(self):
+        created, rejected = import_users([
+            {'username': 'flynn', 'password': 'popcorn-and-pic-n-mix', 'first_name': 'Kevin'},
+            {'username': 'rep', 'password': 'popcorn-and-pic-n-mix', 'role': 'Club Representative', 'club': 'UWEFlix'},
+            {'username': 'manager', 'password': 'popcorn-and-pic-n-mix', 'role': 'account_manager', 'is_active': 'no'},
+        ], workers=1)
+        self.assertEqual(rejected, [])
+        self.assertEqual(len(created), 3)
+
+        flynn = User.objects.get(username='flynn')
+        self.assertEqual(flynn.first_name, 'Kevin')
+        self.assertTrue(flynn.check_password('popcorn-and-pic-n-mix'))
+        self.assertEqual(list(flynn.groups.values_list('name', flat=True)), ['Student'])
+        rep = User.objects.get(username='rep')
+        self.assertEqual((rep.role, rep.club), (User.Role.CLUB_REP, self.club))
+        self.assertEqual(list(rep.groups.values_list('name', flat=True)), ['Club Representative'])
+        manager = User.objects.get(username='manager')
+        self.assertFalse(manager.is_active)
+        self.assertEqual(list(manager.groups.values_list('name', flat=True)), ['Account Manager'])
+
+    def test_queries_dont_grow_with_the_number_of_users(self):
+        User.role_group_ids()
+        with CaptureQueriesContext(connection) as few:
+            import_users(self.rows(2, 'few'), workers=1)
+        with CaptureQueriesContext(connection) as many:
+            import_users(self.rows(20, 'many'), workers=1)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(User.objects.filter(username__startswith='many').count(), 20)
+
+    def test_invalid_rows_are_reported_and_the_rest_imported(self):
+        User.objects.create_user(username='taken', password='popcorn-and-pic-n-mix')
+        good = {'username': 'flynn', 'password': 'popcorn-and-pic-n-mix'}
+        created, rejected = import_users([
+            good,
+            {'username': 'taken', 'password': 'popcorn-and-pic-n-mix'},
+            {'username': 'flynn', 'password': 'popcorn-and-pic-n-mix'},
+            {'username': 'rep', 'password': 'popcorn-and-pic-n-mix', 'role': 'R'},
+            {'username': 'rep2', 'password': 'popcorn-and-pic-n-mix', 'role': 'R', 'club': 'Nope'},
+            {'username': 'usher', 'password': 'popcorn-and-pic-n-mix', 'role': 'usher'},
+            {'username': 'weak', 'password': '123'},
+            {'password': 'popcorn-and-pic-n-mix'},
+        ], workers=1)
+        self.assertEqual([user.username for user in created], ['flynn'])
+        self.assertEqual([number for number, _ in rejected], [2, 3, 4, 5, 6, 7, 8])
+        reasons = dict(rejected)
+        self.assertIn('already taken', reasons[2])
+        self.assertIn('already taken', reasons[3])
+        self.assertIn('must have a Club', reasons[4])
+        self.assertIn('"Nope" is not a Club', reasons[5])
+        self.assertIn('not a Role', reasons[6])
+        self.assertIn('too short', reasons[7])
+        self.assertIn('username is required', reasons[8])
+
+    def test_malformed_csv_rows_are_rejected(self):
+        rows = read_users(StringIO(
+            'username,password,club\n'
+            'flynn,popcorn-and-pic-n-mix\n'
+            'extra,popcorn-and-pic-n-mix,,surplus\n'
+            'digits,popcorn-and-pic-n-mix,\u00b2\n'
+        ), 'csv')
+        created, rejected = import_users(rows, workers=1)
+        self.assertEqual([user.username for user in created], ['flynn'])
+        self.assertEqual([number for number, _ in rejected], [2, 3])
+        reasons = dict(rejected)
+        self.assertIn('More values than columns', reasons[2])
+        self.assertIn('is not a Club', reasons[3])
+
+    def test_passwords_are_hashed_in_worker_processes(self):
+        created, rejected = import_users(self.rows(3), workers=2)
+        self.assertEqual(rejected, [])
+        for user in User.objects.filter(username__startswith='student'):
+            self.assertTrue(user.check_password('popcorn-and-pic-n-mix'))
+
+    def test_command_imports_csv(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f'{directory.name}/users.csv'
+        with open(path, 'w') as f:
+            f.write('username,password,role,club\nflynn,,Student,\nrep,popcorn-and-pic-n-mix,R,UWEFlix\nlost,,R,\n')
+        out, err = StringIO(), StringIO()
+        call_command('import_users', path, '--generate-passwords', '--workers=1', stdout=out, stderr=err)
+
+        self.assertIn('2 user(s) imported, 1 row(s) rejected', out.getvalue())
+        self.assertIn('Row 3: Club Rep must have a Club!', err.getvalue())
+        username, password = out.getvalue().splitlines()[0].split(',')
+        self.assertEqual(username, 'flynn')
+        self.assertTrue(User.objects.get(username='flynn').check_password(password))
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        screening = create_test_screening(capacity=100)
+        bookings = [create_test_booking(screening, adult=1) for _ in range(12)]
+        # plenty of ties, which the ids have to break
+        start = timezone.make_aware(datetime(2025, 4, 1, 12))
+        for i, booking in enumerate(bookings):
+            Booking.objects.filter(id=booking.id).update(date=start + timedelta(days=i % 4))
+        self.bookings = Booking.objects.order_by('-date')
+        self.expected = list(Booking.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def test_pages_forwards_and_backwards(self):
+        paginator = CursorPaginator(self.bookings, 5)
+        page, pages = paginator.page(), []
+        while True:
+            pages.append([booking.id for booking in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(pages, [self.expected[:5], self.expected[5:10], self.expected[10:]])
+        self.assertEqual(page.number, 3)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertTrue(paginator.count_is_exact)
+
+        page = paginator.page(page.previous_cursor)
+        self.assertEqual(([booking.id for booking in page], page.number), (self.expected[5:10], 2))
+        self.assertEqual(page.previous_cursor, '')  # the first page
+        self.assertFalse(paginator.page(page.previous_cursor).has_previous())
+
+    def test_later_pages_are_found_without_offset(self):
+        paginator = CursorPaginator(self.bookings, 5)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.page(cursor)
+            self.assertEqual(len(queries), 0)  # not until something uses it
+            self.assertEqual(len(page), 5)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_count_is_approximate_past_the_limit(self):
+        paginator = CursorPaginator(self.bookings, 5, count_limit=7)
+        self.assertEqual((paginator.num_pages, paginator.count_is_exact), (2, False))
+        self.assertIsNone(CursorPaginator(self.bookings, 5, count_limit=0).num_pages)
+        self.assertEqual(CursorPaginator(self.bookings, 5, count_limit=None).count, 12)
+
+    def test_invalid_cursors(self):
+        paginator = CursorPaginator(self.bookings, 5)
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        self.assertEqual([booking.id for booking in paginator.get_page('not-a-cursor')], self.expected[:5])
+
+        self.client.force_login(create_test_user_of_role(User.Role.CINEMA_MANAGER))
+        self.assertEqual(self.client.get(reverse('show_all_bookings'), {'cursor': 'nope'}).status_code, 404)
+        response = self.client.get(reverse('show_all_bookings'))
+        self.assertContains(response, f'?cursor={response.context["page_obj"].next_cursor}')
+
+
+class ClubTopUpTest(TestCase):
+    def setUp(self):
+        self.club = create_test_club(balance=Decimal('5.00'))
+        Club.objects.filter(id=self.club.id).update(
+            card_number=hashlib.sha3_512(b'4242424242424242').hexdigest()
+        )
+        self.client.force_login(User.objects.create(username='rep', role=User.Role.CLUB_REP, club=self.club))
+
+    def top_up(self, card_number='4242424242424242', card_expiry='2020-12-31'):
+        return self.client.post(reverse('top_up'), {
+            'amount': '20.00', 'card_number': card_number, 'card_expiry': card_expiry,
+        })
+
+    def test_credits_the_club(self):
+        self.assertRedirects(self.top_up(), reverse('home'))
+        self.club.refresh_from_db()
+        self.assertEqual(self.club.balance, Decimal('25.00'))
+
+    def test_wrong_card_is_refused(self):
+        self.assertContains(self.top_up(card_number='4000000000000002'), 'Card number does not match')
+        self.assertContains(self.top_up(card_expiry='2021-01-31'), 'Expiry date does not match')
+        self.club.refresh_from_db()
+        self.assertEqual(self.club.balance, Decimal('5.00'))
@@ -0,0 +1,82 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import DecimalField, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Booking
+
+
+def month_bounds(month):
+    """
+    The (start, end) datetimes of the month containing the date month, in the
+    current timezone, where end is the start of the following month.
+    """
+    start = month.replace(day=1)
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(next_month(start), time.min)),
+    )
+
+
+def next_month(month):
+    """
+    The first day of the month after the one containing the date month
+    """
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def previous_month(month):
+    """
+    The first day of the month before the one containing the date month
+    """
+    return (month.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def month_from_request(request):
+    """
+    The month asked for by the request's ?month=YYYY-MM parameter, as the date
+    of its first day, falling back to this month if there isn't a valid one.
+    Months in the first and last years a date can have aren't valid, as the
+    months either side of them (see next_month and previous_month) can't be.
+    """
+    try:
+        month = datetime.strptime(request.GET['month'], '%Y-%m').date()
+    except (KeyError, ValueError):
+        month = None
+    if month is None or not date.min.year < month.year < date.max.year:
+        return timezone.localdate().replace(day=1)
+    return month
+
+
+def bookings_in_month(month=None, bookings=None, **filters):
+    """
+    Returns a QuerySet of the Bookings (optionally filtered further by the
+    given field lookups) made in the month containing the date month, by
+    default this month. Pass a QuerySet of Bookings as bookings to filter that
+    instead of all Bookings, e.g. Booking.objects_with_details().
+
+    Bookings are matched by a [month start, next month start) range on their
+    date, which unlike date__month takes the year into account and lets the
+    database use the (club, date) index to find a Club's Bookings.
+    """
+    start, end = month_bounds(month or timezone.localdate())
+    if bookings is None:
+        bookings = Booking.objects.all()
+    return bookings.filter(date__gte=start, date__lt=end, **filters)
+
+
+def total_price(bookings):
+    """
+    The total price of a QuerySet of Bookings, summed by the database
+    """
+    return bookings.aggregate(total=Coalesce(Sum('total_price'), 0, output_field=DecimalField()))['total']
+
+
+def club_transactions(club, month=None):
+    """
+    A Club's Bookings for the month containing the date month (by default this
+    month) in date order, and their total price, as (bookings, total).
+    """
+    bookings = bookings_in_month(month, club=club).order_by('date')
+    return bookings, total_price(bookings)
@@ -4,7 +4,7 @@ from .models import MonthlyStatement, Club, Movie, Screen, Screening, Booking
 
 
 monthly_statement_list_view = views.ViewMonthlyStatement.as_view(
-    queryset=MonthlyStatement.objects.order_by("-id"),  
+    queryset=MonthlyStatement.objects.select_related("club").order_by("-id"),
     context_object_name="monthly_statement_list",
     template_name="UWEFlixApp/view_monthly_statement.html",
 )
@@ -16,14 +16,14 @@ club_list_view = views.ViewClubs.as_view(
 )
 
 
-movie_list_view = views.ViewMovie.as_view(
+movie_list_view = views.ViewCatalogue.as_view(
     queryset=Movie.objects.order_by("id"),
     context_object_name="movie_list",
     template_name="UWEFlixApp/view_movies.html",
 )
 
 
-movie_list_booking = views.ViewMovie.as_view(
+movie_list_booking = views.ViewCatalogue.as_view(
     queryset=Movie.objects.order_by("id"),
     context_object_name="movie_list",
     template_name="UWEFlixApp/cust_pick_film.html",
@@ -36,14 +36,14 @@ screen_list_view = views.ViewMovie.as_view(
     template_name="UWEFlixApp/view_screens.html",
 )
 
-screening_list_view = views.ViewMovie.as_view(
-    queryset=Screening.objects.order_by("id"),
+screening_list_view = views.ViewScreenings.as_view(
+    queryset=Screening.objects_with_seats_remaining().select_related("movie", "screen").order_by("id"),
     context_object_name="screen_list",
     template_name="UWEFlixApp/view_screenings.html",
 )
 
 booking_list_view = views.ViewBooking.as_view(
-    queryset=Booking.objects.order_by("id"),
+    queryset=Booking.objects_with_details().order_by("id"),
     context_object_name="all_bookings",
     template_name="UWEFlixApp/view_bookings.html",
 )
@@ -104,4 +104,5 @@ urlpatterns = [
     path("view_staff_accounts/", views.view_staff_accounts, name="view_staff_accounts"),
     path("deactivate_account/<int:pk>/", views.deactivate_account, name="deactivate_account"),
     path("activate_account/<int:pk>/", views.activate_account, name="activate_account"),
+    path("cache_stats/", views.cache_stats, name="cache_stats"),
 ]
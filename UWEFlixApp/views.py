@@ -1,5 +1,3 @@
-from datetime import datetime
-from decimal import Decimal
 import random
 import secrets
 from string import ascii_letters, digits
@@ -8,12 +6,15 @@ from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.auth.views import LoginView
+from django.core.exceptions import ValidationError
 from django.db.models import Sum, Q
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import ListView
-from django.core.paginator import Paginator
 
 from .forms import (
     BookingForm, ClubForm, ClubRepBookingForm, ClubRepRegistrationForm,
@@ -24,21 +25,19 @@ from UWEAuth.models import User
 from .models import (
     Booking, Club, MonthlyStatement, Movie, Screen, Screening, Ticket
 )
+from . import cache
+from .outbox import queue_email
+from .pagination import CursorPaginationMixin, CursorPaginator
+from .pricing import invalidate_ticket_prices, price_booking, ticket_prices
+from .reservations import hold_seats, reserve_booking
+from .showtimes import rendered_showtimes
+from .statements import create_monthly_statements as create_statements
+from .transactions import (
+    bookings_in_month, club_transactions, month_from_request, next_month,
+    previous_month
+)
 import hashlib
-import requests
-
 
-def round_up(value, dp):
-    """
-    Rounds up to dp many decimal places.
-
-    Because the bank normally doesn't let you keep the fractional penny and
-    charges you a whole extra penny for it, so do we!
-    """
-    initial = round(value, dp)
-    if initial < value:
-        initial += Decimal(1) / (10 ** dp)
-    return initial
 
 class UserRoleCheck:
     """
@@ -48,21 +47,18 @@ class UserRoleCheck:
 
     Designed to be used with the @user_passes_test() Django decorator for
     function-based views, but you can totally call it directly via test_func()
-    in class-based views that inherit UserPassesTestMixin.
+    in class-based views that inherit UserPassesTestMixin, ideally with the
+    request's Principal (request.principal) rather than its User.
     """
     def __init__(self, *roles):
         self._roles_to_check = roles
 
     def __call__(self, user):
-        return hasattr(user, 'role') and user.role in self._roles_to_check
+        return getattr(user, 'role', None) in self._roles_to_check
 
 def home(request):
-    if request.user.is_authenticated:
-        roles = User.objects.get(username=request.user)
-        uType = roles.role
-        return render(request, "UWEFlixApp/homepage.html", {'uType': uType})
-    else:
-        return render(request, "UWEFlixApp/homepage.html")
+    # the requester's role is in the template context as principal.role
+    return render(request, "UWEFlixApp/homepage.html")
 
 @login_required()
 @user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
@@ -142,7 +138,7 @@ def delete_club(request, pk):
     return redirect("view_clubs")
 
 
-class ViewClubs(UserPassesTestMixin, ListView):
+class ViewClubs(UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = Club
     paginate_by = 5
 
@@ -151,13 +147,13 @@ class ViewClubs(UserPassesTestMixin, ListView):
         return context
 
     def test_func(self):
-        return UserRoleCheck(User.Role.CINEMA_MANAGER, User.Role.ACCOUNT_MANAGER)(self.request.user)
+        return UserRoleCheck(User.Role.CINEMA_MANAGER, User.Role.ACCOUNT_MANAGER)(self.request.principal)
     
     def handle_no_permission(self):
         return redirect('home')
 
 
-class ViewMonthlyStatement(UserPassesTestMixin, ListView):
+class ViewMonthlyStatement(UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = MonthlyStatement
     paginate_by = 5
 
@@ -166,12 +162,12 @@ class ViewMonthlyStatement(UserPassesTestMixin, ListView):
         return context
 
     def test_func(self):
-        return UserRoleCheck(User.Role.CINEMA_MANAGER, User.Role.ACCOUNT_MANAGER)(self.request.user)
+        return UserRoleCheck(User.Role.CINEMA_MANAGER, User.Role.ACCOUNT_MANAGER)(self.request.principal)
 
     def handle_no_permission(self):
         return redirect('home')
 
-class ViewMovie(ListView):
+class ViewMovie(CursorPaginationMixin, ListView):
     model = Movie
     paginate_by = 5
 
@@ -179,7 +175,34 @@ class ViewMovie(ListView):
         context = super(ViewMovie, self).get_context_data(**kwargs)
         return context
 
-class ViewScreen(UserPassesTestMixin, ListView):
+
+def catalogue_etag(request, *args, **kwargs):
+    # the page looks different when logged in (see base.html), so that's part of it too
+    return '"{}-{}-{}"'.format(
+        cache.version('catalogue'), request.GET.get('cursor', ''), int(request.user.is_authenticated)
+    )
+
+
+def catalogue_last_modified(request, *args, **kwargs):
+    return cache.last_modified('catalogue')
+
+
+@method_decorator(cache_control(no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=catalogue_etag, last_modified_func=catalogue_last_modified), name='dispatch')
+class ViewCatalogue(ViewMovie):
+    """
+    Pages of the Movie catalogue, which are the same for everyone apart from
+    the header in base.html, so the templates cache their listing of Movies
+    (keyed on the catalogue's version, which changes whenever a Movie does)
+    and browsers and proxies can revalidate a page with a conditional GET,
+    getting a 304 Not Modified until the catalogue changes.
+    """
+    def get_context_data(self, **kwargs):
+        context = super(ViewCatalogue, self).get_context_data(**kwargs)
+        context['catalogue_version'] = cache.version('catalogue')
+        return context
+
+class ViewScreen(UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = Screen
     paginate_by = 5
 
@@ -188,7 +211,7 @@ class ViewScreen(UserPassesTestMixin, ListView):
         return context
 
     def test_func(self):
-        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.user)
+        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.principal)
     
     def handle_no_permission(self):
         return redirect('home')
@@ -279,22 +302,10 @@ def update_screen(request, pk):
 def show_screening(request, pk):
     """Takes the pk of a movie and returns a list of screenings for that movie"""
     movie = Movie.objects.get(pk=pk)
-    screening = Screening.objects_with_seats_remaining().filter(movie=movie, _seats_remaining__gte=1).order_by('showing_at')
-
-    dates = []
-    screening_dict = {}
-    for show in screening:
-        date = show.showing_at
-        date = date.strftime("%d/%m/%Y")
-        if date not in dates:
-            dates.append(date)
-            screening_dict[date] = []
-        screening_dict[date].append(show)
-
-    return render(request, "UWEFlixApp/show_movie_screenings_with_tabs.html", {"showing_list": screening, "movie": movie, "screening_dict": screening_dict})
+    return render(request, "UWEFlixApp/show_movie_screenings_with_tabs.html", {"movie": movie, "showtimes": rendered_showtimes(movie.id)})
 
 
-class ViewScreenings(UserPassesTestMixin, ListView):
+class ViewScreenings(UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = Screening
     paginate_by = 5
 
@@ -303,7 +314,7 @@ class ViewScreenings(UserPassesTestMixin, ListView):
         return context
 
     def test_func(self):
-        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.user)
+        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.principal)
     
     def handle_no_permission(self):
         return redirect('home')
@@ -342,16 +353,8 @@ def edit_screening(request, pk):
 @login_required()
 @user_passes_test(UserRoleCheck(User.Role.ACCOUNT_MANAGER), redirect_field_name=None)
 def create_monthly_statements(request):
-    """Creates a monthly statement for each club in the database"""
-    clubs = Club.objects.all()
-    for club in clubs:
-        bookings = Booking.objects.filter(club=club, date__month=datetime.now().month)
-        amount = 0
-        for booking in bookings:
-            amount += booking.total_price
-        ms = MonthlyStatement.objects.create(club=club, amount=amount, date = datetime.now())
-        ms.save()
-
+    """Creates (or updates) this month's statement for each club in the database"""
+    create_statements()
     return redirect("view_monthly_statement")
 
 @login_required()
@@ -375,22 +378,39 @@ def logout_user(request):
     return redirect('home')
 
 
+def month_context(month):
+    """
+    Template context for pages that show one month at a time, with links to
+    the months either side
+    """
+    return {"month": month, "previous_month": previous_month(month), "next_month": next_month(month)}
+
+
+def hold_seats_for_session(request, screening, seats):
+    """
+    Holds seats for the customer while they pay, remembering the SeatHold in
+    their session (replacing any they had already)
+    """
+    hold = hold_seats(screening, seats, replacing_hold_id=request.session.get('seat_hold'))
+    request.session['seat_hold'] = hold.id
+
+
 def create_booking(request, pk):
     user = request.user
     screening = Screening.objects.get(pk=pk)
-    date = Screening.objects.get(pk=pk).showing_at
+    date = screening.showing_at
 
     screeningtext = screening.id
     warning = None
     request.session['selected_screening'] = screeningtext
 
     if request.method == 'GET':
-        if not user.is_anonymous and user.role == User.Role.CLUB_REP:
+        if request.principal.has_role(User.Role.CLUB_REP):
             form = ClubRepBookingForm()
             return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
 
     if request.method == 'POST':
-        if request.user.is_anonymous or request.user.role != User.Role.CLUB_REP:
+        if not request.principal.has_role(User.Role.CLUB_REP):
             request.session['number_of_adult_tickets'] = request.POST.get(
                 'number_of_adult_tickets')
 
@@ -402,19 +422,18 @@ def create_booking(request, pk):
             total_tickets = int(request.POST.get('number_of_adult_tickets')) + int(request.POST.get(
                 'number_of_child_tickets')) + int(request.POST.get('number_of_student_tickets'))
             request.session['total_tickets_number'] = total_tickets
-            if screening.seats_remaining < total_tickets:
-                warning = "Not enough seats available — there are only {} seats left".format(screening.seats_remaining)
-                form = BookingForm()
-                return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
-
-
+            if total_tickets > 9:
+                warning = "Too many tickets, no more than 9 in one booking"
+            elif total_tickets == 0:
+                warning = "No tickets selected"
             else:
-                if total_tickets > 9:
-                    warning = "Too many tickets, no more than 9 in one booking"
-                elif total_tickets == 0:
-                    warning = "No tickets selected"
-                else:
-                    return redirect('payment_page')
+                try:
+                    hold_seats_for_session(request, screening, total_tickets)
+                except Booking.NotEnoughSeats:
+                    warning = "Not enough seats available — there are only {} seats left".format(screening.seats_remaining)
+                    form = BookingForm()
+                    return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
+                return redirect('payment_page')
         else:
             request.session['number_of_student_tickets'] = request.POST.get(
                 'number_of_student_tickets')
@@ -425,18 +444,17 @@ def create_booking(request, pk):
             total_tickets = int(request.POST.get('number_of_student_tickets'))
             print(total_tickets)
             request.session['total_tickets_number'] = total_tickets
-            if screening.seats_remaining < total_tickets:
+            if total_tickets < 9:
+                warning = "A club booking requirement is 10 tickets or more"
+                form = ClubRepBookingForm()
+                return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
+            try:
+                hold_seats_for_session(request, screening, total_tickets)
+            except Booking.NotEnoughSeats:
                 warning = "Not enough seats available"
                 form = ClubRepBookingForm()
                 return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
-
-            else:
-                if total_tickets < 9:
-                    warning = "A club booking requirement is 10 tickets or more"
-                    form = ClubRepBookingForm()
-                    return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
-                else:
-                    return redirect('confirm_booking')
+            return redirect('confirm_booking')
 
     form = BookingForm()
     return render(request, "UWEFlixApp/booking_form.html", {"form": form, "button_text": "Continue booking", "user": user, "Screening": screening, 'date': date, 'warning': warning})
@@ -447,48 +465,38 @@ def confirm_booking(request):
     screening = Screening.objects.get(id=request.session['selected_screening'])
 
     user = request.user
+    club = None
+    discount_rate = None
     # TODO: Change club to be based on the user's club
-    if not request.user.is_anonymous and request.user.role == User.Role.CLUB_REP:
+    if request.principal.has_role(User.Role.CLUB_REP):
         club = user.club
         discount_rate = club.discount_rate
     discount = None
     number_of_adult_tickets = int(request.session['number_of_adult_tickets'])
     number_of_child_tickets = int(request.session['number_of_child_tickets'])
     number_of_student_tickets = int(request.session['number_of_student_tickets'])
-    adult_ticket_price = Ticket.objects.get(id=1).price
-    child_ticket_price = Ticket.objects.get(id=2).price
-    student_ticket_price = Ticket.objects.get(id=3).price
-    total_price = number_of_adult_tickets * adult_ticket_price + \
-        number_of_child_tickets * child_ticket_price + \
-        number_of_student_tickets * student_ticket_price
-    subtotal = total_price
-    if not request.user.is_anonymous:
-        if user.role == User.Role.CLUB_REP:
-            total_price = round_up(total_price * (1 - discount_rate), 2)
+    subtotal, total_price = price_booking(
+        number_of_adult_tickets, number_of_child_tickets,
+        number_of_student_tickets, discount_rate
+    )
 
     total_ticket_quantity = number_of_adult_tickets + \
         number_of_child_tickets + number_of_student_tickets
     
     if request.method == 'POST':
         form = BookingForm(request.POST)
-        if screening.seats_remaining < total_ticket_quantity:
-            return render(request, "UWEFlixApp/confirm_booking.html", {"user": user, "Screening": screening, 'number_of_adult_tickets': number_of_adult_tickets, 'number_of_child_tickets': number_of_child_tickets, 'number_of_student_tickets': number_of_student_tickets, 'total_price': total_price, 'subtotal': subtotal, 'discount': discount, 'total_ticket_quantity': total_ticket_quantity, 'button_text': 'Confirm Booking', 'button_texttwo': 'Cancel Booking', 'warning': 'Too many tickets selected'})
+        try:
+            booking = reserve_booking(
+                screening, number_of_adult_tickets, number_of_child_tickets,
+                number_of_student_tickets, total_price,
+                user=user if user.is_authenticated else None,
+                club=club,
+                hold_id=request.session.get('seat_hold'),
+            )
+        except ValidationError as e:
+            return render(request, "UWEFlixApp/confirm_booking.html", {"user": user, "Screening": screening, 'number_of_adult_tickets': number_of_adult_tickets, 'number_of_child_tickets': number_of_child_tickets, 'number_of_student_tickets': number_of_student_tickets, 'total_price': total_price, 'subtotal': subtotal, 'discount': discount, 'total_ticket_quantity': total_ticket_quantity, 'button_text': 'Confirm Booking', 'button_texttwo': 'Cancel Booking', 'warning': e.message})
         else:
-            if request.user.is_authenticated:
-                if user.role == User.Role.CLUB_REP:
-                    if club.balance < total_price:
-                        return render(request, "UWEFlixApp/confirm_booking.html", {"user": user, "Screening": screening, 'number_of_adult_tickets': number_of_adult_tickets, 'number_of_child_tickets': number_of_child_tickets, 'number_of_student_tickets': number_of_student_tickets, 'total_price': total_price, 'subtotal': subtotal, 'discount': discount, 'total_ticket_quantity': total_ticket_quantity, 'button_text': 'Confirm Booking', 'button_texttwo': 'Cancel Booking', 'warning': 'Insufficient funds'})
-                    else:
-                        booking = Booking.objects.create(user=user, screening=screening, number_of_adult_tickets=number_of_adult_tickets, total_price=total_price,
-                                            number_of_child_tickets=number_of_child_tickets, number_of_student_tickets=number_of_student_tickets, club=club)
-                        club.balance = club.balance - total_price
-                        club.save()
-                else:
-                    booking = Booking.objects.create(user=user, screening=screening, number_of_adult_tickets=number_of_adult_tickets, total_price=total_price,
-                                    number_of_child_tickets=number_of_child_tickets, number_of_student_tickets=number_of_student_tickets)
-            else:
-                booking = Booking.objects.create(screening=screening, number_of_adult_tickets=number_of_adult_tickets, total_price=total_price,
-                                    number_of_child_tickets=number_of_child_tickets, number_of_student_tickets=number_of_student_tickets)
+            request.session.pop('seat_hold', None)
             request.session['booking_id'] = booking.id
             return redirect('email_confirmation')
     else:
@@ -514,8 +522,7 @@ def club_top_up(request):
             if expiry_date != club.card_expiry:
                 return render(request, "UWEFlixApp/club_top_up.html", {"club": club, "error": "Expiry date does not match", "form": form})
 
-            club.balance += form.cleaned_data["amount"]
-            club.save()
+            Club.credit(club.id, form.cleaned_data["amount"])
             return redirect('home')
 
 
@@ -587,33 +594,28 @@ def register_club_rep(request):
 @user_passes_test(UserRoleCheck(User.Role.CLUB_REP), redirect_field_name=None)
 def view_transactions(request):
     """Displays all transactions for the club"""
-    club = request.user.club  # WARN: assumes constraints set in the User model have been validated
-    bookings = Booking.objects.filter(club=club, date__month=datetime.now().month)
-    return render(request, "UWEFlixApp/view_transactions.html", {"transaction_list": bookings})
+    club = request.principal.club_id  # WARN: assumes constraints set in the User model have been validated
+    month = month_from_request(request)
+    bookings, total = club_transactions(club, month)
+    return render(request, "UWEFlixApp/view_transactions.html", {"transaction_list": bookings, "total": total, **month_context(month)})
 
 
 
 @login_required()
 @user_passes_test(UserRoleCheck(User.Role.ACCOUNT_MANAGER), redirect_field_name=None)
 def view_club_transactions(request, pk):
-    """Displays all transactions for the club for the current mmonth"""
+    """Displays all transactions for the club for the current (or chosen) month"""
     club = get_object_or_404(Club, pk=pk)
-    bookings = Booking.objects.filter(
-        club=club, date__month=datetime.now().month)
-    total = 0
-    for booking in bookings:
-        total += booking.total_price
-    # TODO: Change this when moving to docker
-    # total = Booking.objects.filter(club__pk=pk, date__month=datetime.now()
-    #                                .month).aggregate(Sum('total_price'))['total_price__sum'] or 0
-    return render(request, "UWEFlixApp/view_club_transactions.html", {"transaction_list": bookings, "club": club, "total": total, "month": datetime.now()})
+    month = month_from_request(request)
+    bookings, total = club_transactions(club, month)
+    return render(request, "UWEFlixApp/view_club_transactions.html", {"transaction_list": bookings, "club": club, "total": total, **month_context(month)})
 
 
 def account_page(request):
     """
     Redirect logged-in users to approprate pages
     """
-    if request.user.is_anonymous:
+    if not request.principal.is_authenticated:
         return redirect('home')  # not logged in
     PAGES_PER_USER_ROLE = {  # the most Pythonic way to emulate switch-case! ;)
         User.Role.STUDENT: 'student_view',
@@ -621,7 +623,7 @@ def account_page(request):
         User.Role.ACCOUNT_MANAGER: 'account_manager',
         User.Role.CINEMA_MANAGER: 'cinema_manager_view',
     }
-    return redirect(PAGES_PER_USER_ROLE[request.user.role])
+    return redirect(PAGES_PER_USER_ROLE[request.principal.role])
 
 @login_required()
 @user_passes_test(UserRoleCheck(User.Role.STUDENT), redirect_field_name=None)
@@ -660,7 +662,7 @@ def reject_join_request(request, pk):
 @user_passes_test(UserRoleCheck(User.Role.CLUB_REP), redirect_field_name=None)
 def view_pending_requests(request):
     """Allows a club rep to view pending requests"""
-    club = request.user.club
+    club = request.principal.club_id
     users = User.objects.filter(requested_club=club)
     return render(request, "UWEFlixApp/view_requested_club_requests.html", {"users": users})
 
@@ -681,7 +683,7 @@ def payment_page(request):
             return redirect('confirm_booking')
     return render(request, "UWEFlixApp/paymentform.html", {"form": form, "button_text": "Continue"})
 
-class ViewBooking(UserPassesTestMixin, ListView):
+class ViewBooking(UserPassesTestMixin, CursorPaginationMixin, ListView):
     model = Booking
     paginate_by = 5
 
@@ -690,7 +692,7 @@ class ViewBooking(UserPassesTestMixin, ListView):
         return context
 
     def test_func(self):
-        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.user)
+        return UserRoleCheck(User.Role.CINEMA_MANAGER)(self.request.principal)
     
     def handle_no_permission(self):
         return redirect('home')
@@ -699,18 +701,17 @@ class ViewBooking(UserPassesTestMixin, ListView):
 @user_passes_test(UserRoleCheck(User.Role.CLUB_REP), redirect_field_name=None)
 def show_club_bookings(request):
     """Displays all transactions for the club"""
-    club = request.user.club  # WARN: assumes constraints set in the User model have been validated
-    all_bookings = Booking.objects.filter(club=club, date__month=datetime.now().month)
-    paginator = Paginator(all_bookings, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, "UWEFlixApp/view_club_bookings.html", {"page_obj": page_obj})
+    club = request.principal.club_id  # WARN: assumes constraints set in the User model have been validated
+    month = month_from_request(request)
+    all_bookings = bookings_in_month(month, Booking.objects_with_details(), club=club).order_by('date')
+    page_obj = CursorPaginator(all_bookings, 5).get_page(request.GET.get('cursor'))
+    return render(request, "UWEFlixApp/view_club_bookings.html", {"page_obj": page_obj, **month_context(month)})
 
 @login_required()
 @user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
 def waiting_approval(request):
     """displays all users where is_active is false"""
-    all_users = User.objects.filter(is_active=False)
+    all_users = User.objects.filter(is_active=False).select_related('club')
     return render(request, "UWEFlixApp/waiting_approval.html", {"all_users": all_users})
 
 @login_required()
@@ -756,11 +757,10 @@ def register_staff(request):
 def show_user_bookings(request):
     """Displays all transactions for the user"""
     user = request.user.id  # WARN: assumes constraints set in the User model have been validated
-    all_bookings = Booking.objects.filter(user=user, date__month=datetime.now().month)
-    paginator = Paginator(all_bookings, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, "UWEFlixApp/view_student_booking.html", {"page_obj": page_obj})
+    month = month_from_request(request)
+    all_bookings = bookings_in_month(month, Booking.objects_with_details(), user=user).order_by('date')
+    page_obj = CursorPaginator(all_bookings, 5).get_page(request.GET.get('cursor'))
+    return render(request, "UWEFlixApp/view_student_booking.html", {"page_obj": page_obj, **month_context(month)})
 
 def request_cancel(request, pk):
     """Allow student users to request cancelling a ticket"""
@@ -773,7 +773,7 @@ def request_cancel(request, pk):
 @user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
 def show_requested_bookings(request):
     """Displays all transactions for the user"""
-    all_bookings = Booking.objects.filter(status=Booking.Status.CANCELLATION_REQUESTED, date__month=datetime.now().month)
+    all_bookings = bookings_in_month(bookings=Booking.objects_with_details(), status=Booking.Status.CANCELLATION_REQUESTED)
     return render(request, "UWEFlixApp/view_student_requests.html", {"all_bookings": all_bookings})
 
 @login_required()
@@ -789,9 +789,10 @@ def cancel_booking(request, pk):
 @user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
 def change_ticket_price(request):
     """Allows a cinema manager to change the ticket price"""
-    form = TicketPriceForm(request.POST or None, initial={"adult_ticket_price": Ticket.objects.get(type='adult').price,
-                                                          "child_ticket_price": Ticket.objects.get(type='child').price,
-                                                          "student_ticket_price": Ticket.objects.get(type='student').price,})
+    prices = ticket_prices()
+    form = TicketPriceForm(request.POST or None, initial={"adult_ticket_price": prices.get('adult'),
+                                                          "child_ticket_price": prices.get('child'),
+                                                          "student_ticket_price": prices.get('student'),})
     if request.method == "POST":
         if form.is_valid():
             adult_ticket_price = form.cleaned_data["adult_ticket_price"]
@@ -801,6 +802,7 @@ def change_ticket_price(request):
             Ticket.objects.filter(type='adult').update(price=adult_ticket_price)
             Ticket.objects.filter(type='child').update(price=child_ticket_price)
             Ticket.objects.filter(type='student').update(price=student_ticket_price)
+            invalidate_ticket_prices()  # .update() doesn't send post_save
 
             return redirect('cinema_manager_view')
     return render(request, "UWEFlixApp/change_ticket_price.html", {"form": form})
@@ -809,38 +811,19 @@ def change_ticket_price(request):
 def email_confirmation(request):
     """Sends an email to the user confirming their booking"""
     if request.method == "POST":
-        booking = request.session['booking_id']
         email = request.POST.get('email_address')
-        screening = request.session['selected_screening']
-        screening = Screening.objects.get(pk=screening)
-        movie = Movie.objects.get(pk=screening.movie_id)
-        screen = Screen.objects.get(pk=screening.screen_id)
+        # everything in the email comes from the Booking as it was saved,
+        # including the price it was actually charged (after any discount)
+        booking = Booking.objects.select_related('screening__movie', 'screening__screen').get(
+            pk=request.session['booking_id'])
+        screening = booking.screening
 
         date = screening.showing_at
         date = date.strftime("%d %B %Y - %H:%M")
 
-        number_of_adult_tickets = int(
-            request.session['number_of_adult_tickets'])
-        number_of_child_tickets = int(
-            request.session['number_of_child_tickets'])
-        number_of_student_tickets = int(
-            request.session['number_of_student_tickets'])
-        total_tickets = number_of_adult_tickets + \
-            number_of_child_tickets + number_of_student_tickets
-
-        adult_ticket_price = Ticket.objects.get(id=1).price
-        child_ticket_price = Ticket.objects.get(id=2).price
-        student_ticket_price = Ticket.objects.get(id=3).price
-        total_price = number_of_adult_tickets * adult_ticket_price + \
-            number_of_child_tickets * child_ticket_price + \
-            number_of_student_tickets * student_ticket_price
-
-        url = 'http://django-rest-api:8001/my-api/'
-        data = {'name': 'UWEFlix', 'email': email, 'movie': movie.name, 'date': str(
-            date), 'screen': screen.name, 'total_tickets': total_tickets, 'total_price': str(total_price), 'id': booking}
-        headers = {'Content-type': 'application/json'}
-
-        response = requests.post(url, json=data, headers=headers)
+        data = {'name': 'UWEFlix', 'email': email, 'movie': screening.movie.name, 'date': str(
+            date), 'screen': screening.screen.name, 'total_tickets': booking.number_of_tickets, 'total_price': str(booking.total_price), 'id': booking.id}
+        queue_email(data)  # sent in the background by the send_outbox_emails worker
         return redirect('home')
     return render(request, "UWEFlixApp/email_confirmation.html")
 
@@ -848,10 +831,8 @@ def email_confirmation(request):
 @user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
 def view_staff_accounts(request):
     """Displays all staff accounts"""
-    all_users = User.objects.filter(Q(role=User.Role.CINEMA_MANAGER) | Q(role=User.Role.ACCOUNT_MANAGER) | Q(role=User.Role.CLUB_REP))
-    paginator = Paginator(all_users, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    all_users = User.objects.filter(Q(role=User.Role.CINEMA_MANAGER) | Q(role=User.Role.ACCOUNT_MANAGER) | Q(role=User.Role.CLUB_REP)).order_by('id')
+    page_obj = CursorPaginator(all_users, 5).get_page(request.GET.get('cursor'))
     return render(request, "UWEFlixApp/view_staff_accounts.html", {"page_obj": page_obj})
 
 def deactivate_account(request, pk):
@@ -867,3 +848,10 @@ def activate_account(request, pk):
     user.is_active = True
     user.save()  
     return redirect("view_staff_accounts")
+
+@login_required()
+@user_passes_test(UserRoleCheck(User.Role.CINEMA_MANAGER), redirect_field_name=None)
+def cache_stats(request):
+    """Reports the cache's hit and miss counts, for monitoring"""
+    return JsonResponse(cache.stats())
+
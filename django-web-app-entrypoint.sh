@@ -10,6 +10,7 @@ python manage.py migrate
 # Load data into database
 if [ ! -f /data_loaded.txt ]; then
     python manage.py loaddata data.json
+    python manage.py reconcile_seat_counts  # fixtures bypass the counter
     touch /data_loaded.txt
 fi
 python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Times Screening clash detection as the schedule grows, to check it stays flat.
+
+Run with: python manage.py runscript benchmark_clash_detection
+
+Everything is done inside a transaction which is rolled back at the end, so
+the database is left exactly as it was.
+"""
+from datetime import timedelta
+from random import choice, randint
+from time import perf_counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from UWEFlixApp.models import Movie, Screen, Screening
+
+SCHEDULE_SIZES = (1_000, 10_000, 100_000)
+SCREENS = 20
+CHECKS = 500
+
+
+def create_schedule(movies, screens, start, count):
+    """
+    Back-to-back Screenings on every Screen, with a short gap between each
+    """
+    screenings = []
+    next_free = {screen.id: start for screen in screens}
+    for i in range(count):
+        screen = screens[i % len(screens)]
+        movie = choice(movies)
+        showing_at = next_free[screen.id]
+        screenings.append(Screening(
+            movie=movie, screen=screen, showing_at=showing_at,
+            finishing_at=showing_at + movie.running_time
+        ))
+        next_free[screen.id] = showing_at + movie.running_time + timedelta(minutes=15)
+    Screening.objects.bulk_create(screenings, batch_size=5_000)
+    return max(next_free.values())
+
+
+def time_clash_checks(movies, screens, schedule_start, schedule_end):
+    """
+    Average time taken to check random would-be Screenings for clashes
+    """
+    span = int((schedule_end - schedule_start).total_seconds() // 60)
+    candidates = [
+        Screening(
+            movie=choice(movies), screen=choice(screens),
+            showing_at=schedule_start + timedelta(minutes=randint(0, span))
+        )
+        for _ in range(CHECKS)
+    ]
+    for candidate in candidates:
+        candidate.set_finishing_at()
+    started = perf_counter()
+    for candidate in candidates:
+        candidate.clashes_with_others
+    return (perf_counter() - started) / CHECKS
+
+
+def run():
+    with transaction.atomic():
+        movies = [
+            Movie.objects.create(name=f'Benchmark {m}', running_time=timedelta(minutes=m))
+            for m in (90, 105, 120, 150, 180)
+        ]
+        screens = [
+            Screen.objects.create(name=f'Benchmark {s}', capacity=100)
+            for s in range(SCREENS)
+        ]
+        start = timezone.now()
+        end = start
+        created = 0
+        for size in SCHEDULE_SIZES:
+            end = max(end, create_schedule(movies, screens, end, size - created))
+            created = size
+            average = time_clash_checks(movies, screens, start, end)
+            print(f'{size:>7} screenings: {average * 1_000:.3f} ms per clash check')
+
+        candidate = Screening(movie=movies[0], screen=screens[0], showing_at=start)
+        candidate.set_finishing_at()
+        print('Query plan:')
+        print(Screening.objects.filter(
+            screen_id=candidate.screen_id,
+            showing_at__lt=candidate.finishing_at,
+            finishing_at__gt=candidate.showing_at,
+            showing_at__gt=candidate.showing_at - movies[-1].running_time,
+        ).explain())
+        print(f'(on {connection.vendor})')
+        transaction.set_rollback(True)
@@ -0,0 +1,178 @@
+"""
+Times the views' querysets against a million Bookings with the indexes as they
+were before migration 0008 (just the foreign keys' own indexes and
+booking_club_date_idx) and as they are now, printing each query's plan and
+latency both ways.
+
+Run with: python manage.py runscript benchmark_indexes
+or, with fewer Bookings: python manage.py runscript benchmark_indexes --script-args 100000
+
+Everything is done inside a transaction which is rolled back at the end, so
+the database is left exactly as it was. (On MySQL, creating and dropping the
+indexes commits the transaction, so only run it against a scratch database.)
+"""
+from datetime import timedelta
+from random import choice, randint, random
+from statistics import median
+from time import perf_counter
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from UWEAuth.models import User
+from UWEFlixApp.models import Booking, Club, Movie, Screen, Screening
+from UWEFlixApp.pagination import CursorPaginator
+from UWEFlixApp.showtimes import showtimes_by_day
+from UWEFlixApp.transactions import bookings_in_month, club_transactions
+
+BOOKINGS = 1_000_000
+USERS = 10_000
+CLUBS = 50
+MOVIES = 20
+SCREENS = 10
+SCREENINGS = 2_000
+RUNS = 20
+
+# the indexes migration 0008 added, and the foreign key indexes it dropped
+NEW_INDEXES = [
+    (model, index) for model in (Booking, Screening, User)
+    for index in model._meta.indexes
+    if index.name not in ('booking_club_date_idx', 'screening_screen_interval_idx')
+]
+OLD_INDEXES = [
+    (model, models.Index(fields=[field], name=f'benchmark_{model._meta.model_name}_{field}_idx'))
+    for model, field in (
+        (Booking, 'user'), (Booking, 'screening'), (Booking, 'club'),
+        (Screening, 'movie'), (Screening, 'screen'),
+    )
+]
+
+
+def seed(bookings):
+    """
+    Clubs, Users, Screenings and bookings Bookings spread over the last year,
+    about one in fifty of which have a cancellation requested
+    """
+    now = timezone.now()
+    clubs = Club.objects.bulk_create([
+        Club(name=f'Benchmark {c}', card_number='4242424242424242', card_expiry=now.date(),
+             discount_rate=0.1, address='Bristol')
+        for c in range(CLUBS)
+    ])
+    users = User.objects.bulk_create([
+        User(username=f'benchmark{u}', role=User.Role.STUDENT, is_active=u % 100 != 0,
+             requested_club=choice(clubs) if u % 20 == 0 else None)
+        for u in range(USERS)
+    ] + [
+        User(username=f'benchmark_rep{c}', role=User.Role.CLUB_REP, club=club)
+        for c, club in enumerate(clubs)
+    ], batch_size=5_000)
+    movies = Movie.objects.bulk_create([
+        Movie(name=f'Benchmark {m}', running_time=timedelta(minutes=90 + m)) for m in range(MOVIES)
+    ])
+    screens = Screen.objects.bulk_create([
+        Screen(name=f'Benchmark {s}', capacity=100_000) for s in range(SCREENS)
+    ])
+    screenings = Screening.objects.bulk_create([
+        Screening(movie=movies[s % MOVIES], screen=screens[s % SCREENS],
+                  showing_at=now - timedelta(days=365) + timedelta(hours=4 * s),
+                  finishing_at=now - timedelta(days=365) + timedelta(hours=4 * s, minutes=150))
+        for s in range(SCREENINGS)
+    ], batch_size=5_000)
+
+    date = Booking._meta.get_field('date')
+    date.auto_now = False  # otherwise bulk_create() dates them all now
+    try:
+        for start in range(0, bookings, 10_000):
+            batch = []
+            for _ in range(min(10_000, bookings - start)):
+                club_booking = random() < 0.2
+                batch.append(Booking(
+                    user=choice(users), screening=choice(screenings),
+                    club=choice(clubs) if club_booking else None,
+                    number_of_adult_tickets=0 if club_booking else randint(1, 3),
+                    number_of_child_tickets=0, number_of_student_tickets=10 if club_booking else 0,
+                    total_price=10, date=now - timedelta(minutes=randint(0, 365 * 24 * 60)),
+                    status=Booking.Status.CANCELLATION_REQUESTED if random() < 0.02 else Booking.Status.ACTIVE,
+                ))
+            Booking.objects.bulk_create(batch)
+    finally:
+        date.auto_now = True
+    return clubs, users, movies, screenings
+
+
+def querysets(clubs, users, movies, screenings):
+    """
+    (name, QuerySet, how to run it) for the queries behind each view
+    """
+    month = timezone.localdate()
+    club, user, movie, screening = clubs[0], users[1], movies[0], screenings[len(screenings) // 2]
+    club_bookings = bookings_in_month(month, Booking.objects_with_details(), club=club).order_by('date')
+    user_bookings = bookings_in_month(month, Booking.objects_with_details(), user=user).order_by('date')
+    requested = bookings_in_month(
+        bookings=Booking.objects_with_details(), status=Booking.Status.CANCELLATION_REQUESTED
+    ).order_by('date')
+    staff = User.objects.filter(role__in=(User.Role.CINEMA_MANAGER, User.Role.ACCOUNT_MANAGER, User.Role.CLUB_REP)).order_by('id')
+    return [
+        ('show_club_bookings', club_bookings, lambda: CursorPaginator(club_bookings, 5).page().object_list),
+        ('show_user_bookings', user_bookings, lambda: CursorPaginator(user_bookings, 5).page().object_list),
+        ('show_requested_bookings', requested, lambda: list(requested.all())),
+        ('view_transactions', club_bookings, lambda: club_transactions(club, month)[1]),
+        ('seats recount', Screening.objects_with_seats_recounted().filter(id=screening.id),
+         lambda: list(Screening.objects_with_seats_recounted().filter(id=screening.id))),
+        ('showtimes', Screening.objects.filter(movie=movie).order_by('showing_at'),
+         lambda: showtimes_by_day(movie.id)),
+        ('waiting_approval', User.objects.filter(is_active=False).select_related('club'),
+         lambda: list(User.objects.filter(is_active=False).select_related('club'))),
+        ('view_staff_accounts', staff, lambda: CursorPaginator(staff, 5).page().object_list),
+        ('view_pending_requests', User.objects.filter(requested_club=club),
+         lambda: list(User.objects.filter(requested_club=club))),
+    ]
+
+
+def set_indexes(drop, create):
+    editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        for model, index in drop:
+            cursor.execute(str(index.remove_sql(model, editor)))
+        for model, index in create:
+            cursor.execute(str(index.create_sql(model, editor)))
+        if connection.vendor == 'postgresql':  # which otherwise wouldn't know how big the tables are yet
+            cursor.execute('ANALYZE')
+
+
+def time_queries(queries):
+    """
+    {name: (median ms, query plan)}
+    """
+    results = {}
+    for name, queryset, evaluate in queries:
+        evaluate()  # warm up
+        times = []
+        for _ in range(RUNS):
+            started = perf_counter()
+            evaluate()
+            times.append((perf_counter() - started) * 1_000)
+        results[name] = (median(times), queryset.explain())
+    return results
+
+
+def run(*args):
+    bookings = int(args[0]) if args else BOOKINGS
+    with transaction.atomic():
+        started = perf_counter()
+        seeded = seed(bookings)
+        print(f'Seeded {bookings} bookings in {perf_counter() - started:.0f}s (on {connection.vendor})')
+        queries = querysets(*seeded)
+
+        set_indexes(drop=NEW_INDEXES, create=OLD_INDEXES)
+        before = time_queries(queries)
+        set_indexes(drop=OLD_INDEXES, create=NEW_INDEXES)
+        after = time_queries(queries)
+
+        for name, _, _ in queries:
+            (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+            print(f'\n{name}: {before_ms:.2f} ms before, {after_ms:.2f} ms after')
+            print(f'  before: {before_plan}'.replace('\n', '\n          '))
+            print(f'  after:  {after_plan}'.replace('\n', '\n          '))
+        transaction.set_rollback(True)
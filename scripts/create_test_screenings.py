@@ -1,4 +1,7 @@
+from django.utils import timezone
+
 from UWEFlixApp.models import MonthlyStatement, Club, Booking, Screening, Movie, Screen
+from UWEFlixApp.scheduling import schedule_screenings
 from random import randint
 from string import ascii_letters
 from datetime import datetime, timedelta, date, time
@@ -67,21 +70,22 @@ def create_random_booking(screening, club):
     booking = Booking.objects.create(screening=screening, number_of_tickets=number_of_tickets, total_price=total_price, club=club, date=date)
     return booking
 
-from datetime import datetime, timedelta
 def create_screenings(movie, screen):
-    dates = []
-    dates.append(datetime.now().date())
-    for d in range(1,6):
-        dates.append(datetime.now().date() + timedelta(days=d))
-    for date in dates:
+    """
+    Proposes ten random showings a day for the next six days, of which the
+    scheduler keeps whichever don't clash
+    """
+    proposals = []
+    for d in range(6):
+        day = datetime.now().date() + timedelta(days=d)
         for _ in range(10):
-            date = datetime.combine(date , time(randint(8, 22),0,0))
-            screening = Screening.objects.create(movie=movie, screen=screen, showing_at=date, seats_remaining=screen.capacity)
-            screening.save()
+            showing_at = timezone.make_aware(datetime.combine(day, time(randint(8, 22), 0, 0)))
+            proposals.append((movie, screen, showing_at))
+    return proposals
 
 
 def run():
-    # Create a Club
+    proposals = []
     for _ in range(10):
         # Create a Movie
         movie = create_random_movie()
@@ -89,7 +93,8 @@ def run():
         # Create a Screen
         screen = create_random_screen()
         screen.save()
-        # Create a Screening
-        screening = create_screenings(movie, screen)
-
-
+        # Propose Screenings
+        proposals += create_screenings(movie, screen)
+    # Create all the Screenings at once
+    created, rejected = schedule_screenings(proposals)
+    print(f'{len(created)} Screenings created, {len(rejected)} clashing proposals rejected')